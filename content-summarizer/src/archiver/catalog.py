@@ -0,0 +1,471 @@
+"""归档目录索引
+
+output/.catalog.db 记录每个归档内容的基本信息（来源、作者、发布日期、目录名等），
+列表和查找不需要逐个读取 metadata.json。
+同一数据库中的 FTS5 表索引标题、摘要和转录全文，支持按相关度检索（分词见 search.py）；
+fingerprints 表保存转录的 MinHash 签名，用于查找跨平台的重复内容（见 dedup.py）。
+每次归档时在一个事务内更新；reindex 从已有目录并行重建。
+"""
+import json
+import os
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime
+from email.utils import parsedate_to_datetime
+from functools import partial
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from ..fetcher.base import detect_url_type
+from . import dedup
+from .compression import TranscriptCodec
+from .search import SearchDocument, build_match, make_snippet, tokenize
+
+
+CATALOG_NAME = '.catalog.db'
+
+# 重建索引时并行读取 metadata.json 的线程数（网络存储上主要是IO等待）
+REINDEX_WORKERS = 16
+# 重建索引时每个写事务写入的条目数
+REINDEX_BATCH = 500
+
+COLUMNS = (
+    'source', 'video_id', 'folder', 'title', 'title_zh', 'author',
+    'published_at', 'published_date', 'duration', 'source_url', 'created_at'
+)
+
+# 检索排序时标题、摘要、转录的权重（bm25）
+SEARCH_WEIGHTS = (10.0, 4.0, 1.0)
+# 结果摘录的长度（字数）
+SNIPPET_CHARS = 60
+
+# transcript.md 中转录正文前的标题（之前是来源信息，计算签名时去掉）
+TRANSCRIPT_HEADING = '## 转录内容\n'
+
+
+@dataclass
+class CatalogEntry:
+    """索引条目"""
+    source: str
+    video_id: str
+    folder: str                    # 输出目录下的文件夹名
+    title: str
+    title_zh: str
+    author: str
+    published_at: str              # 原始发布时间
+    published_date: Optional[str]  # 规范化的发布日期 YYYY-MM-DD
+    duration: Optional[int]
+    source_url: str
+    created_at: str
+
+
+@dataclass
+class SearchResult:
+    """检索结果"""
+    entry: CatalogEntry
+    score: float      # bm25 分数，越小越相关
+    snippet: str      # 匹配处的原文摘录
+
+
+def normalize_date(value: Any) -> Optional[str]:
+    """把各平台的发布时间（20240101、ISO日期、RFC 822、时间戳）规范为 YYYY-MM-DD"""
+    if value is None or value == '':
+        return None
+    text = str(value).strip()
+    if len(text) == 8 and text.isdigit():
+        return f"{text[:4]}-{text[4:6]}-{text[6:]}"
+    if text.isdigit():
+        return datetime.fromtimestamp(int(text)).strftime('%Y-%m-%d')
+    if len(text) >= 10 and text[4] == '-' and text[7] == '-':
+        return text[:10]
+    try:
+        return parsedate_to_datetime(text).strftime('%Y-%m-%d')
+    except (TypeError, ValueError):
+        return None
+
+
+def detect_source(metadata: Dict[str, Any]) -> str:
+    """来源平台，优先根据链接判断"""
+    try:
+        return detect_url_type(metadata.get('source_url') or '')
+    except ValueError:
+        return metadata.get('source') or 'unknown'
+
+
+def entry_from_metadata(metadata: Dict[str, Any], folder: str) -> CatalogEntry:
+    """由 metadata.json 内容生成索引条目"""
+    duration = metadata.get('duration')
+    return CatalogEntry(
+        source=detect_source(metadata),
+        video_id=str(metadata.get('video_id') or folder),
+        folder=folder,
+        title=metadata.get('title') or '',
+        title_zh=metadata.get('title_zh') or '',
+        author=metadata.get('author') or '',
+        published_at=str(metadata.get('published_at') or ''),
+        published_date=normalize_date(metadata.get('published_at')),
+        duration=int(duration) if isinstance(duration, (int, float)) else None,
+        source_url=metadata.get('source_url') or '',
+        created_at=metadata.get('created_at') or ''
+    )
+
+
+def _read_text(path: Path) -> str:
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return f.read()
+    except OSError:
+        return ''
+
+
+def _read_transcript(folder: Path, codec: TranscriptCodec) -> str:
+    try:
+        return codec.read(folder) or ''
+    except (OSError, ValueError, RuntimeError) as e:
+        print(f"[!] 读取转录失败 {folder.name}: {e}")
+        return ''
+
+
+def transcript_body(text: str) -> str:
+    """去掉 transcript.md 的标题和来源信息，只保留转录正文"""
+    _, marker, body = text.partition(TRANSCRIPT_HEADING)
+    return body if marker else text
+
+
+def _read_folder(
+    folder: Path,
+    codec: TranscriptCodec,
+    signatures: bool = True
+) -> Optional[Tuple[CatalogEntry, SearchDocument, Optional[List[int]]]]:
+    try:
+        with open(folder / 'metadata.json', 'r', encoding='utf-8') as f:
+            metadata = json.load(f)
+    except (OSError, ValueError):
+        return None
+    entry = entry_from_metadata(metadata, folder.name)
+    document = SearchDocument(
+        title=f"{entry.title_zh}\n{entry.title}",
+        summary=_read_text(folder / 'summary.md'),
+        transcript=_read_transcript(folder, codec)
+    )
+    signature = dedup.signature(transcript_body(document.transcript)) if signatures else None
+    return entry, document, signature
+
+
+class Catalog:
+    """归档目录索引"""
+
+    def __init__(self, db_path: Path):
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.db_path = db_path
+
+        # 自动提交模式，写事务通过 _write() 显式开启
+        # 归档在工作线程中执行，连接跨线程共享，所有访问经 _lock 串行
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(str(db_path), timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self._write():
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS entries (
+                    source TEXT NOT NULL,
+                    video_id TEXT NOT NULL,
+                    folder TEXT NOT NULL,
+                    title TEXT,
+                    title_zh TEXT,
+                    author TEXT,
+                    published_at TEXT,
+                    published_date TEXT,
+                    duration INTEGER,
+                    source_url TEXT,
+                    created_at TEXT,
+                    PRIMARY KEY (source, video_id)
+                )
+            """)
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_entries_date ON entries(published_date)")
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_entries_source_date ON entries(source, published_date)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_video_id ON entries(video_id)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_folder ON entries(folder)")
+            # 全文索引，rowid 与 entries 一致；写入的是二元组切分后的文本
+            self._conn.execute("""
+                CREATE VIRTUAL TABLE IF NOT EXISTS search USING fts5(
+                    title, summary, transcript,
+                    tokenize = 'unicode61 remove_diacritics 2'
+                )
+            """)
+            # 转录签名及其 LSH 分段，rowid / entry 与 entries 一致
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS fingerprints (
+                    rowid INTEGER PRIMARY KEY,
+                    signature BLOB NOT NULL
+                )
+            """)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS fingerprint_bands (
+                    band INTEGER NOT NULL,
+                    bucket INTEGER NOT NULL,
+                    entry INTEGER NOT NULL,
+                    PRIMARY KEY (band, bucket, entry)
+                ) WITHOUT ROWID
+            """)
+
+    @contextmanager
+    def _write(self) -> Iterator[sqlite3.Connection]:
+        """写事务：BEGIN IMMEDIATE 获取写锁，与其他进程串行"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            else:
+                self._conn.execute("COMMIT")
+
+    def _fetch(self, sql: str, params: Any = ()) -> List[Tuple]:
+        """执行查询并取出全部结果"""
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    @staticmethod
+    def _row(entry: CatalogEntry) -> Tuple:
+        return tuple(getattr(entry, column) for column in COLUMNS)
+
+    def _upsert(
+        self,
+        conn: sqlite3.Connection,
+        entry: CatalogEntry,
+        document: Optional[SearchDocument],
+        signature: Optional[List[int]] = None
+    ) -> None:
+        """写入条目（保留原 rowid）、全文索引和转录签名，在写事务内调用"""
+        updates = ', '.join(f"{column} = excluded.{column}" for column in COLUMNS[2:])
+        conn.execute(
+            f"INSERT INTO entries ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))}) "
+            f"ON CONFLICT(source, video_id) DO UPDATE SET {updates}",
+            self._row(entry)
+        )
+        if document is None:
+            return
+        rowid = conn.execute(
+            "SELECT rowid FROM entries WHERE source = ? AND video_id = ?",
+            (entry.source, entry.video_id)
+        ).fetchone()[0]
+        conn.execute("DELETE FROM search WHERE rowid = ?", (rowid,))
+        conn.execute(
+            "INSERT INTO search (rowid, title, summary, transcript) VALUES (?, ?, ?, ?)",
+            (rowid, tokenize(document.title), tokenize(document.summary), tokenize(document.transcript))
+        )
+        # 转录过短（没有签名）时也要删除旧签名
+        conn.execute("DELETE FROM fingerprints WHERE rowid = ?", (rowid,))
+        conn.execute("DELETE FROM fingerprint_bands WHERE entry = ?", (rowid,))
+        if signature is not None:
+            conn.execute("INSERT INTO fingerprints (rowid, signature) VALUES (?, ?)", (rowid, dedup.pack(signature)))
+            conn.executemany(
+                "INSERT OR IGNORE INTO fingerprint_bands (band, bucket, entry) VALUES (?, ?, ?)",
+                [(band, bucket, rowid) for band, bucket in enumerate(dedup.band_keys(signature))]
+            )
+
+    def upsert(
+        self,
+        entry: CatalogEntry,
+        document: Optional[SearchDocument] = None,
+        signature: Optional[List[int]] = None
+    ) -> None:
+        """写入或更新一个条目（同一内容重新归档时目录名可能变化），同时更新全文索引和转录签名"""
+        with self._write() as conn:
+            self._upsert(conn, entry, document, signature)
+
+    def find_similar(
+        self,
+        signature: List[int],
+        threshold: float,
+        exclude: Optional[Tuple[str, str]] = None
+    ) -> Optional[Tuple[CatalogEntry, float]]:
+        """
+        查找转录与签名最相似的已归档内容
+        threshold: 相似度下限（0-1）；exclude: 排除的 (source, video_id)，即内容自身
+        返回 (条目, 相似度)，没有达到阈值的内容时返回None
+        """
+        keys = list(enumerate(dedup.band_keys(signature)))
+        values = ', '.join('(?, ?)' for _ in keys)
+        rows = self._fetch(
+            f"SELECT f.rowid, f.signature FROM fingerprints f WHERE f.rowid IN ("
+            f"SELECT b.entry FROM fingerprint_bands b "
+            f"JOIN (VALUES {values}) AS k ON b.band = k.column1 AND b.bucket = k.column2)",
+            [value for key in keys for value in key]
+        )
+
+        best = None
+        for rowid, data in rows:
+            score = dedup.similarity(signature, dedup.unpack(data))
+            if score >= threshold and (best is None or score > best[1]):
+                entry_rows = self._fetch(f"SELECT {', '.join(COLUMNS)} FROM entries WHERE rowid = ?", (rowid,))
+                if not entry_rows:
+                    continue
+                entry = CatalogEntry(*entry_rows[0])
+                if exclude is not None and (entry.source, entry.video_id) == exclude:
+                    continue
+                best = (entry, score)
+        return best
+
+    def query(
+        self,
+        source: Optional[str] = None,
+        author: Optional[str] = None,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        limit: int = 50
+    ) -> List[CatalogEntry]:
+        """
+        按条件列出条目，按发布日期倒序
+        author: 作者名（不区分大小写，包含即匹配）
+        since / until: 发布日期范围 YYYY-MM-DD（含两端）
+        """
+        conditions, params = [], []
+        if source:
+            conditions.append("source = ?")
+            params.append(source)
+        if author:
+            conditions.append("author LIKE ?")
+            params.append(f"%{author}%")
+        if since:
+            conditions.append("published_date >= ?")
+            params.append(normalize_date(since) or since)
+        if until:
+            conditions.append("published_date <= ?")
+            params.append(normalize_date(until) or until)
+
+        sql = f"SELECT {', '.join(COLUMNS)} FROM entries"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY published_date DESC, created_at DESC"
+        if limit:
+            sql += " LIMIT ?"
+            params.append(limit)
+        return [CatalogEntry(*row) for row in self._fetch(sql, params)]
+
+    def search(
+        self,
+        query: str,
+        source: Optional[str] = None,
+        author: Optional[str] = None,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        limit: int = 20
+    ) -> List[SearchResult]:
+        """
+        全文检索，按相关度排序；多个词（空格分隔）需同时匹配
+        其他参数与 query() 相同
+        """
+        match = build_match(query)
+        if not match:
+            return []
+
+        conditions, params = ["search MATCH ?"], [match]
+        if source:
+            conditions.append("e.source = ?")
+            params.append(source)
+        if author:
+            conditions.append("e.author LIKE ?")
+            params.append(f"%{author}%")
+        if since:
+            conditions.append("e.published_date >= ?")
+            params.append(normalize_date(since) or since)
+        if until:
+            conditions.append("e.published_date <= ?")
+            params.append(normalize_date(until) or until)
+
+        # 先按相关度取出前N条，再逐条读取文本生成摘录
+        # （在排序语句中用 snippet() 会对所有匹配行计算摘录，前缀查询时更慢）
+        weights = ', '.join(str(weight) for weight in SEARCH_WEIGHTS)
+        sql = (
+            f"SELECT search.rowid, {', '.join('e.' + column for column in COLUMNS)}, "
+            f"bm25(search, {weights}) AS score "
+            f"FROM search JOIN entries e ON e.rowid = search.rowid "
+            f"WHERE {' AND '.join(conditions)} ORDER BY score"
+        )
+        if limit:
+            sql += " LIMIT ?"
+            params.append(limit)
+        rows = self._fetch(sql, params)
+
+        results = []
+        for rowid, *columns, score in rows:
+            texts = self._fetch("SELECT summary, transcript, title FROM search WHERE rowid = ?", (rowid,))[0]
+            results.append(SearchResult(
+                entry=CatalogEntry(*columns),
+                score=score,
+                snippet=make_snippet(list(texts), query, SNIPPET_CHARS)
+            ))
+        return results
+
+    def get(self, key: str) -> Optional[CatalogEntry]:
+        """按内容ID或目录名查找"""
+        rows = self._fetch(
+            f"SELECT {', '.join(COLUMNS)} FROM entries WHERE video_id = ? OR folder = ? LIMIT 1",
+            (key, key)
+        )
+        return CatalogEntry(*rows[0]) if rows else None
+
+    def count(self) -> int:
+        return self._fetch("SELECT COUNT(*) FROM entries")[0][0]
+
+    def reindex(self, output_dir: Path, workers: int = REINDEX_WORKERS, signatures: bool = True) -> Tuple[int, int]:
+        """
+        从输出目录下的已有文件夹并行重建索引和全文索引（整体替换）
+        先清空索引，再按批读取文件夹、每批一个写事务，内存中最多保留一批的转录和摘要
+        signatures: 是否计算转录签名（未启用重复检测时跳过）
+        返回 (索引条目数, 跳过的文件夹数)
+        """
+        folders = [
+            Path(entry.path) for entry in os.scandir(output_dir)
+            if entry.is_dir() and not entry.name.startswith('.')
+        ]
+        # 转录可能已压缩，共用一个解码器（字典只加载一次）
+        read = partial(_read_folder, codec=TranscriptCodec(output_dir), signatures=signatures)
+
+        with self._write() as conn:
+            conn.execute("DELETE FROM entries")
+            conn.execute("DELETE FROM search")
+            conn.execute("DELETE FROM fingerprints")
+            conn.execute("DELETE FROM fingerprint_bands")
+
+        indexed = skipped = 0
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            for start in range(0, len(folders), REINDEX_BATCH):
+                batch = folders[start:start + REINDEX_BATCH]
+                records = [record for record in executor.map(read, batch) if record is not None]
+                with self._write() as conn:
+                    for entry, document, signature in records:
+                        self._upsert(conn, entry, document, signature)
+                indexed += len(records)
+                skipped += len(batch) - len(records)
+
+        # 合并索引段，提高查询速度
+        with self._write() as conn:
+            conn.execute("INSERT INTO search (search) VALUES ('optimize')")
+        return indexed, skipped
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+# 单例实例
+_catalog = None
+
+
+def get_catalog(output_dir: Optional[Path] = None) -> Catalog:
+    """获取归档目录索引实例"""
+    global _catalog
+    if _catalog is None:
+        if output_dir is None:
+            from ..config import get_output_dir
+            output_dir = get_output_dir()
+        _catalog = Catalog(Path(output_dir) / CATALOG_NAME)
+    return _catalog
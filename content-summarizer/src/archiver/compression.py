@@ -0,0 +1,287 @@
+"""转录文件压缩
+
+可选把 transcript.md 压缩保存为 transcript.md.gz 或 transcript.md.zst；
+zstd 可使用从已有转录训练的共享字典（对小文件效果明显）。
+字典按ID保存在 output/.dict/ 下且不覆盖，压缩数据中记录了字典ID，
+读取时按ID选择字典，重新训练不影响已压缩的文件。
+
+归档时不训练字典：还没有字典时新转录不使用字典压缩。运行 compact 模式时，
+若还没有字典，从已有转录（未压缩的或 .zst）抽样训练，
+并用新字典重新压缩之前未使用字典的 .zst 文件。
+"""
+import gzip
+import os
+import random
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+METHODS = ('none', 'gzip', 'zstd')
+SUFFIXES = {'gzip': '.gz', 'zstd': '.zst'}
+
+TRANSCRIPT_NAME = 'transcript.md'
+DICT_DIR = '.dict'
+
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 10
+# 字典大小和训练样本数
+DICT_SIZE = 110 * 1024
+DICT_SAMPLES = 2000
+# 每个样本只读取开头部分（字典主要学习文件头和常见句式，不需要完整转录）
+DICT_SAMPLE_BYTES = 64 * 1024
+# zstd 帧头的最大长度（其中记录了字典ID）
+ZSTD_HEADER_SIZE = 18
+
+# 压缩现有归档时的并行线程数（zlib / zstd 压缩时释放GIL）
+COMPACT_WORKERS = 8
+
+
+def resolve_method(method: str) -> str:
+    """检查压缩方式，未安装 zstandard 时回退到 gzip"""
+    if method not in METHODS:
+        raise ValueError(f"不支持的压缩方式: {method}（可选 {' / '.join(METHODS)}）")
+    if method == 'zstd' and zstandard is None:
+        print("[!] 未安装 zstandard，转录改用 gzip 压缩: pip install zstandard")
+        return 'gzip'
+    return method
+
+
+def find_transcript(folder: Path) -> Optional[Path]:
+    """归档目录中的转录文件（未压缩或压缩的任一种）"""
+    for suffix in ('',) + tuple(SUFFIXES.values()):
+        path = folder / (TRANSCRIPT_NAME + suffix)
+        if path.exists():
+            return path
+    return None
+
+
+@dataclass
+class CompactStats:
+    """压缩现有归档的统计"""
+    converted: int = 0
+    failed: int = 0
+    before: int = 0   # 压缩前总字节数
+    after: int = 0    # 压缩后总字节数
+
+    def summary(self) -> str:
+        saved = self.before - self.after
+        ratio = saved / self.before * 100 if self.before else 0.0
+        return (f"转换 {self.converted} 个（失败 {self.failed}），"
+                f"{self.before / 1024 / 1024:.1f}MB -> {self.after / 1024 / 1024:.1f}MB，"
+                f"节省 {saved / 1024 / 1024:.1f}MB（{ratio:.0f}%）")
+
+
+class TranscriptCodec:
+    """转录文件的压缩与读取"""
+
+    def __init__(self, output_dir: Path, method: str = 'none'):
+        self.output_dir = Path(output_dir)
+        self.method = resolve_method(method)
+        self.dict_dir = self.output_dir / DICT_DIR
+        self._dicts: Optional[Dict[int, "zstandard.ZstdCompressionDict"]] = None
+        self._current: Optional["zstandard.ZstdCompressionDict"] = None
+        # 每个线程一个压缩器（压缩器不是线程安全的；创建时要处理字典，不宜每次新建）
+        self._local = threading.local()
+
+    @property
+    def filename(self) -> str:
+        """写入新转录时使用的文件名"""
+        return TRANSCRIPT_NAME + SUFFIXES.get(self.method, '')
+
+    def _load_dicts(self) -> Dict[int, "zstandard.ZstdCompressionDict"]:
+        """加载全部字典，最新的一个用于压缩"""
+        if self._dicts is None:
+            dicts, newest = {}, None
+            if zstandard is not None and self.dict_dir.is_dir():
+                for path in sorted(self.dict_dir.glob('transcript-*.zdict'), key=lambda p: p.stat().st_mtime):
+                    dictionary = zstandard.ZstdCompressionDict(path.read_bytes())
+                    dicts[dictionary.dict_id()] = dictionary
+                    newest = dictionary
+            self._dicts, self._current = dicts, newest
+        return self._dicts
+
+    @property
+    def has_dictionary(self) -> bool:
+        self._load_dicts()
+        return self._current is not None
+
+    def train(self, samples: List[bytes]) -> Optional[int]:
+        """用样本训练新字典并保存，返回字典ID；样本不足时返回None"""
+        if zstandard is None:
+            return None
+        try:
+            dictionary = zstandard.train_dictionary(DICT_SIZE, samples)
+        except zstandard.ZstdError as e:
+            print(f"[!] 字典训练失败: {e}")
+            return None
+        self.dict_dir.mkdir(parents=True, exist_ok=True)
+        path = self.dict_dir / f"transcript-{dictionary.dict_id()}.zdict"
+        tmp_path = path.with_suffix('.tmp')
+        tmp_path.write_bytes(dictionary.as_bytes())
+        os.replace(tmp_path, path)
+        self._dicts = None
+        self._local = threading.local()
+        return dictionary.dict_id()
+
+    def compress(self, data: bytes) -> bytes:
+        if self.method == 'gzip':
+            return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+        if self.method == 'zstd':
+            compressor = getattr(self._local, 'compressor', None)
+            if compressor is None:
+                self._load_dicts()
+                compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL, dict_data=self._current)
+                self._local.compressor = compressor
+            return compressor.compress(data)
+        return data
+
+    def _dictionary_for(self, data: bytes) -> Optional["zstandard.ZstdCompressionDict"]:
+        """zstd 数据（至少包含帧头）使用的字典，未使用字典时返回None"""
+        dict_id = zstandard.get_frame_parameters(data).dict_id
+        if not dict_id:
+            return None
+        dictionary = self._load_dicts().get(dict_id)
+        if dictionary is None:
+            raise RuntimeError(f"缺少压缩字典 {dict_id}（{self.dict_dir}）")
+        return dictionary
+
+    def decompress(self, data: bytes, suffix: str) -> bytes:
+        """按文件后缀解压，数据损坏时抛出 ValueError"""
+        if suffix == SUFFIXES['gzip']:
+            try:
+                return gzip.decompress(data)
+            except (OSError, EOFError, zlib.error) as e:
+                raise ValueError(f"gzip解压失败: {e}") from e
+        if suffix == SUFFIXES['zstd']:
+            if zstandard is None:
+                raise RuntimeError("读取 .zst 转录需要安装 zstandard: pip install zstandard")
+            try:
+                return zstandard.ZstdDecompressor(dict_data=self._dictionary_for(data)).decompress(data)
+            except zstandard.ZstdError as e:
+                raise ValueError(f"zstd解压失败: {e}") from e
+        return data
+
+    def read(self, folder: Path) -> Optional[str]:
+        """读取归档目录中的转录（按需解压），没有转录文件时返回None"""
+        path = find_transcript(folder)
+        if path is None:
+            return None
+        data = self.decompress(path.read_bytes(), path.suffix if path.name != TRANSCRIPT_NAME else '')
+        return data.decode('utf-8')
+
+    def _read_prefix(self, path: Path, size: int) -> bytes:
+        """读取未压缩或 .zst 转录解压后的开头 size 字节（用作字典训练样本）"""
+        with open(path, 'rb') as f:
+            if path.suffix != SUFFIXES['zstd']:
+                return f.read(size)
+            try:
+                dictionary = self._dictionary_for(f.read(ZSTD_HEADER_SIZE))
+                f.seek(0)
+                chunks, remaining = [], size
+                with zstandard.ZstdDecompressor(dict_data=dictionary).stream_reader(f) as reader:
+                    while remaining > 0:
+                        chunk = reader.read(remaining)
+                        if not chunk:
+                            break
+                        chunks.append(chunk)
+                        remaining -= len(chunk)
+            except zstandard.ZstdError as e:
+                raise ValueError(f"zstd解压失败: {e}") from e
+            return b''.join(chunks)
+
+    def _without_dictionary(self, path: Path) -> bool:
+        """.zst 文件是否没有使用字典压缩"""
+        with open(path, 'rb') as f:
+            header = f.read(ZSTD_HEADER_SIZE)
+        try:
+            return not zstandard.get_frame_parameters(header).dict_id
+        except zstandard.ZstdError:
+            return False
+
+    def compact(self, folder: Path) -> Tuple[int, int]:
+        """
+        把转录转为当前压缩格式，返回 (转换前字节数, 转换后字节数)
+        未压缩的 transcript.md 压缩后删除原文件；.zst 文件解压后用当前字典重新压缩
+        压缩文件写完并落盘后才替换或删除原文件
+        """
+        source = find_transcript(folder)
+        if source is None:
+            raise FileNotFoundError(f"没有转录文件: {folder}")
+        original = source.read_bytes()
+        data = original if source.name == TRANSCRIPT_NAME else self.decompress(original, source.suffix)
+        compressed = self.compress(data)
+        target = folder / self.filename
+        tmp_path = target.with_name(target.name + '.tmp')
+        with open(tmp_path, 'wb') as f:
+            f.write(compressed)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, target)
+        if source != target:
+            source.unlink()
+        return len(original), len(compressed)
+
+    def compact_archive(self, workers: int = COMPACT_WORKERS) -> CompactStats:
+        """
+        并行压缩输出目录下所有未压缩的转录
+        zstd 且还没有字典时，先从已有转录抽样训练字典，并重新压缩未使用字典的 .zst 文件
+        """
+        if self.method == 'none':
+            raise ValueError("未启用转录压缩，请设置 output.transcript_compression 为 gzip 或 zstd")
+
+        plain, zst = [], []
+        for entry in os.scandir(self.output_dir):
+            if not entry.is_dir() or entry.name.startswith('.'):
+                continue
+            path = find_transcript(Path(entry.path))
+            if path is None:
+                continue
+            if path.name == TRANSCRIPT_NAME:
+                plain.append(path)
+            elif path.suffix == SUFFIXES['zstd']:
+                zst.append(path)
+
+        folders = [path.parent for path in plain]
+        if self.method == 'zstd' and not self.has_dictionary:
+            candidates = plain + zst
+            if candidates:
+                sample_paths = random.sample(candidates, min(DICT_SAMPLES, len(candidates)))
+                samples = []
+                for path in sample_paths:
+                    try:
+                        samples.append(self._read_prefix(path, DICT_SAMPLE_BYTES))
+                    except (OSError, ValueError, RuntimeError) as e:
+                        print(f"[!] 读取样本失败 {path.parent.name}: {e}")
+                dict_id = self.train(samples)
+                if dict_id is not None:
+                    print(f"[OK] 已从 {len(samples)} 个转录训练压缩字典 {dict_id}")
+            if self.has_dictionary:
+                folders += [path.parent for path in zst if self._without_dictionary(path)]
+
+        stats = CompactStats()
+
+        def convert(folder: Path) -> Optional[Tuple[int, int]]:
+            try:
+                return self.compact(folder)
+            except (OSError, ValueError, RuntimeError) as e:
+                print(f"[X] 压缩失败 {folder.name}: {e}")
+                return None
+
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            for result in executor.map(convert, folders):
+                if result is None:
+                    stats.failed += 1
+                    continue
+                stats.converted += 1
+                stats.before += result[0]
+                stats.after += result[1]
+        return stats
@@ -0,0 +1,99 @@
+"""转录近似重复检测
+
+同一场演讲常被重新上传到不同平台，视频ID不同但转录几乎一样。
+转录规范化（去掉时间戳、标点和空白，英文转小写）后取字符 5-gram，
+计算 MinHash 签名估计两份转录的 Jaccard 相似度。
+签名按 LSH 分成若干段，任意一段完全相同即为候选，再用完整签名计算相似度与阈值比较，
+查找只需几次索引查询，与已归档数量基本无关。
+"""
+import hashlib
+import re
+import struct
+import zlib
+from typing import List, Optional
+
+try:
+    import numpy as np
+except ImportError:  # numpy 可选，没有时使用纯Python实现（结果相同）
+    np = None
+
+
+SHINGLE_SIZE = 5
+NUM_PERM = 128
+# LSH 分段：32段 x 4行，相似度 0.5 时成为候选的概率约 87%，0.8 时接近 100%
+BANDS = 32
+ROWS = NUM_PERM // BANDS
+# 规范化后短于该长度的转录不做检测（短文本容易误判）
+MIN_CHARS = 200
+
+TIMESTAMP_PATTERN = re.compile(r'\[\d{1,2}:\d{2}(?::\d{2})?\]')
+NON_WORD_PATTERN = re.compile(r'[\W_]+')
+
+_MERSENNE = (1 << 61) - 1
+_MASK64 = (1 << 64) - 1
+_MASK32 = 0xFFFFFFFF
+
+
+def _coefficient(name: str) -> int:
+    digest = hashlib.blake2b(name.encode('ascii'), digest_size=8).digest()
+    return int.from_bytes(digest, 'little') % _MERSENNE
+
+
+# 哈希函数 (a * x + b) mod p，系数由固定名称派生，签名可跨进程、跨版本比较
+_PERMUTATIONS = [(_coefficient(f"a{i}") or 1, _coefficient(f"b{i}")) for i in range(NUM_PERM)]
+
+
+def normalize(text: str) -> str:
+    """去掉时间戳、标点和空白，英文转小写"""
+    return NON_WORD_PATTERN.sub('', TIMESTAMP_PATTERN.sub('', text)).lower()
+
+
+def _min_hashes(shingles: List[int]) -> List[int]:
+    if np is not None:
+        values = np.array(shingles, dtype=np.uint64)
+        a = np.array([p[0] for p in _PERMUTATIONS], dtype=np.uint64)
+        b = np.array([p[1] for p in _PERMUTATIONS], dtype=np.uint64)
+        result = []
+        # 分批计算，控制临时数组大小；uint64 乘法溢出时回绕，与纯Python实现中的 & _MASK64 一致
+        for start in range(0, NUM_PERM, 16):
+            hashed = (a[start:start + 16, None] * values + b[start:start + 16, None]) % np.uint64(_MERSENNE)
+            result.extend(int(value) for value in hashed.min(axis=1) & np.uint64(_MASK32))
+        return result
+    return [
+        min(((a * value + b) & _MASK64) % _MERSENNE for value in shingles) & _MASK32
+        for a, b in _PERMUTATIONS
+    ]
+
+
+def signature(text: str) -> Optional[List[int]]:
+    """计算转录的 MinHash 签名，内容过短时返回None"""
+    normalized = normalize(text)
+    if len(normalized) < MIN_CHARS:
+        return None
+    shingles = {
+        zlib.crc32(normalized[i:i + SHINGLE_SIZE].encode('utf-8'))
+        for i in range(len(normalized) - SHINGLE_SIZE + 1)
+    }
+    return _min_hashes(list(shingles))
+
+
+def similarity(first: List[int], second: List[int]) -> float:
+    """由签名估计的 Jaccard 相似度"""
+    return sum(x == y for x, y in zip(first, second)) / NUM_PERM
+
+
+def band_keys(sig: List[int]) -> List[int]:
+    """签名各段的哈希（有符号64位整数，可直接存入SQLite）"""
+    keys = []
+    for band in range(BANDS):
+        data = struct.pack(f'<{ROWS}I', *sig[band * ROWS:(band + 1) * ROWS])
+        keys.append(int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), 'little', signed=True))
+    return keys
+
+
+def pack(sig: List[int]) -> bytes:
+    return struct.pack(f'<{NUM_PERM}I', *sig)
+
+
+def unpack(data: bytes) -> List[int]:
+    return list(struct.unpack(f'<{NUM_PERM}I', data))
@@ -0,0 +1,105 @@
+"""归档全文检索的分词与结果处理
+
+SQLite FTS5 自带的 unicode61 分词器会把一整段连续的中文当作一个词，无法检索。
+写入索引前把中日韩文字切成重叠的二元组（"人工智能" -> "人工 工智 智能"），
+查询时按同样的方式切分并作为短语匹配，相当于子串检索。
+英文和数字保持原样，由 unicode61 分词（不区分大小写）。
+"""
+import re
+from dataclasses import dataclass
+from typing import List
+
+
+# 中日韩文字（不含标点）
+CJK_RUN_PATTERN = re.compile(r'[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af]+')
+# 分词时插入的分隔符，unicode61 视为分隔，还原时删除
+SEPARATOR = '\x1f'
+BIGRAM_CHAIN_PATTERN = re.compile(
+    r'[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af]{2}'
+    r'(?:\x1f[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af]{2})+'
+)
+# 与 unicode61 一致的词（字母、数字，二元组也是一个词）
+WORD_PATTERN = re.compile(r'\w+')
+
+# 结果摘录中匹配词的标记
+HIGHLIGHT_START = '【'
+HIGHLIGHT_END = '】'
+
+
+@dataclass
+class SearchDocument:
+    """待索引的文本"""
+    title: str
+    summary: str
+    transcript: str
+
+
+def _bigrams(match: "re.Match") -> str:
+    run = match.group()
+    if len(run) == 1:
+        return SEPARATOR + run + SEPARATOR
+    grams = SEPARATOR.join(run[i:i + 2] for i in range(len(run) - 1))
+    return SEPARATOR + grams + SEPARATOR
+
+
+def tokenize(text: str) -> str:
+    """把中日韩文字切成二元组，用于写入索引"""
+    return CJK_RUN_PATTERN.sub(_bigrams, text)
+
+
+def _merge_chain(match: "re.Match") -> str:
+    grams = match.group().split(SEPARATOR)
+    return grams[0] + ''.join(gram[1] for gram in grams[1:])
+
+
+def detokenize(text: str) -> str:
+    """把索引中的二元组还原为原文"""
+    return BIGRAM_CHAIN_PATTERN.sub(_merge_chain, text).replace(SEPARATOR, '')
+
+
+def query_terms(query: str) -> List[str]:
+    """查询中的各个词（按空白切分）"""
+    return [term for term in query.split() if term]
+
+
+def build_match(query: str) -> str:
+    """
+    生成 FTS5 MATCH 表达式：每个词作为短语，多个词同时匹配
+    单个汉字按前缀匹配（匹配以该字开头的二元组）
+    没有可检索内容时返回空字符串
+    """
+    phrases = []
+    for term in query_terms(query):
+        tokens = WORD_PATTERN.findall(tokenize(term).replace(SEPARATOR, ' '))
+        if not tokens:
+            continue
+        if len(tokens) == 1 and len(tokens[0]) == 1 and CJK_RUN_PATTERN.fullmatch(tokens[0]):
+            phrases.append(f'"{tokens[0]}"*')
+        else:
+            phrases.append('"' + ' '.join(tokens) + '"')
+    return ' '.join(phrases)
+
+
+def make_snippet(texts: List[str], query: str, width: int = 60) -> str:
+    """
+    从索引文本中截取第一个匹配处前后的原文，并标出查询词
+    texts: 按优先顺序排列的各列文本（二元组切分后的）
+    """
+    terms = sorted(query_terms(query), key=len, reverse=True)
+    pattern = re.compile('|'.join(re.escape(term) for term in terms), re.IGNORECASE)
+    fallback = ''
+    for text in texts:
+        if not text:
+            continue
+        text = ' '.join(detokenize(text).split())
+        fallback = fallback or text
+        match = pattern.search(text)
+        if match is None:
+            continue
+        start = max(0, match.start() - width // 3)
+        end = min(len(text), start + width)
+        snippet = text[start:end]
+        snippet = pattern.sub(lambda m: f"{HIGHLIGHT_START}{m.group()}{HIGHLIGHT_END}", snippet)
+        return ('…' if start > 0 else '') + snippet + ('…' if end < len(text) else '')
+    # 匹配跨越了标点等分隔（如查询 "GPT 4" 匹配 "GPT-4"），取开头
+    return fallback[:width]
@@ -1,25 +1,110 @@
-"""归档模块"""
+"""归档模块
+
+每个内容先完整写入 output/.staging/ 下的临时目录，再用一次重命名发布为最终目录，
+中途失败或崩溃不会留下看起来完整、实际缺文件的归档。
+"""
 import json
+import os
 import shutil
+import tempfile
+import time
 from pathlib import Path
 from datetime import datetime
-from typing import Optional
+from typing import Any, Dict, List, Optional
 from dataclasses import asdict
 
-from ..fetcher.base import MediaItem
+from ..fetcher.base import MediaItem, detect_url_type
 from ..summarizer.openai_client import SummaryResult
+from .catalog import entry_from_metadata, get_catalog
+from .compression import TranscriptCodec
+from .search import SearchDocument
+
+
+# 流式生成中的部分摘要存放目录（输出目录下）
+PARTIAL_DIR = '.partial'
+# 归档组装目录（输出目录下，与最终目录在同一文件系统，保证重命名是原子的）
+STAGING_DIR = '.staging'
+# 超过该时间(秒)的组装目录视为崩溃残留，启动时清理
+STAGING_TTL = 3600
+
+FSYNC_POLICIES = ('none', 'file', 'dir')
+
+# summary.md 中摘要正文的起止标记（与 _write_summary 的格式一致）
+SUMMARY_BODY_START = '## 摘要正文\n\n'
+SUMMARY_BODY_END = '\n\n---\n\n*本文由'
+
+
+def _fsync_dir(path: Path) -> None:
+    """fsync目录，使其中的创建、重命名持久化（Windows不支持，忽略）"""
+    try:
+        fd = os.open(str(path), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
 
 
 class Archiver:
     """内容归档器"""
 
-    def __init__(self, output_dir: Optional[Path] = None):
+    def __init__(
+        self,
+        output_dir: Optional[Path] = None,
+        fsync: Optional[str] = None,
+        compression: Optional[str] = None
+    ):
+        """
+        fsync: 落盘策略 none | file | dir，默认读取 output.fsync 配置
+        compression: 转录压缩 none | gzip | zstd，默认读取 output.transcript_compression 配置
+        """
         if output_dir is None:
             from ..config import get_output_dir
             output_dir = get_output_dir()
+        if fsync is None or compression is None:
+            from ..config import load_config
+            output_config = load_config().output
+            fsync = fsync or output_config.fsync
+            compression = compression or output_config.transcript_compression
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"不支持的落盘策略: {fsync}（可选 {' / '.join(FSYNC_POLICIES)}）")
 
         self.output_dir = Path(output_dir)
         self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.fsync = fsync
+        self.codec = TranscriptCodec(self.output_dir, compression)
+        self.staging_dir = self.output_dir / STAGING_DIR
+        self.staging_dir.mkdir(exist_ok=True)
+        self._clean_staging()
+        self.catalog = get_catalog(self.output_dir)
+
+    def _clean_staging(self) -> None:
+        """清理崩溃残留的组装目录（其他进程正在使用的较新目录保留）"""
+        cutoff = time.time() - STAGING_TTL
+        for entry in os.scandir(self.staging_dir):
+            try:
+                if entry.stat().st_mtime < cutoff:
+                    if entry.is_dir():
+                        shutil.rmtree(entry.path, ignore_errors=True)
+                    else:
+                        os.unlink(entry.path)
+            except OSError:
+                pass
+
+    def _write_file(self, path: Path, content: str) -> None:
+        """写入文本文件，按落盘策略fsync"""
+        self._write_bytes(path, content.encode('utf-8'))
+
+    def _write_bytes(self, path: Path, content: bytes) -> None:
+        """写入文件，按落盘策略fsync"""
+        with open(path, 'wb') as f:
+            f.write(content)
+            if self.fsync != 'none':
+                f.flush()
+                os.fsync(f.fileno())
 
     def _sanitize_filename(self, name: str) -> str:
         """清理文件名中的非法字符"""
@@ -41,44 +126,119 @@ class Archiver:
         media: MediaItem,
         transcript: str,
         summary: SummaryResult,
-        cover_path: Optional[Path] = None
+        cover_path: Optional[Path] = None,
+        transcript_info: Optional[Dict[str, Any]] = None,
+        signature: Optional[List[int]] = None,
+        duplicate_of: Optional[Dict[str, Any]] = None
     ) -> Path:
         """
         归档内容
+        transcript_info: 转录来源（字幕语言、选择原因等），写入 metadata.json
+        signature: 转录的 MinHash 签名（由流水线在线程中计算；为None时不写入签名，如未启用重复检测）
+        duplicate_of: 重复的已归档内容（摘要复用自该内容），写入 metadata.json
         返回归档目录路径
         """
-        # 创建内容目录
         folder_name = self._create_folder_name(media)
         content_dir = self.output_dir / folder_name
-        content_dir.mkdir(parents=True, exist_ok=True)
-
-        # 1. 写入 metadata.json
-        self._write_metadata(content_dir, media, summary)
 
-        # 2. 写入 transcript.md
-        self._write_transcript(content_dir, media, transcript)
+        # 在组装目录中写入全部文件
+        staging = Path(tempfile.mkdtemp(prefix=f"{media.id}.", dir=self.staging_dir))
+        try:
+            # 1. 写入 metadata.json
+            metadata = self._write_metadata(staging, media, summary, transcript_info, duplicate_of)
+
+            # 2. 写入 transcript.md（按配置压缩）
+            transcript_text = self._write_transcript(staging, media, transcript)
+
+            # 3. 写入 summary.md
+            summary_text = self._write_summary(staging, media, summary)
+
+            # 4. 复制封面图
+            if cover_path and cover_path.exists():
+                dest_cover = staging / 'cover.jpg'
+                shutil.copyfile(cover_path, dest_cover)
+                if self.fsync != 'none':
+                    with open(dest_cover, 'rb') as f:
+                        os.fsync(f.fileno())
+
+            # mkdtemp 创建的目录权限为0700，改为普通目录权限
+            os.chmod(staging, 0o755)
+            if self.fsync == 'dir':
+                _fsync_dir(staging)
+
+            # 5. 发布：重命名为最终目录
+            self._publish(staging, content_dir)
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+        # 6. 清理流式生成时写出的部分摘要
+        shutil.rmtree(self._partial_dir(media), ignore_errors=True)
+
+        # 7. 更新目录索引、全文索引和转录签名
+        entry = entry_from_metadata(metadata, folder_name)
+        document = SearchDocument(
+            title=f"{entry.title_zh}\n{entry.title}",
+            summary=summary_text,
+            transcript=transcript_text
+        )
+        self.catalog.upsert(entry, document, signature)
 
-        # 3. 写入 summary.md
-        self._write_summary(content_dir, media, summary)
+        return content_dir
 
-        # 4. 复制封面图
-        if cover_path and cover_path.exists():
-            dest_cover = content_dir / 'cover.jpg'
-            shutil.copy2(cover_path, dest_cover)
-            # 清理临时封面目录
-            try:
-                cover_path.parent.rmdir()
-            except:
-                pass
+    def _publish(self, staging: Path, content_dir: Path) -> None:
+        """
+        把组装好的目录重命名为最终目录
+        已有同名归档（重新处理）时先把旧目录移入组装区，替换后再删除
+        """
+        replaced = None
+        if content_dir.exists():
+            replaced = Path(tempfile.mkdtemp(prefix=f"{content_dir.name[-40:]}.old.", dir=self.staging_dir))
+            os.rename(content_dir, replaced / content_dir.name)
+        try:
+            os.rename(staging, content_dir)
+        except BaseException:
+            if replaced is not None:
+                os.rename(replaced / content_dir.name, content_dir)
+                shutil.rmtree(replaced, ignore_errors=True)
+            raise
+
+        if self.fsync == 'dir':
+            _fsync_dir(self.output_dir)
+        if replaced is not None:
+            shutil.rmtree(replaced, ignore_errors=True)
+
+    def _partial_dir(self, media: MediaItem) -> Path:
+        return self.output_dir / PARTIAL_DIR / self._create_folder_name(media)
+
+    def write_partial(self, media: MediaItem, summary: SummaryResult) -> Path:
+        """
+        写出生成中的部分摘要（流式模式），归档完成后删除
+        返回 summary.md 路径
+        """
+        partial_dir = self._partial_dir(media)
+        partial_dir.mkdir(parents=True, exist_ok=True)
+        self._write_summary(partial_dir, media, summary)
+        return partial_dir / 'summary.md'
 
-        return content_dir
+    def _write_metadata(
+        self,
+        content_dir: Path,
+        media: MediaItem,
+        summary: SummaryResult,
+        transcript_info: Optional[Dict[str, Any]] = None,
+        duplicate_of: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """写入元数据文件，返回写入的内容"""
+        try:
+            source = detect_url_type(media.url)
+        except ValueError:
+            source = 'unknown'
 
-    def _write_metadata(self, content_dir: Path, media: MediaItem, summary: SummaryResult) -> None:
-        """写入元数据文件"""
         metadata = {
             'title': media.title,
             'title_zh': summary.title,
-            'source': 'youtube',  # TODO: 根据实际来源设置
+            'source': source,
             'source_url': media.url,
             'video_id': media.id,
             'published_at': media.published_at,
@@ -89,15 +249,17 @@ class Archiver:
             'insights': summary.insights,
             'quotes': summary.quotes,
             'guests': summary.guests,
+            'transcript': transcript_info,
             'created_at': datetime.now().isoformat()
         }
+        if duplicate_of:
+            metadata['duplicate_of'] = duplicate_of
 
-        metadata_path = content_dir / 'metadata.json'
-        with open(metadata_path, 'w', encoding='utf-8') as f:
-            json.dump(metadata, f, ensure_ascii=False, indent=2)
+        self._write_file(content_dir / 'metadata.json', json.dumps(metadata, ensure_ascii=False, indent=2))
+        return metadata
 
-    def _write_transcript(self, content_dir: Path, media: MediaItem, transcript: str) -> None:
-        """写入转录文件"""
+    def _write_transcript(self, content_dir: Path, media: MediaItem, transcript: str) -> str:
+        """写入转录文件，返回写入的内容"""
         content = f"""# {media.title}
 
 **原始标题**: {media.title}
@@ -112,12 +274,11 @@ class Archiver:
 {transcript}
 """
 
-        transcript_path = content_dir / 'transcript.md'
-        with open(transcript_path, 'w', encoding='utf-8') as f:
-            f.write(content)
+        self._write_bytes(content_dir / self.codec.filename, self.codec.compress(content.encode('utf-8')))
+        return content
 
-    def _write_summary(self, content_dir: Path, media: MediaItem, summary: SummaryResult) -> None:
-        """写入摘要文件"""
+    def _write_summary(self, content_dir: Path, media: MediaItem, summary: SummaryResult) -> str:
+        """写入摘要文件，返回写入的内容"""
         # 构建嘉宾部分
         guests_section = ""
         if summary.guests:
@@ -174,9 +335,32 @@ class Archiver:
 *处理时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}*
 """
 
-        summary_path = content_dir / 'summary.md'
-        with open(summary_path, 'w', encoding='utf-8') as f:
-            f.write(content)
+        self._write_file(content_dir / 'summary.md', content)
+        return content
+
+
+def read_summary(content_dir: Path) -> Optional[SummaryResult]:
+    """从已归档目录读取摘要（metadata.json 和 summary.md 中的正文），读取失败时返回None"""
+    try:
+        with open(content_dir / 'metadata.json', 'r', encoding='utf-8') as f:
+            metadata = json.load(f)
+        with open(content_dir / 'summary.md', 'r', encoding='utf-8') as f:
+            text = f.read()
+    except (OSError, ValueError):
+        return None
+
+    _, marker, body = text.partition(SUMMARY_BODY_START)
+    if not marker:
+        return None
+    body = body.rsplit(SUMMARY_BODY_END, 1)[0]
+    return SummaryResult(
+        title=metadata.get('title_zh') or metadata.get('title') or '',
+        core_points=metadata.get('core_points') or [],
+        insights=metadata.get('insights') or [],
+        quotes=metadata.get('quotes') or [],
+        guests=metadata.get('guests') or [],
+        summary=body
+    )
 
 
 # 单例实例
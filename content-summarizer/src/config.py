@@ -2,8 +2,8 @@
 import os
 import yaml
 from pathlib import Path
-from typing import Any, Dict, Optional
-from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+from dataclasses import dataclass, field
 
 
 # 项目根目录
@@ -18,6 +18,15 @@ class AIConfig:
     base_url: str
     model: str
     api_key: str
+    cache_enabled: bool = True  # 缓存AI响应，相同请求不重复调用
+    cache_max_mb: int = 200     # 缓存大小上限(MB)，超出后淘汰最久未使用的条目
+    max_concurrency: int = 4    # 同时进行的AI请求数上限
+    rpm: int = 0                # 每分钟请求数上限，0表示不限
+    tpm: int = 0                # 每分钟token数上限，0表示不限
+    max_retries: int = 5        # 限流、超时、服务端错误的最大重试次数
+    timeout: int = 120          # 单次请求超时(秒)
+    stream: bool = False        # 流式生成最终摘要，边生成边写出部分 summary.md
+    response_format: str = 'text'  # 摘要输出格式: text | json_object | tool
 
 
 @dataclass
@@ -25,6 +34,9 @@ class SummaryConfig:
     """摘要配置"""
     length: str
     custom_words: int
+    chunk_tokens: int = 6000        # 分段摘要时每段的token数
+    map_concurrency: int = 4        # 分段摘要并发数
+    chunked_threshold: int = 12000  # 转录超过该token数时使用分段摘要，0表示不分段
 
 
 @dataclass
@@ -32,6 +44,73 @@ class OutputConfig:
     """输出配置"""
     root: str
     format: str
+    fsync: str = 'file'   # 归档落盘策略: none | file | dir
+    transcript_compression: str = 'none'   # 转录压缩: none | gzip | zstd
+
+
+@dataclass
+class PipelineConfig:
+    """批量流水线配置"""
+    fetch_workers: int = 2    # 抓取阶段并发数
+    llm_workers: int = 2      # AI改写阶段并发数
+    archive_workers: int = 1  # 归档阶段并发数
+    queue_size: int = 4       # 阶段间队列容量
+
+
+@dataclass
+class FetcherConfig:
+    """抓取配置"""
+    max_processes: int = 4  # 同时运行的yt-dlp进程上限
+    timeout: int = 300      # 单次yt-dlp调用超时(秒)
+    backend: str = 'subprocess'  # 执行后端: subprocess | inprocess
+    cache_ttl: int = 6 * 3600      # 信息缓存有效期(秒)，0表示永不过期
+    cache_max_entries: int = 5000  # 信息缓存条目上限
+    cache_memory_entries: int = 128  # 内存层条目数
+
+
+@dataclass
+class ScanConfig:
+    """订阅源扫描配置"""
+    window: int = 20     # 增量扫描初始窗口（条目数）
+    max_window: int = 0  # 窗口上限，0表示不限制（首次扫描时枚举全部）
+    timeout: int = 180   # 单个订阅源扫描超时(秒)
+    # 各平台限流 {平台: {rate: 每秒请求数, burst: 突发上限}}
+    rate_limits: Dict[str, Dict[str, float]] = field(default_factory=lambda: {
+        'youtube': {'rate': 0.5, 'burst': 3},
+        'bilibili': {'rate': 0.2, 'burst': 1},
+        'xiaoyuzhou': {'rate': 1.0, 'burst': 5},
+    })
+
+
+@dataclass
+class TranscriptConfig:
+    """转录配置"""
+    timestamp_interval: int = 0  # 段落时间戳间隔(秒)，0表示不插入
+    # 字幕语言优先级，手动字幕总是优先于自动字幕
+    languages: List[str] = field(default_factory=lambda: ['zh-CN', 'zh-Hans', 'zh', 'zh-Hant', 'zh-TW', 'en'])
+
+
+@dataclass
+class DedupConfig:
+    """重复内容检测配置（跨平台重新上传的同一内容复用已有摘要）"""
+    enabled: bool = True
+    threshold: float = 0.7  # 转录相似度（Jaccard，0-1）不低于该值视为重复
+
+
+@dataclass
+class ASRConfig:
+    """本地语音识别配置（无字幕时使用）"""
+    enabled: bool = True
+    engine: str = 'faster-whisper'  # 引擎名称，或 "模块路径:类名"
+    model: str = 'small'            # 模型: base / small / medium / large-v3
+    device: str = 'cpu'
+    compute_type: str = 'int8'
+    language: str = ''              # 识别语言，留空自动检测
+    workers: int = 2                # 并行识别的进程数
+    chunk_seconds: int = 60         # 片段目标长度(秒)，在之后的静音处切开
+    min_silence: float = 0.5        # 可切分的最短静音(秒)
+    silence_threshold: float = -40.0  # 静音阈值(dBFS)
+    timeout: int = 1800             # 语音识别总超时(秒)
 
 
 @dataclass
@@ -50,6 +129,12 @@ class Config:
     ai: AIConfig
     summary: SummaryConfig
     output: OutputConfig
+    pipeline: PipelineConfig = field(default_factory=PipelineConfig)
+    fetcher: FetcherConfig = field(default_factory=FetcherConfig)
+    scan: ScanConfig = field(default_factory=ScanConfig)
+    transcript: TranscriptConfig = field(default_factory=TranscriptConfig)
+    asr: ASRConfig = field(default_factory=ASRConfig)
+    dedup: DedupConfig = field(default_factory=DedupConfig)
 
 
 def load_yaml(file_path: Path) -> Dict[str, Any]:
@@ -93,21 +178,96 @@ def load_config(config_path: Optional[Path] = None) -> Config:
         provider=ai_data.get('provider', 'openai'),
         base_url=ai_data.get('base_url', 'https://api.openai.com/v1'),
         model=ai_data.get('model', 'gpt-4o-mini'),
-        api_key=ai_data.get('api_key', '')
+        api_key=ai_data.get('api_key', ''),
+        cache_enabled=ai_data.get('cache_enabled', True),
+        cache_max_mb=ai_data.get('cache_max_mb', 200),
+        max_concurrency=ai_data.get('max_concurrency', 4),
+        rpm=ai_data.get('rpm', 0),
+        tpm=ai_data.get('tpm', 0),
+        max_retries=ai_data.get('max_retries', 5),
+        timeout=ai_data.get('timeout', 120),
+        stream=ai_data.get('stream', False),
+        response_format=ai_data.get('response_format', 'text')
     )
 
     # 构建摘要配置
     summary_data = data.get('summary', {})
     summary_config = SummaryConfig(
         length=summary_data.get('length', 'medium'),
-        custom_words=summary_data.get('custom_words', 2000)
+        custom_words=summary_data.get('custom_words', 2000),
+        chunk_tokens=summary_data.get('chunk_tokens', 6000),
+        map_concurrency=summary_data.get('map_concurrency', 4),
+        chunked_threshold=summary_data.get('chunked_threshold', 12000)
     )
 
     # 构建输出配置
     output_data = data.get('output', {})
     output_config = OutputConfig(
         root=output_data.get('root', './output'),
-        format=output_data.get('format', 'markdown')
+        format=output_data.get('format', 'markdown'),
+        fsync=output_data.get('fsync', 'file'),
+        transcript_compression=output_data.get('transcript_compression', 'none')
+    )
+
+    # 构建流水线配置
+    pipeline_data = data.get('pipeline', {})
+    pipeline_config = PipelineConfig(
+        fetch_workers=pipeline_data.get('fetch_workers', 2),
+        llm_workers=pipeline_data.get('llm_workers', 2),
+        archive_workers=pipeline_data.get('archive_workers', 1),
+        queue_size=pipeline_data.get('queue_size', 4)
+    )
+
+    # 构建抓取配置
+    fetcher_data = data.get('fetcher', {})
+    fetcher_config = FetcherConfig(
+        max_processes=fetcher_data.get('max_processes', 4),
+        timeout=fetcher_data.get('timeout', 300),
+        backend=fetcher_data.get('backend', 'subprocess'),
+        cache_ttl=fetcher_data.get('cache_ttl', 6 * 3600),
+        cache_max_entries=fetcher_data.get('cache_max_entries', 5000),
+        cache_memory_entries=fetcher_data.get('cache_memory_entries', 128)
+    )
+
+    # 构建扫描配置
+    scan_data = data.get('scan', {})
+    scan_config = ScanConfig(
+        window=scan_data.get('window', 20),
+        max_window=scan_data.get('max_window', 0),
+        timeout=scan_data.get('timeout', 180)
+    )
+    if 'rate_limits' in scan_data:
+        scan_config.rate_limits.update(scan_data['rate_limits'] or {})
+
+    # 构建转录配置
+    transcript_data = data.get('transcript', {})
+    transcript_config = TranscriptConfig(
+        timestamp_interval=transcript_data.get('timestamp_interval', 0)
+    )
+    if transcript_data.get('languages'):
+        transcript_config.languages = list(transcript_data['languages'])
+
+    # 构建重复检测配置
+    dedup_data = data.get('dedup', {})
+    dedup_config = DedupConfig(
+        enabled=dedup_data.get('enabled', True),
+        threshold=dedup_data.get('threshold', 0.7)
+    )
+
+    # 构建语音识别配置
+    asr_data = data.get('asr', {})
+    asr_config = ASRConfig(
+        enabled=asr_data.get('enabled', True),
+        engine=asr_data.get('engine', 'faster-whisper'),
+        model=asr_data.get('model', 'small'),
+        device=asr_data.get('device', 'cpu'),
+        compute_type=asr_data.get('compute_type', 'int8'),
+        language=asr_data.get('language', ''),
+        workers=asr_data.get('workers', 2),
+        chunk_seconds=asr_data.get('chunk_seconds', 60),
+        min_silence=asr_data.get('min_silence', 0.5),
+        silence_threshold=asr_data.get('silence_threshold', -40.0),
+        timeout=asr_data.get('timeout', 1800)
     )
 
     # 构建订阅源列表
@@ -124,28 +284,19 @@ def load_config(config_path: Optional[Path] = None) -> Config:
         sources=sources,
         ai=ai_config,
         summary=summary_config,
-        output=output_config
+        output=output_config,
+        pipeline=pipeline_config,
+        fetcher=fetcher_config,
+        scan=scan_config,
+        transcript=transcript_config,
+        asr=asr_config,
+        dedup=dedup_config
     )
 
 
-def load_state() -> Dict[str, Any]:
-    """加载状态文件"""
-    state_path = CONFIG_DIR / "state.yaml"
-    if not state_path.exists():
-        return {'version': '1.0', 'last_scan': None, 'processed': {}}
-    return load_yaml(state_path)
-
-
-def save_state(state: Dict[str, Any]) -> None:
-    """保存状态文件"""
-    state_path = CONFIG_DIR / "state.yaml"
-    with open(state_path, 'w', encoding='utf-8') as f:
-        yaml.dump(state, f, allow_unicode=True, default_flow_style=False)
-
-
-def load_prompt_template() -> str:
-    """加载AI改写提示词模板"""
-    prompt_path = CONFIG_DIR / "rewrite-prompt.md"
+def load_prompt_template(name: str = "rewrite-prompt.md") -> str:
+    """加载提示词模板（默认为AI改写提示词）"""
+    prompt_path = CONFIG_DIR / name
     if not prompt_path.exists():
         raise FileNotFoundError(f"提示词模板不存在: {prompt_path}")
 
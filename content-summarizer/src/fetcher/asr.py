@@ -0,0 +1,497 @@
+"""本地语音识别（无字幕时的回退方案）
+
+只下载音频，yt-dlp 输出到管道直接交给 ffmpeg 解码为 16kHz 单声道 PCM，
+PCM帧经环形缓冲区按静音切分成片段，在进程池中并行转录（CPU），最后按原顺序拼接。
+全程不写临时文件，第一个片段切好后即开始识别。
+
+识别引擎可替换：内置 faster-whisper（可选依赖），
+也可以通过 register_engine() 注册，或在配置中写 "模块路径:类名"。
+工作进程以 spawn 方式启动，注册的引擎按 "模块路径:类名" 传给工作进程导入，
+因此引擎类必须定义在可导入模块的顶层（不能是函数内定义的类）。
+
+yt-dlp 进程只在下载期间占用全局进程名额；同时进行的识别数由 workers 单独限制。
+"""
+import asyncio
+import importlib
+import importlib.util
+import inspect
+import math
+import multiprocessing
+import os
+import sys
+import time
+from abc import ABC, abstractmethod
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from asyncio.subprocess import Process
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Type
+
+try:
+    import numpy as np
+except ImportError:  # numpy 随 faster-whisper 安装，静音检测在没有numpy时使用纯Python实现
+    np = None
+
+from .runner import count_spawn, get_semaphore, kill_process_tree
+
+
+SAMPLE_RATE = 16000
+SAMPLE_WIDTH = 2  # s16le
+FRAME_MS = 30
+FRAME_BYTES = SAMPLE_RATE * FRAME_MS // 1000 * SAMPLE_WIDTH
+# 环形缓冲区容量（帧），约30秒音频
+RING_FRAMES = 1000
+READ_SIZE = 64 * 1024
+
+# 解码命令：从stdin读取任意格式音频，输出 16kHz 单声道 s16le PCM
+DECODER_CMD = [
+    'ffmpeg', '-nostdin', '-hide_banner', '-loglevel', 'error',
+    '-i', 'pipe:0',
+    '-f', 's16le', '-ac', '1', '-ar', str(SAMPLE_RATE),
+    'pipe:1'
+]
+
+# 默认配置，可通过 configure() 覆盖
+_enabled = True
+_engine = 'faster-whisper'
+_engine_options: Dict[str, Any] = {'model': 'small', 'device': 'cpu', 'compute_type': 'int8', 'language': None}
+_workers = 2
+_chunk_seconds = 60
+_min_silence = 0.5
+_silence_threshold = -40.0
+_timeout = 1800
+
+# 同时进行的识别数
+_stream_semaphore: Optional[asyncio.Semaphore] = None
+
+
+class ASREngine(ABC):
+    """语音识别引擎接口，在进程池的每个工作进程中各创建一个实例"""
+
+    name = 'base'
+
+    @abstractmethod
+    def transcribe(self, pcm: bytes) -> str:
+        """转录一段 16kHz 单声道 s16le PCM 音频，返回文本"""
+        pass
+
+
+class FasterWhisperEngine(ASREngine):
+    """faster-whisper 引擎"""
+
+    name = 'faster-whisper'
+
+    def __init__(
+        self,
+        model: str = 'small',
+        device: str = 'cpu',
+        compute_type: str = 'int8',
+        language: Optional[str] = None,
+        cpu_threads: int = 0
+    ):
+        from faster_whisper import WhisperModel
+        self.language = language or None
+        self.model = WhisperModel(model, device=device, compute_type=compute_type, cpu_threads=cpu_threads)
+
+    @staticmethod
+    def is_available() -> bool:
+        return importlib.util.find_spec('faster_whisper') is not None
+
+    def transcribe(self, pcm: bytes) -> str:
+        audio = np.frombuffer(pcm, dtype=np.int16).astype(np.float32) / 32768.0
+        segments, _ = self.model.transcribe(audio, language=self.language, beam_size=5)
+        return '\n'.join(segment.text.strip() for segment in segments if segment.text.strip())
+
+
+ENGINES: Dict[str, Type[ASREngine]] = {
+    'faster-whisper': FasterWhisperEngine,
+}
+
+
+def register_engine(name: str, engine_class: Type[ASREngine]) -> None:
+    """注册识别引擎（需在首次转录前调用，引擎类须定义在可导入模块的顶层）"""
+    if '<locals>' in engine_class.__qualname__:
+        raise ValueError(f"识别引擎须定义在模块顶层: {engine_class.__qualname__}")
+    ENGINES[name] = engine_class
+
+
+def _engine_path(name: str) -> str:
+    """把引擎名称解析为工作进程可导入的 "模块路径:类名" """
+    engine_class = _resolve_engine(name)
+    return f"{engine_class.__module__}:{engine_class.__qualname__}"
+
+
+def _resolve_engine(name: str) -> Type[ASREngine]:
+    """按名称或 "模块路径:类名" 查找引擎类"""
+    if name in ENGINES:
+        return ENGINES[name]
+    if ':' in name:
+        module_name, class_name = name.split(':', 1)
+        return getattr(importlib.import_module(module_name), class_name)
+    raise ValueError(f"未知的语音识别引擎: {name}")
+
+
+def create_engine(name: str, options: Dict[str, Any]) -> ASREngine:
+    """创建识别引擎实例，只传入引擎构造函数接受的参数"""
+    engine_class = _resolve_engine(name)
+    parameters = inspect.signature(engine_class).parameters
+    if not any(p.kind == p.VAR_KEYWORD for p in parameters.values()):
+        options = {k: v for k, v in options.items() if k in parameters}
+    return engine_class(**options)
+
+
+def is_enabled() -> bool:
+    """语音识别是否可用"""
+    if not _enabled:
+        return False
+    try:
+        engine_class = _resolve_engine(_engine)
+    except (ValueError, ImportError, AttributeError) as e:
+        print(f"[!] 语音识别引擎不可用: {e}")
+        return False
+    check = getattr(engine_class, 'is_available', None)
+    return check() if check else True
+
+
+# ---------- 静音切分 ----------
+
+def frame_level(frame: bytes) -> float:
+    """计算一帧音频的音量(dBFS)"""
+    if np is not None:
+        samples = np.frombuffer(frame, dtype=np.int16).astype(np.float32)
+        mean_square = float(np.mean(samples * samples)) if samples.size else 0.0
+    else:
+        samples = array('h', frame)
+        mean_square = sum(s * s for s in samples) / len(samples) if samples else 0.0
+    if mean_square <= 0:
+        return -100.0
+    return 10 * math.log10(mean_square / (32768.0 * 32768.0))
+
+
+class SilenceChunker:
+    """
+    按静音切分PCM流
+    片段达到 chunk_seconds 后在下一段足够长的静音中间切开；
+    一直没有静音时在 2 * chunk_seconds 处强制切开
+    """
+
+    def __init__(self, chunk_seconds: float = 60, min_silence: float = 0.5, threshold: float = -40.0):
+        bytes_per_second = SAMPLE_RATE * SAMPLE_WIDTH
+        self.target_bytes = int(chunk_seconds * bytes_per_second)
+        self.max_bytes = self.target_bytes * 2
+        self.min_silence_frames = max(1, int(min_silence * 1000 / FRAME_MS))
+        self.threshold = threshold
+        self._buffer = bytearray()
+        self._silent_frames = 0
+
+    def feed(self, frame: bytes) -> Iterator[bytes]:
+        """输入一帧，产出已切好的片段"""
+        self._buffer += frame
+        if frame_level(frame) < self.threshold:
+            self._silent_frames += 1
+        else:
+            self._silent_frames = 0
+
+        if len(self._buffer) >= self.target_bytes and self._silent_frames >= self.min_silence_frames:
+            # 在静音段中间切开
+            cut = len(self._buffer) - self._silent_frames // 2 * len(frame)
+            yield from self._cut(cut)
+        elif len(self._buffer) >= self.max_bytes:
+            yield from self._cut(len(self._buffer))
+
+    def flush(self) -> Iterator[bytes]:
+        """输出剩余音频"""
+        if self._buffer:
+            yield from self._cut(len(self._buffer))
+
+    def _cut(self, position: int) -> Iterator[bytes]:
+        position -= position % SAMPLE_WIDTH
+        chunk = bytes(self._buffer[:position])
+        del self._buffer[:position]
+        self._silent_frames = 0
+        yield chunk
+
+
+# ---------- 进程池 ----------
+
+_worker_engine: Optional[ASREngine] = None
+
+
+def _init_worker(engine: str, options: Dict[str, Any]) -> None:
+    """工作进程初始化：每个进程只加载一次模型"""
+    global _worker_engine
+    _worker_engine = create_engine(engine, options)
+
+
+def _transcribe_chunk(pcm: bytes) -> str:
+    return _worker_engine.transcribe(pcm)
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def get_pool() -> ProcessPoolExecutor:
+    """获取识别进程池（spawn 方式启动，避免 fork 带上事件循环和数据库连接）"""
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(
+            max_workers=_workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker,
+            # spawn 出的进程重新导入本模块，看不到父进程中注册的引擎，按导入路径传递
+            initargs=(_engine_path(_engine), _engine_options)
+        )
+    return _pool
+
+
+def get_stream_semaphore() -> asyncio.Semaphore:
+    """获取识别并发信号量，同时进行的识别数不超过 workers"""
+    global _stream_semaphore
+    if _stream_semaphore is None:
+        _stream_semaphore = asyncio.Semaphore(_workers)
+    return _stream_semaphore
+
+
+def shutdown() -> None:
+    """关闭进程池"""
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(cancel_futures=True)
+        _pool = None
+
+
+@dataclass
+class ASRResult:
+    """语音识别结果"""
+    text: str
+    chunks: int
+    audio_seconds: float
+    elapsed: float
+    first_chunk: float = 0.0  # 第一个片段开始识别的时间(秒)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """写入 metadata.json 的转录信息"""
+        return {
+            'source': 'asr',
+            'engine': _engine,
+            'model': _engine_options.get('model'),
+            'chunks': self.chunks,
+            'audio_seconds': round(self.audio_seconds, 1),
+            'elapsed': round(self.elapsed, 1),
+        }
+
+
+class PCMRingBuffer:
+    """
+    固定帧大小的PCM环形缓冲区
+    写入方把任意长度的数据切成整帧放入预分配的存储，缓冲区满时等待（反压到ffmpeg和yt-dlp）
+    """
+
+    def __init__(self, frame_bytes: int = FRAME_BYTES, capacity: int = RING_FRAMES):
+        self.frame_bytes = frame_bytes
+        self.capacity = capacity
+        self._view = memoryview(bytearray(frame_bytes * capacity))
+        self._head = 0      # 下一个读取的帧位置
+        self._count = 0     # 已写入未读取的帧数
+        self._partial = bytearray()  # 不足一帧的数据
+        self._tail = b''    # 结束时剩余的不完整帧
+        self._closed = False
+        self._cond = asyncio.Condition()
+
+    async def write(self, data: bytes) -> None:
+        self._partial += data
+        frame_bytes = self.frame_bytes
+        offset = 0
+        while len(self._partial) - offset >= frame_bytes:
+            async with self._cond:
+                await self._cond.wait_for(lambda: self._count < self.capacity)
+                start = (self._head + self._count) % self.capacity * frame_bytes
+                self._view[start:start + frame_bytes] = self._partial[offset:offset + frame_bytes]
+                self._count += 1
+                self._cond.notify_all()
+            offset += frame_bytes
+        del self._partial[:offset]
+
+    async def close(self) -> None:
+        async with self._cond:
+            # 丢弃不足一个采样的尾部字节
+            self._tail = bytes(self._partial[:len(self._partial) - len(self._partial) % SAMPLE_WIDTH])
+            self._partial.clear()
+            self._closed = True
+            self._cond.notify_all()
+
+    async def read(self) -> Optional[bytes]:
+        """读取一帧，数据读完后返回None"""
+        async with self._cond:
+            await self._cond.wait_for(lambda: self._count or self._closed)
+            if not self._count:
+                tail, self._tail = self._tail, b''
+                return tail or None
+            start = self._head * self.frame_bytes
+            frame = bytes(self._view[start:start + self.frame_bytes])
+            self._head = (self._head + 1) % self.capacity
+            self._count -= 1
+            self._cond.notify_all()
+            return frame
+
+
+async def _start_pipeline(source_cmd: List[str]) -> Tuple[Process, Process]:
+    """启动 音频源(stdout) -> ffmpeg(stdin) 管道，ffmpeg 输出 16kHz 单声道 s16le PCM"""
+    new_session = sys.platform != 'win32'
+    read_fd, write_fd = os.pipe()
+    try:
+        try:
+            source = await asyncio.create_subprocess_exec(
+                *source_cmd, stdout=write_fd, stderr=asyncio.subprocess.PIPE, start_new_session=new_session
+            )
+        except FileNotFoundError:
+            raise RuntimeError("yt-dlp not found. Please install: pip install yt-dlp")
+        try:
+            decoder = await asyncio.create_subprocess_exec(
+                *DECODER_CMD,
+                stdin=read_fd,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                start_new_session=new_session
+            )
+        except FileNotFoundError:
+            kill_process_tree(source)
+            await source.wait()
+            raise RuntimeError("ffmpeg not found. Please install ffmpeg")
+    finally:
+        # 子进程已持有管道两端，父进程关闭自己的副本，音频源退出后ffmpeg才能读到EOF
+        os.close(read_fd)
+        os.close(write_fd)
+    return source, decoder
+
+
+async def transcribe_stream(source_cmd: List[str]) -> ASRResult:
+    """
+    流式转录：音频源命令把音频写到stdout，经ffmpeg解码后按帧进入环形缓冲区，
+    边切分边提交识别，不落盘；识别跟不上时通过管道反压暂停下载
+    """
+    started = time.monotonic()
+    loop = asyncio.get_running_loop()
+    pool = get_pool()
+    ring = PCMRingBuffer()
+    chunker = SilenceChunker(_chunk_seconds, _min_silence, _silence_threshold)
+    # 限制已提交未完成的片段数，避免内存中堆积过多音频
+    inflight = asyncio.Semaphore(_workers * 2)
+    futures: List[asyncio.Future] = []
+    first_chunk = None
+    total_bytes = 0
+
+    async def submit(chunk: bytes) -> None:
+        nonlocal first_chunk
+        await inflight.acquire()
+        future = loop.run_in_executor(pool, _transcribe_chunk, chunk)
+        future.add_done_callback(lambda _: inflight.release())
+        futures.append(future)
+        if first_chunk is None:
+            first_chunk = time.monotonic() - started
+
+    async def pump(stream: asyncio.StreamReader) -> None:
+        try:
+            while True:
+                data = await stream.read(READ_SIZE)
+                if not data:
+                    break
+                await ring.write(data)
+        finally:
+            await ring.close()
+
+    async with get_stream_semaphore():
+        # yt-dlp 只在下载期间占用全局进程名额，下载结束后识别继续进行
+        process_slot = get_semaphore()
+        await process_slot.acquire()
+        try:
+            count_spawn()
+            source, decoder = await _start_pipeline(source_cmd)
+        except BaseException:
+            process_slot.release()
+            raise
+        source_exited = asyncio.ensure_future(source.wait())
+        source_exited.add_done_callback(lambda _: process_slot.release())
+        source_errors = asyncio.ensure_future(source.stderr.read())
+        decoder_errors = asyncio.ensure_future(decoder.stderr.read())
+        pumping = asyncio.ensure_future(pump(decoder.stdout))
+
+        async def consume() -> None:
+            nonlocal total_bytes
+            while True:
+                frame = await ring.read()
+                if frame is None:
+                    break
+                total_bytes += len(frame)
+                for chunk in chunker.feed(frame):
+                    await submit(chunk)
+            for chunk in chunker.flush():
+                await submit(chunk)
+            await pumping
+            await asyncio.gather(source_exited, decoder.wait())
+
+        try:
+            await asyncio.wait_for(consume(), timeout=_timeout)
+        except BaseException:
+            # 超时或被取消时结束整条管道
+            kill_process_tree(source)
+            kill_process_tree(decoder)
+            pumping.cancel()
+            for future in futures:
+                future.cancel()
+            await asyncio.gather(source_exited, decoder.wait(), pumping, return_exceptions=True)
+            raise
+        finally:
+            source_stderr = (await source_errors).decode('utf-8', errors='replace')
+            decoder_stderr = (await decoder_errors).decode('utf-8', errors='replace')
+
+        if source.returncode != 0:
+            for future in futures:
+                future.cancel()
+            raise RuntimeError(f"yt-dlp error: {source_stderr.strip()}")
+        if decoder.returncode != 0:
+            for future in futures:
+                future.cancel()
+            raise RuntimeError(f"ffmpeg error: {decoder_stderr.strip()}")
+
+        texts = await asyncio.gather(*futures)
+
+    return ASRResult(
+        text='\n'.join(text for text in texts if text),
+        chunks=len(futures),
+        audio_seconds=total_bytes / (SAMPLE_RATE * SAMPLE_WIDTH),
+        elapsed=time.monotonic() - started,
+        first_chunk=first_chunk or 0.0
+    )
+
+
+def configure(
+    enabled: Optional[bool] = None,
+    engine: Optional[str] = None,
+    engine_options: Optional[Dict[str, Any]] = None,
+    workers: Optional[int] = None,
+    chunk_seconds: Optional[float] = None,
+    min_silence: Optional[float] = None,
+    silence_threshold: Optional[float] = None,
+    timeout: Optional[int] = None
+) -> None:
+    """设置语音识别参数（需在首次转录前调用）"""
+    global _enabled, _engine, _engine_options, _workers, _stream_semaphore
+    global _chunk_seconds, _min_silence, _silence_threshold, _timeout
+    if enabled is not None:
+        _enabled = enabled
+    if engine is not None:
+        _engine = engine
+    if engine_options is not None:
+        _engine_options = dict(engine_options)
+    if workers is not None:
+        _workers = max(1, workers)
+        _stream_semaphore = None
+    if chunk_seconds is not None:
+        _chunk_seconds = chunk_seconds
+    if min_silence is not None:
+        _min_silence = min_silence
+    if silence_threshold is not None:
+        _silence_threshold = silence_threshold
+    if timeout is not None:
+        _timeout = timeout
@@ -1,13 +1,26 @@
 """抓取器基类"""
-import re
-import subprocess
+import asyncio
 import json
+import os
+import shutil
 import tempfile
 from abc import ABC, abstractmethod
 from pathlib import Path
-from typing import Dict, List, Optional, Any
-from dataclasses import dataclass
-from datetime import datetime
+from typing import Awaitable, Callable, Dict, List, Optional, Any, Set
+from dataclasses import dataclass, field
+
+from . import asr, inprocess
+from .cache import get_metadata_cache
+from .runner import LineCallback, get_backend, run_process, track_spawns
+from .http import get_http_client
+from .subtitle import PARSABLE_FORMATS, SubtitleChoice, parse_subtitle, select_subtitle
+
+
+# 临时目录/文件名前缀，便于排查残留
+TEMP_PREFIX = 'content-summarizer-'
+
+# 限流回调：每次请求订阅源前调用，令牌不足时等待
+Throttle = Callable[[], Awaitable[None]]
 
 
 @dataclass
@@ -28,6 +41,35 @@ class MediaResult:
     media: MediaItem
     transcript: str   # 转录文本
     cover_path: Optional[Path] = None  # 封面图本地路径
+    yt_dlp_spawns: int = 0  # 本次抓取启动的yt-dlp进程数
+    transcript_info: Optional[Dict[str, Any]] = None  # 转录来源（字幕语言、选择原因等）
+
+
+@dataclass
+class ProbeResult:
+    """单次yt-dlp探测结果"""
+    info: Dict[str, Any]              # 视频信息JSON
+    work_dir: Path                    # 临时目录（字幕、封面所在）
+    subtitle_path: Optional[Path] = None
+    cover_path: Optional[Path] = None
+    subtitle: Optional[SubtitleChoice] = None  # 选中的字幕轨道
+
+
+@dataclass
+class ScanWatermark:
+    """
+    订阅源增量扫描水位
+    扫描从最新内容开始，遇到已知内容即停止；窗口内没有已知内容时窗口翻倍
+    """
+    newest_id: Optional[str] = None    # 上次扫描到的最新内容ID
+    newest_date: Optional[str] = None  # 上次扫描到的最新发布日期
+    window: int = 20                   # 本次扫描窗口（条目数）
+    min_window: int = 20               # 窗口下限
+    max_window: int = 0                # 窗口上限，0表示不限制
+    known_ids: Set[str] = field(default_factory=set)  # 已处理的内容ID
+
+    def is_known(self, video_id: str) -> bool:
+        return video_id == self.newest_id or video_id in self.known_ids
 
 
 class BaseFetcher(ABC):
@@ -42,22 +84,97 @@ class BaseFetcher(ABC):
         pass
 
     @abstractmethod
-    async def fetch_source_list(self, source_url: str) -> List[MediaItem]:
+    async def fetch_source_list(
+        self,
+        source_url: str,
+        watermark: Optional[ScanWatermark] = None,
+        throttle: Optional[Throttle] = None
+    ) -> List[MediaItem]:
         """
         从订阅源获取内容列表
         例如：获取频道的所有视频
+        watermark: 传入时增量扫描，只返回比水位新的内容，并更新水位
+        throttle: 限流回调，每次yt-dlp调用或HTTP请求前调用
         """
         pass
 
+    async def _scan_playlist(
+        self,
+        list_url: str,
+        build_item: Callable[[Dict[str, Any]], Optional[MediaItem]],
+        watermark: Optional[ScanWatermark] = None,
+        throttle: Optional[Throttle] = None
+    ) -> List[MediaItem]:
+        """
+        流式枚举播放列表（最新在前）
+        有水位时用 --playlist-end 限制窗口，遇到已知内容立即结束进程；
+        窗口内没有已知内容则窗口翻倍重扫，直到找到已知内容或列表结束
+        """
+        has_known = watermark is not None and (watermark.newest_id or watermark.known_ids)
+        window = watermark.window if has_known else (watermark.max_window if watermark else 0)
+
+        while True:
+            items: List[MediaItem] = []
+            entries = []
+            seen: Set[str] = set()
+            state = {'count': 0, 'hit_known': False}
+
+            def on_line(line: str) -> Optional[bool]:
+                if not line.strip():
+                    return None
+                try:
+                    info = json.loads(line)
+                except json.JSONDecodeError:
+                    return None
+                state['count'] += 1
+                item = build_item(info)
+                if item is None or item.id in seen:
+                    return None
+                if has_known and watermark.is_known(item.id):
+                    state['hit_known'] = True
+                    return False
+                seen.add(item.id)
+                entries.append((item.id, info))
+                items.append(item)
+                return None
+
+            cmd = ['--dump-json', '--flat-playlist', '--lazy-playlist']
+            if window:
+                cmd += ['--playlist-end', str(window)]
+            await self._run_yt_dlp(cmd + [list_url], line_callback=on_line, throttle=throttle)
+
+            exhausted = not window or state['count'] < window
+            if not has_known or state['hit_known'] or exhausted:
+                break
+            if watermark.max_window and window >= watermark.max_window:
+                break
+
+            # 窗口内全是新内容，扩大窗口
+            window *= 2
+            if watermark.max_window:
+                window = min(window, watermark.max_window)
+            print(f"   窗口内未找到已知内容，扩大扫描窗口到 {window}")
+
+        # 列表信息写入缓存
+        self._cache_flat_entries(entries)
+
+        if watermark is not None:
+            if items:
+                watermark.newest_id = items[0].id
+                watermark.newest_date = items[0].published_at or watermark.newest_date
+            # 窗口只在未找到已知内容时扩大；下次按本次新内容数量的两倍收缩
+            used = window or len(items)
+            watermark.window = max(watermark.min_window, min(used, len(items) * 2))
+
+        return items
+
     @abstractmethod
     def extract_id_from_url(self, url: str) -> str:
         """从URL中提取ID"""
         pass
 
-    def _run_yt_dlp(self, args: List[str], timeout: int = 300) -> Dict[str, Any]:
-        """运行yt-dlp命令"""
-        import os
-        # 获取项目根目录的cookie文件
+    def _cookie_args(self) -> List[str]:
+        """项目根目录下的cookie文件参数"""
         project_root = Path(__file__).parent.parent.parent
 
         # 尝试多个cookie文件
@@ -67,11 +184,27 @@ class BaseFetcher(ABC):
             project_root / "cookies.txt"
         ]
 
-        cookie_arg = []
         for cf in cookie_files:
             if cf.exists():
-                cookie_arg = ['--cookies', str(cf)]
-                break
+                return ['--cookies', str(cf)]
+        return []
+
+    async def _run_yt_dlp(
+        self,
+        args: List[str],
+        timeout: Optional[int] = None,
+        line_callback: Optional[LineCallback] = None,
+        throttle: Optional[Throttle] = None,
+        done: Optional[Callable[[], bool]] = None
+    ) -> Dict[str, Any]:
+        """
+        运行yt-dlp命令（异步，不阻塞事件循环）
+        line_callback: 逐行处理stdout，返回False时提前结束
+        throttle: 限流回调，每次启动yt-dlp（包括换参数重试）前调用
+        done: 命令失败后检查需要的结果是否已经产生，返回True时不再换参数重试，
+              返回 {'success': False, 'error': 错误信息}
+        """
+        cookie_arg = self._cookie_args()
 
         # 尝试多种方式运行yt-dlp
         cmd_options = [
@@ -80,28 +213,66 @@ class BaseFetcher(ABC):
             ['yt-dlp', '--no-download', '--no-playlist', '--extractor-args', 'youtube:player_client=android'] + cookie_arg + args,
         ]
 
+        use_inprocess = get_backend() == 'inprocess' and inprocess.is_available()
+
         last_error = None
         for cmd in cmd_options:
+            if throttle is not None:
+                await throttle()
+            if use_inprocess:
+                try:
+                    output = await inprocess.get_inprocess_engine().run(
+                        self.get_source_name(), cmd[1:], timeout=timeout, line_callback=line_callback
+                    )
+                    return {'success': True, 'output': output}
+                except inprocess.InProcessError as e:
+                    last_error = str(e)
+                    if done is not None and done():
+                        return {'success': False, 'output': '', 'error': last_error}
+                    continue
+                except Exception as e:
+                    # 进程内引擎异常时回退到子进程方式
+                    print(f"进程内yt-dlp异常，回退到子进程: {e}")
+                    use_inprocess = False
+
             try:
-                result = subprocess.run(
-                    cmd,
-                    capture_output=True,
-                    text=True,
-                    timeout=timeout,
-                    encoding='utf-8'
-                )
-                if result.returncode == 0:
-                    return {'success': True, 'output': result.stdout}
-                last_error = result.stderr
-            except subprocess.TimeoutExpired:
-                last_error = "timeout"
+                result = await run_process(cmd, timeout=timeout, line_callback=line_callback)
             except FileNotFoundError:
                 raise RuntimeError("yt-dlp not found. Please install: pip install yt-dlp")
 
+            if result.returncode == 0 or result.stopped:
+                return {'success': True, 'output': result.stdout}
+            last_error = "timeout" if result.timed_out else result.stderr
+            if done is not None and done():
+                return {'success': False, 'output': result.stdout, 'error': last_error}
+
         raise RuntimeError(f"yt-dlp error: {last_error}")
 
-    def get_video_info(self, url: str) -> Dict[str, Any]:
-        """获取视频信息"""
+    def _cache_key(self, url: str) -> Optional[str]:
+        """缓存键中的视频ID，无法识别时不使用缓存"""
+        try:
+            return self.extract_id_from_url(url)
+        except ValueError:
+            return None
+
+    def _cache_flat_entries(self, entries: List[tuple]) -> None:
+        """用频道列表扫描结果预热缓存，entries为 (视频ID, 信息) 列表"""
+        try:
+            get_metadata_cache().warm(self.get_source_name(), entries)
+        except Exception as e:
+            print(f"写入信息缓存失败: {e}")
+
+    async def get_video_info(self, url: str, allow_partial: bool = False) -> Dict[str, Any]:
+        """
+        获取视频信息（优先读取缓存）
+        allow_partial: 允许返回频道列表扫描时缓存的flat信息
+        """
+        video_id = self._cache_key(url)
+        if video_id:
+            cached = get_metadata_cache().get(self.get_source_name(), video_id, full_only=not allow_partial)
+            if cached is not None:
+                return cached
+
         # 尝试不同方式获取视频信息
         cmd_options = [
             ['--dump-json', '--no-download', '--no-playlist', url],
@@ -110,126 +281,219 @@ class BaseFetcher(ABC):
 
         for cmd in cmd_options:
             try:
-                result = self._run_yt_dlp(cmd)
+                result = await self._run_yt_dlp(cmd)
                 output = result['output'].strip()
                 if output:
-                    return json.loads(output)
+                    info = json.loads(output)
+                    if video_id:
+                        get_metadata_cache().put(self.get_source_name(), video_id, info)
+                    return info
             except:
                 continue
 
         raise RuntimeError("无法获取视频信息")
 
-    def download_cover(self, url: str, output_dir: Path) -> Optional[Path]:
-        """下载封面图"""
+    async def probe(self, url: str, cached_info: Optional[Dict[str, Any]] = None) -> ProbeResult:
+        """
+        单次yt-dlp调用获取视频信息和封面，再按优先级只下载选中的一条字幕
+        cached_info: 已缓存的完整信息，传入时通过 --load-info-json 跳过网页解析
+        调用方负责清理 work_dir
+        """
+        work_dir = Path(tempfile.mkdtemp(prefix=TEMP_PREFIX))
         try:
-            # 获取视频信息以获取封面URL
-            info = self.get_video_info(url)
-            thumbnail = info.get('thumbnail')
-            if not thumbnail:
-                return None
+            return await self._probe_into(work_dir, url, cached_info)
+        except BaseException:
+            shutil.rmtree(work_dir, ignore_errors=True)
+            raise
+
+    async def _probe_into(self, work_dir: Path, url: str, cached_info: Optional[Dict[str, Any]]) -> ProbeResult:
+        if cached_info is not None:
+            source_file = work_dir / 'source.json'
+            with open(source_file, 'w', encoding='utf-8') as f:
+                json.dump(cached_info, f, ensure_ascii=False)
+            target = ['--load-info-json', str(source_file)]
+        else:
+            target = [url]
 
-            # yt-dlp可以下载缩略图
-            cmd = [
-                '--write-thumbnail',
-                '--convert-thumbnails', 'jpg',
-                '-o', str(output_dir / 'cover'),
-                url
-            ]
-            self._run_yt_dlp(cmd)
-
-            # 查找下载的封面文件
-            for ext in ['jpg', 'jpeg', 'png', 'webp']:
-                cover_path = output_dir / f'cover.{ext}'
-                if cover_path.exists():
-                    # 统一重命名为cover.jpg
-                    new_path = output_dir / 'cover.jpg'
-                    cover_path.rename(new_path)
-                    return new_path
+        cmd = [
+            '--write-info-json',
+            '--write-thumbnail',
+            '--convert-thumbnails', 'jpg',
+            '-o', str(work_dir / 'media.%(ext)s'),
+        ] + target
+
+        # 封面下载或转换失败时yt-dlp也会返回非0，只要信息已写出就不再换参数重试
+        result = await self._run_yt_dlp(cmd, done=lambda: any(work_dir.glob('*.info.json')))
+        if not result['success']:
+            print(f"部分资源获取失败（封面）: {result['error']}")
+
+        info_file = next(work_dir.glob('*.info.json'))
+        with open(info_file, 'r', encoding='utf-8') as f:
+            info = json.load(f)
+
+        subtitle = select_subtitle(info)
+        subtitle_path = None
+        if subtitle is not None:
+            print(f"选择字幕: {subtitle.reason}")
+            subtitle_path = await self._download_subtitle(subtitle, info_file, work_dir)
+
+        cover_path = None
+        for ext in ['jpg', 'jpeg', 'png', 'webp']:
+            cover_files = sorted(work_dir.glob(f'*.{ext}'))
+            if cover_files:
+                cover_path = cover_files[0]
+                break
 
-            return None
-        except Exception as e:
-            print(f"下载封面失败: {e}")
-            return None
+        return ProbeResult(
+            info=info,
+            work_dir=work_dir,
+            subtitle_path=subtitle_path,
+            cover_path=cover_path,
+            subtitle=subtitle
+        )
 
-    def get_transcript(self, url: str) -> str:
-        """获取视频转录"""
-        self.temp_dir = tempfile.mkdtemp()
+    async def _download_subtitle(self, choice: SubtitleChoice, info_file: Path, work_dir: Path) -> Optional[Path]:
+        """
+        下载选中的字幕：内嵌内容直接写出，有链接时直接HTTP下载，
+        否则（或下载失败时）用yt-dlp只下载这一条字幕
+        """
+        target = work_dir / f'subtitle.{choice.ext}'
+        if choice.data:
+            target.write_text(choice.data, encoding='utf-8')
+            return target
+
+        if choice.url and choice.ext in PARSABLE_FORMATS:
+            try:
+                response = await asyncio.to_thread(get_http_client().get, choice.url)
+                if response.status == 200 and response.body:
+                    target.write_bytes(response.body)
+                    return target
+                print(f"字幕下载失败: HTTP {response.status}")
+            except Exception as e:
+                print(f"字幕下载失败: {e}")
+
+        # 同时指定两种字幕时yt-dlp优先使用手动字幕，与选择结果一致
         cmd = [
             '--write-subs',
-            '--sub-lang', 'zh-CN,en,zh-Hans,zh-Hant',
-            '--skip-download',
-            '--output', f'{self.temp_dir}/%(title)s',
-            url
+            '--write-auto-subs',
+            '--sub-langs', choice.lang,
+            '--sub-format', '/'.join(PARSABLE_FORMATS) + '/best',
+            '-o', str(work_dir / 'subtitle.%(ext)s'),
+            '--load-info-json', str(info_file),
         ]
-
+        if choice.ext not in PARSABLE_FORMATS:
+            cmd[-2:-2] = ['--convert-subs', 'vtt']
         try:
-            self._run_yt_dlp(cmd)
-            # 查找字幕文件
-            temp_path = Path(self.temp_dir)
-            for sub_file in temp_path.glob('*.vtt'):
-                return self._read_subtitle(sub_file)
-            for sub_file in temp_path.glob('*.srt'):
-                return self._read_subtitle(sub_file)
-
-            return ""
+            await self._run_yt_dlp(cmd)
+        except RuntimeError as e:
+            print(f"字幕下载失败: {e}")
+
+        for ext in PARSABLE_FORMATS:
+            subtitle_files = sorted(work_dir.glob(f'subtitle*.{ext}'))
+            if subtitle_files:
+                return subtitle_files[0]
+        return None
+
+    async def _probe_with_cache(self, url: str) -> ProbeResult:
+        """优先复用缓存的信息JSON，只下载字幕和封面；缓存失效时完整探测"""
+        platform = self.get_source_name()
+        video_id = self._cache_key(url)
+        cache = get_metadata_cache()
+
+        cached = cache.get(platform, video_id) if video_id else None
+        if cached is not None:
+            try:
+                probe = await self.probe(url, cached_info=cached)
+                # 字幕链接过期等情况下缺少字幕，重新完整探测
+                if probe.subtitle_path or probe.subtitle is None:
+                    return probe
+                shutil.rmtree(probe.work_dir, ignore_errors=True)
+            except RuntimeError as e:
+                print(f"缓存信息已失效，重新获取: {e}")
+
+        probe = await self.probe(url)
+        if video_id:
+            cache.put(platform, video_id, probe.info)
+        return probe
+
+    async def _transcribe_audio(self, probe: ProbeResult) -> Optional[asr.ASRResult]:
+        """无字幕时把音频流式交给本地语音识别，失败返回None"""
+        info_file = next(probe.work_dir.glob('*.info.json'))
+        # 音频直接输出到stdout，由ffmpeg边下载边解码
+        cmd = [
+            'yt-dlp', '--no-playlist', '--no-progress', '--no-part',
+            '-f', 'bestaudio/best',
+            '-o', '-',
+            '--load-info-json', str(info_file),
+        ] + self._cookie_args()
+        try:
+            return await asr.transcribe_stream(cmd)
         except Exception as e:
-            print(f"获取转录失败: {e}")
-            return ""
-        finally:
-            # 清理临时目录
-            if self.temp_dir and Path(self.temp_dir).exists():
-                import shutil
-                shutil.rmtree(self.temp_dir, ignore_errors=True)
+            print(f"语音识别失败: {e}")
+            return None
 
-    def _read_subtitle(self, sub_path: Path) -> str:
+    def _read_subtitle(self, sub_path: Path, choice: SubtitleChoice) -> str:
         """读取字幕文件"""
         try:
-            with open(sub_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-            # 移除WebVTT/SSA标记，保留纯文本
-            lines = []
-            for line in content.split('\n'):
-                line = line.strip()
-                # 跳过时间轴和空行
-                if not line or '-->' in line or line.startswith('WEBVTT'):
-                    continue
-                # 移除标签如 <c>
-                line = re.sub(r'<[^>]+>', '', line)
-                if line:
-                    lines.append(line)
-            return '\n'.join(lines)
+            return parse_subtitle(sub_path, automatic=choice.automatic)
         except Exception as e:
             print(f"读取字幕失败: {e}")
             return ""
 
     async def fetch_media(self, url: str) -> MediaResult:
         """抓取单个媒体内容"""
-        # 获取视频信息
-        info = self.get_video_info(url)
-
-        # 构建MediaItem
-        media = MediaItem(
-            id=self.extract_id_from_url(url),
-            title=info.get('title', ''),
-            url=url,
-            published_at=info.get('upload_date', ''),  # 真实发布时间
-            author=info.get('channel', info.get('uploader', '')),
-            duration=info.get('duration'),
-            thumbnail=info.get('thumbnail')
-        )
+        with track_spawns() as spawns:
+            # 字幕下载、语音识别中的 yt-dlp 调用也计入本项
+            probe = await self._probe_with_cache(url)
 
-        # 创建临时目录下载封面
-        temp_dir = tempfile.mkdtemp()
-        cover_path = self.download_cover(url, Path(temp_dir))
-
-        # 获取转录
-        transcript = self.get_transcript(url)
+            try:
+                info = probe.info
+
+                # 构建MediaItem
+                media = MediaItem(
+                    id=self.extract_id_from_url(url),
+                    title=info.get('title', ''),
+                    url=url,
+                    published_at=info.get('upload_date', ''),  # 真实发布时间
+                    author=info.get('channel', info.get('uploader', '')),
+                    duration=info.get('duration'),
+                    thumbnail=info.get('thumbnail')
+                )
 
-        return MediaResult(
-            media=media,
-            transcript=transcript,
-            cover_path=cover_path
-        )
+                # 获取转录
+                transcript = ""
+                transcript_info = None
+                if probe.subtitle_path:
+                    transcript = self._read_subtitle(probe.subtitle_path, probe.subtitle)
+                    transcript_info = probe.subtitle.to_dict()
+
+                # 没有字幕时回退到本地语音识别
+                if not transcript and asr.is_enabled():
+                    print("无可用字幕，下载音频进行语音识别...")
+                    recognized = await self._transcribe_audio(probe)
+                    if recognized is not None and recognized.text:
+                        print(f"语音识别完成: {recognized.chunks} 个片段，音频 {recognized.audio_seconds:.0f}s，"
+                              f"耗时 {recognized.elapsed:.0f}s（{recognized.first_chunk:.1f}s 后开始识别）")
+                        transcript = recognized.text
+                        transcript_info = recognized.to_dict()
+
+                # 封面移到单独的临时文件（不建目录），由调用方移走或删除
+                cover_path = None
+                if probe.cover_path:
+                    fd, name = tempfile.mkstemp(prefix=TEMP_PREFIX, suffix='.jpg')
+                    os.close(fd)
+                    cover_path = Path(name)
+                    os.replace(probe.cover_path, cover_path)
+            finally:
+                shutil.rmtree(probe.work_dir, ignore_errors=True)
+
+            return MediaResult(
+                media=media,
+                transcript=transcript,
+                cover_path=cover_path,
+                yt_dlp_spawns=spawns.count,
+                transcript_info=transcript_info
+            )
 
 
 def detect_url_type(url: str) -> str:
@@ -1,8 +1,7 @@
 """Bilibili抓取器"""
 import re
-import json
-from typing import List
-from .base import BaseFetcher, MediaItem
+from typing import Any, Dict, List, Optional
+from .base import BaseFetcher, MediaItem, ScanWatermark, Throttle
 
 
 class BilibiliFetcher(BaseFetcher):
@@ -26,7 +25,12 @@ class BilibiliFetcher(BaseFetcher):
 
         raise ValueError(f"无法从URL中提取Bilibili视频ID: {url}")
 
-    async def fetch_source_list(self, source_url: str) -> List[MediaItem]:
+    async def fetch_source_list(
+        self,
+        source_url: str,
+        watermark: Optional[ScanWatermark] = None,
+        throttle: Optional[Throttle] = None
+    ) -> List[MediaItem]:
         """
         从Bilibili UP主获取视频列表
         source_url: UP主主页URL，如 https://space.bilibili.com/123456789
@@ -38,37 +42,23 @@ class BilibiliFetcher(BaseFetcher):
 
         uid = uid_match.group(1)
 
-        # 使用yt-dlp获取UP主所有视频
-        cmd = [
-            '--dump-json',
-            '--flat-playlist',
-            f'https://space.bilibili.com/{uid}'
-        ]
-
-        result = self._run_yt_dlp(cmd)
-        items = []
-
-        for line in result['output'].strip().split('\n'):
-            if not line.strip():
-                continue
-            try:
-                info = json.loads(line)
-                # Bilibili视频ID是BV开头的
-                bvid = info.get('id', '')
-                if bvid:
-                    items.append(MediaItem(
-                        id=bvid,
-                        title=info.get('title', ''),
-                        url=f"https://www.bilibili.com/video/{bvid}",
-                        published_at=info.get('upload_date', ''),
-                        author=info.get('channel', ''),
-                        duration=info.get('duration'),
-                        thumbnail=info.get('thumbnail')
-                    ))
-            except json.JSONDecodeError:
-                continue
-
-        return items
+        def build_item(info: Dict[str, Any]) -> Optional[MediaItem]:
+            # Bilibili视频ID是BV开头的
+            bvid = info.get('id', '')
+            if not bvid:
+                return None
+            return MediaItem(
+                id=bvid,
+                title=info.get('title', ''),
+                url=f"https://www.bilibili.com/video/{bvid}",
+                published_at=info.get('upload_date', ''),
+                author=info.get('channel', ''),
+                duration=info.get('duration'),
+                thumbnail=info.get('thumbnail')
+            )
+
+        # 使用yt-dlp获取UP主视频（最新在前）
+        return await self._scan_playlist(f'https://space.bilibili.com/{uid}', build_item, watermark, throttle)
 
 
 # 单例实例
@@ -0,0 +1,257 @@
+"""视频信息缓存
+
+SQLite持久化 + 内存LRU前置层，按 (平台, 视频ID) 缓存 yt-dlp 的信息JSON。
+支持TTL过期和条目数上限（按最近访问时间淘汰）。
+命中时只在内存中记录访问时间，随下一次写入（或累计一定数量后）批量写回，读取不单独提交事务。
+频道列表扫描得到的 flat 条目也会写入，但不会覆盖完整信息。
+RSS订阅的校验信息（ETag / Last-Modified）和解析结果也保存在这里，用于条件请求。
+"""
+import json
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from ..config import CONFIG_DIR
+
+
+# 默认配置，可通过 configure() 覆盖
+_db_path = CONFIG_DIR / "metadata_cache.db"
+_ttl = 6 * 3600
+_max_entries = 5000
+_memory_entries = 128
+
+# 每写入多少次检查一次容量
+EVICT_INTERVAL = 50
+# 累计多少次命中后写回访问时间（写入和淘汰时也会写回）
+ACCESS_FLUSH_INTERVAL = 100
+
+
+class MetadataCache:
+    """视频信息缓存"""
+
+    def __init__(
+        self,
+        db_path: Path,
+        ttl: int = 6 * 3600,
+        max_entries: int = 5000,
+        memory_entries: int = 128
+    ):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.memory_entries = memory_entries
+
+        # key -> (full, created_at, info)
+        self._memory: "OrderedDict[Tuple[str, str], Tuple[bool, float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._writes = 0
+        # 尚未写回数据库的访问时间
+        self._accessed: Dict[Tuple[str, str], float] = {}
+
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(db_path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS media_info (
+                platform TEXT NOT NULL,
+                video_id TEXT NOT NULL,
+                full INTEGER NOT NULL,
+                data BLOB NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                PRIMARY KEY (platform, video_id)
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_media_info_accessed ON media_info(accessed_at)")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS feeds (
+                url TEXT PRIMARY KEY,
+                etag TEXT,
+                last_modified TEXT,
+                data BLOB NOT NULL,
+                fetched_at REAL NOT NULL
+            )
+        """)
+        self._conn.commit()
+
+    @staticmethod
+    def _encode(info: Dict[str, Any]) -> bytes:
+        return zlib.compress(json.dumps(info, ensure_ascii=False).encode('utf-8'))
+
+    @staticmethod
+    def _decode(data: bytes) -> Dict[str, Any]:
+        return json.loads(zlib.decompress(data).decode('utf-8'))
+
+    def _expired(self, created_at: float) -> bool:
+        return self.ttl > 0 and time.time() - created_at > self.ttl
+
+    def _remember(self, key: Tuple[str, str], full: bool, created_at: float, info: Dict[str, Any]) -> None:
+        """写入内存层"""
+        self._memory[key] = (full, created_at, info)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, platform: str, video_id: str, full_only: bool = True) -> Optional[Dict[str, Any]]:
+        """
+        查询缓存
+        full_only: 只返回完整信息（不返回频道列表中的flat条目）
+        """
+        key = (platform, video_id)
+        with self._lock:
+            cached = self._memory.get(key)
+            if cached is None:
+                row = self._conn.execute(
+                    "SELECT full, created_at, data FROM media_info WHERE platform = ? AND video_id = ?",
+                    key
+                ).fetchone()
+                if row is None:
+                    return None
+                cached = (bool(row[0]), row[1], self._decode(row[2]))
+
+            full, created_at, info = cached
+            if self._expired(created_at):
+                self._memory.pop(key, None)
+                self._accessed.pop(key, None)
+                self._conn.execute("DELETE FROM media_info WHERE platform = ? AND video_id = ?", key)
+                self._conn.commit()
+                return None
+            if full_only and not full:
+                return None
+
+            self._remember(key, full, created_at, info)
+            self._accessed[key] = time.time()
+            if len(self._accessed) >= ACCESS_FLUSH_INTERVAL:
+                self._flush_accessed()
+                self._conn.commit()
+            return info
+
+    def _flush_accessed(self) -> None:
+        """把记录的访问时间写回数据库（持有锁时调用，由调用方提交）"""
+        if not self._accessed:
+            return
+        self._conn.executemany(
+            "UPDATE media_info SET accessed_at = ? WHERE platform = ? AND video_id = ?",
+            [(accessed_at, platform, video_id) for (platform, video_id), accessed_at in self._accessed.items()]
+        )
+        self._accessed.clear()
+
+    def flush(self) -> None:
+        """写回尚未保存的访问时间"""
+        with self._lock:
+            self._flush_accessed()
+            self._conn.commit()
+
+    def put(self, platform: str, video_id: str, info: Dict[str, Any]) -> None:
+        """写入完整信息"""
+        now = time.time()
+        with self._lock:
+            self._flush_accessed()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO media_info VALUES (?, ?, 1, ?, ?, ?)",
+                (platform, video_id, self._encode(info), now, now)
+            )
+            self._conn.commit()
+            self._remember((platform, video_id), True, now, info)
+            self._after_write(1)
+
+    def warm(self, platform: str, entries: Iterable[Tuple[str, Dict[str, Any]]]) -> None:
+        """写入频道列表的flat条目，已有条目保持不变"""
+        now = time.time()
+        rows = [(platform, video_id, self._encode(info), now, now) for video_id, info in entries if video_id]
+        if not rows:
+            return
+        with self._lock:
+            self._flush_accessed()
+            self._conn.executemany("INSERT OR IGNORE INTO media_info VALUES (?, ?, 0, ?, ?, ?)", rows)
+            self._conn.commit()
+            self._after_write(len(rows))
+
+    def get_feed(self, url: str) -> Optional[Dict[str, Any]]:
+        """
+        查询RSS缓存
+        返回 {'etag', 'last_modified', 'items'}，不受TTL限制（由条件请求判断是否过期）
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT etag, last_modified, data FROM feeds WHERE url = ?", (url,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {'etag': row[0], 'last_modified': row[1], 'items': self._decode(row[2])}
+
+    def put_feed(
+        self,
+        url: str,
+        etag: Optional[str],
+        last_modified: Optional[str],
+        items: List[Dict[str, Any]]
+    ) -> None:
+        """保存RSS校验信息和解析结果"""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO feeds VALUES (?, ?, ?, ?, ?)",
+                (url, etag, last_modified, self._encode(items), time.time())
+            )
+            self._conn.commit()
+
+    def _after_write(self, count: int) -> None:
+        """定期淘汰超出容量的最久未访问条目"""
+        self._writes += count
+        if self._writes < EVICT_INTERVAL:
+            return
+        self._writes = 0
+
+        total = self._conn.execute("SELECT COUNT(*) FROM media_info").fetchone()[0]
+        overflow = total - self.max_entries
+        if overflow <= 0:
+            return
+        self._conn.execute(
+            "DELETE FROM media_info WHERE rowid IN "
+            "(SELECT rowid FROM media_info ORDER BY accessed_at LIMIT ?)",
+            (overflow,)
+        )
+        if self.ttl > 0:
+            self._conn.execute("DELETE FROM media_info WHERE created_at < ?", (time.time() - self.ttl,))
+        self._conn.commit()
+        self._memory.clear()
+
+
+def configure(
+    db_path: Optional[Path] = None,
+    ttl: Optional[int] = None,
+    max_entries: Optional[int] = None,
+    memory_entries: Optional[int] = None
+) -> None:
+    """设置缓存参数（需在首次使用前调用）"""
+    global _db_path, _ttl, _max_entries, _memory_entries
+    if db_path is not None:
+        _db_path = Path(db_path)
+    if ttl is not None:
+        _ttl = ttl
+    if max_entries is not None:
+        _max_entries = max_entries
+    if memory_entries is not None:
+        _memory_entries = memory_entries
+
+
+# 单例实例
+_cache = None
+
+
+def get_metadata_cache() -> MetadataCache:
+    """获取视频信息缓存实例"""
+    global _cache
+    if _cache is None:
+        _cache = MetadataCache(_db_path, _ttl, _max_entries, _memory_entries)
+    return _cache
+
+
+def flush() -> None:
+    """写回尚未保存的访问时间（程序退出前调用，未创建缓存时不做任何事）"""
+    if _cache is not None:
+        _cache.flush()
@@ -0,0 +1,189 @@
+"""轻量HTTP客户端
+
+按 (scheme, host, port) 复用 keep-alive 连接，请求gzip压缩传输并自动解压，
+自动跟随重定向。支持流式读取响应体（边下载边解压）。
+阻塞实现，异步代码中通过 asyncio.to_thread 调用。
+"""
+import http.client
+import threading
+import zlib
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urljoin, urlsplit
+
+
+USER_AGENT = 'Mozilla/5.0 (compatible; ContentSummarizer/1.0)'
+
+# 每个主机保留的空闲连接数
+MAX_IDLE_PER_HOST = 4
+MAX_REDIRECTS = 5
+CHUNK_SIZE = 64 * 1024
+
+
+@dataclass
+class HttpResponse:
+    """HTTP响应"""
+    status: int
+    headers: Dict[str, str]   # 键为小写
+    body: bytes
+    url: str                  # 跟随重定向后的最终URL
+
+
+class HttpStream:
+    """流式响应，read() 返回解压后的数据"""
+
+    def __init__(
+        self,
+        client: "HttpClient",
+        key: Tuple[str, str, int],
+        conn: http.client.HTTPConnection,
+        response: http.client.HTTPResponse,
+        url: str
+    ):
+        self.status = response.status
+        self.headers = {k.lower(): v for k, v in response.getheaders()}
+        self.url = url
+        self._client = client
+        self._key = key
+        self._conn = conn
+        self._response = response
+        self._decoder = None
+        if self.headers.get('content-encoding', '').lower() == 'gzip':
+            self._decoder = zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+    def read(self, size: int = CHUNK_SIZE) -> bytes:
+        """读取一块解压后的数据，返回空字节表示结束"""
+        while True:
+            chunk = self._response.read(size)
+            if not chunk:
+                return self._decoder.flush() if self._decoder else b''
+            if self._decoder is None:
+                return chunk
+            data = self._decoder.decompress(chunk)
+            if data:
+                return data
+
+    def iter_chunks(self, size: int = CHUNK_SIZE) -> Iterator[bytes]:
+        while True:
+            data = self.read(size)
+            if not data:
+                return
+            yield data
+
+    def close(self) -> None:
+        """读完的连接归还连接池，未读完的直接关闭"""
+        if self._conn is None:
+            return
+        if self._response.length == 0:
+            # 无响应体（如304），读取一次以结束响应
+            self._response.read()
+        if self._response.isclosed() and not self._response.will_close:
+            self._client._release(self._key, self._conn)
+        else:
+            self._conn.close()
+        self._conn = None
+
+
+class HttpClient:
+    """带连接池的HTTP客户端"""
+
+    def __init__(self, timeout: int = 30):
+        self.timeout = timeout
+        self._idle: Dict[Tuple[str, str, int], List[http.client.HTTPConnection]] = {}
+        self._lock = threading.Lock()
+
+    def _acquire(self, key: Tuple[str, str, int]) -> Tuple[http.client.HTTPConnection, bool]:
+        """取出空闲连接或新建连接，返回 (连接, 是否复用)"""
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                return idle.pop(), True
+        scheme, host, port = key
+        conn_class = http.client.HTTPSConnection if scheme == 'https' else http.client.HTTPConnection
+        return conn_class(host, port, timeout=self.timeout), False
+
+    def _release(self, key: Tuple[str, str, int], conn: http.client.HTTPConnection) -> None:
+        """归还连接到连接池"""
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < MAX_IDLE_PER_HOST:
+                idle.append(conn)
+                return
+        conn.close()
+
+    def _open(self, url: str, headers: Dict[str, str]) -> HttpStream:
+        """发送单个请求（不跟随重定向），返回未读取响应体的流"""
+        parts = urlsplit(url)
+        scheme = parts.scheme or 'http'
+        key = (scheme, parts.hostname, parts.port or (443 if scheme == 'https' else 80))
+        path = parts.path or '/'
+        if parts.query:
+            path += '?' + parts.query
+
+        request_headers = {
+            'User-Agent': USER_AGENT,
+            'Accept-Encoding': 'gzip',
+            'Connection': 'keep-alive',
+        }
+        request_headers.update(headers)
+
+        # 复用的连接可能已被服务端关闭，失败时用新连接重试一次
+        for attempt in range(2):
+            conn, reused = self._acquire(key)
+            try:
+                conn.request('GET', path, headers=request_headers)
+                response = conn.getresponse()
+            except (http.client.HTTPException, ConnectionError, OSError):
+                conn.close()
+                if reused and attempt == 0:
+                    continue
+                raise
+            return HttpStream(self, key, conn, response, url)
+
+        raise RuntimeError(f"请求失败: {url}")
+
+    @contextmanager
+    def stream(self, url: str, headers: Optional[Dict[str, str]] = None) -> Iterator[HttpStream]:
+        """流式GET请求，自动跟随重定向"""
+        headers = headers or {}
+        for _ in range(MAX_REDIRECTS + 1):
+            response = self._open(url, headers)
+            if response.status in (301, 302, 303, 307, 308) and 'location' in response.headers:
+                for _chunk in response.iter_chunks():
+                    pass
+                response.close()
+                url = urljoin(url, response.headers['location'])
+                continue
+            try:
+                yield response
+            finally:
+                response.close()
+            return
+        raise RuntimeError(f"重定向次数过多: {url}")
+
+    def get(self, url: str, headers: Optional[Dict[str, str]] = None) -> HttpResponse:
+        """GET请求，读取完整响应体"""
+        with self.stream(url, headers) as response:
+            body = b''.join(response.iter_chunks())
+            return HttpResponse(response.status, response.headers, body, response.url)
+
+    def close(self) -> None:
+        """关闭所有空闲连接"""
+        with self._lock:
+            for conns in self._idle.values():
+                for conn in conns:
+                    conn.close()
+            self._idle.clear()
+
+
+# 单例实例
+_client = None
+
+
+def get_http_client() -> HttpClient:
+    """获取HTTP客户端实例"""
+    global _client
+    if _client is None:
+        _client = HttpClient()
+    return _client
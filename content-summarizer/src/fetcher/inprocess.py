@@ -0,0 +1,174 @@
+"""yt-dlp 进程内执行引擎
+
+直接调用 yt_dlp.YoutubeDL，省去每次启动解释器和导入提取器的开销。
+每个线程按 (平台, 参数) 缓存一个已配置好的 YoutubeDL 实例并重复使用，
+通过线程池并行执行。命令行参数与 subprocess 路径完全一致。
+
+与 subprocess 后端的差异：
+- 线程无法中断，超时后调用方立即得到错误，但并发名额保留到线程实际结束
+- 提取完成后才逐行回调 line_callback，回调返回False不能提前结束提取
+  （扫描订阅源时的提前停止在该后端下不节省请求，由 --playlist-end 限制窗口）
+"""
+import asyncio
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import yt_dlp
+    from yt_dlp.utils import DEFAULT_OUTTMPL, DownloadError
+except ImportError:
+    yt_dlp = None
+
+from .runner import LineCallback, count_spawn, get_default_timeout, get_max_processes, get_semaphore
+
+
+# 每次调用都会变化、不应参与实例缓存键的参数
+_PER_CALL_OPTIONS = ('-o', '--output', '--load-info-json')
+
+
+def _release_when_done(future: "asyncio.Future", semaphore: asyncio.Semaphore) -> None:
+    """工作线程结束后再释放并发名额"""
+    def done(finished: "asyncio.Future") -> None:
+        if not finished.cancelled():
+            finished.exception()  # 取出异常，避免未检索的警告
+        semaphore.release()
+    future.add_done_callback(done)
+
+
+def is_available() -> bool:
+    """yt_dlp 是否可导入"""
+    return yt_dlp is not None
+
+
+class InProcessError(RuntimeError):
+    """yt-dlp 提取失败（对应命令行返回非0）"""
+    pass
+
+
+class InProcessEngine:
+    """进程内yt-dlp引擎"""
+
+    def __init__(self, max_workers: int = 4):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='yt-dlp')
+        self._local = threading.local()
+
+    @staticmethod
+    def _split_args(args: List[str]) -> Tuple[Tuple[str, ...], Dict[str, str]]:
+        """拆分出实例缓存键和单次调用的参数（输出模板、信息文件）"""
+        key_args = []
+        per_call = {}
+        i = 0
+        while i < len(args):
+            if args[i] in _PER_CALL_OPTIONS and i + 1 < len(args):
+                per_call[args[i]] = args[i + 1]
+                i += 2
+                continue
+            key_args.append(args[i])
+            i += 1
+        return tuple(key_args), per_call
+
+    def _get_instance(self, platform: str, key_args: Tuple[str, ...]) -> Tuple[Any, bool]:
+        """获取当前线程缓存的YoutubeDL实例，返回 (实例, 是否输出JSON)"""
+        instances: Dict[Tuple, Tuple[Any, bool]] = self._local.__dict__.setdefault('instances', {})
+        key = (platform, key_args)
+        if key not in instances:
+            ydl_opts = dict(yt_dlp.parse_options(list(key_args)).ydl_opts)
+            # JSON由引擎自行序列化，不打印到stdout
+            dump_json = bool(ydl_opts.get('forcejson') or ydl_opts.get('dump_single_json'))
+            ydl_opts.update({
+                'forcejson': False,
+                'dump_single_json': False,
+                'quiet': True,
+                'no_warnings': True,
+                'noprogress': True,
+                'ignoreerrors': False,
+            })
+            instances[key] = (yt_dlp.YoutubeDL(ydl_opts), dump_json)
+        return instances[key]
+
+    def _run(self, platform: str, args: List[str], url: Optional[str]) -> List[str]:
+        """在工作线程中执行一次提取，返回JSON输出行"""
+        key_args, per_call = self._split_args(args)
+        ydl, dump_json = self._get_instance(platform, key_args)
+
+        outtmpl = per_call.get('-o') or per_call.get('--output')
+        ydl.params['outtmpl']['default'] = outtmpl or DEFAULT_OUTTMPL['default']
+        ydl._download_retcode = 0
+        try:
+            info_file = per_call.get('--load-info-json')
+            if info_file:
+                # 复用已有信息JSON，跳过网页解析
+                with open(info_file, 'r', encoding='utf-8') as f:
+                    loaded = ydl.sanitize_info(json.load(f), ydl.params.get('clean_infojson', True))
+                info = ydl.process_ie_result(loaded, download=True)
+            else:
+                info = ydl.extract_info(url, download=True)
+        except DownloadError as e:
+            raise InProcessError(str(e))
+        if ydl._download_retcode:
+            raise InProcessError(f"yt-dlp returned {ydl._download_retcode}")
+
+        if not dump_json or not info:
+            return []
+
+        # 与命令行 --dump-json 一致：播放列表每个条目一行
+        if info.get('_type') == 'playlist':
+            entries = [entry for entry in info.get('entries') or [] if entry]
+        else:
+            entries = [info]
+
+        return [json.dumps(ydl.sanitize_info(entry), ensure_ascii=False) for entry in entries]
+
+    async def run(
+        self,
+        platform: str,
+        args: List[str],
+        timeout: Optional[int] = None,
+        line_callback: Optional[LineCallback] = None
+    ) -> str:
+        """
+        执行yt-dlp参数列表（最后一项为URL，使用 --load-info-json 时可省略），
+        返回与 --dump-json 相同格式的输出
+        超时只能放弃等待，工作线程会在socket超时后自行结束，结束前一直占用并发名额
+        line_callback 在提取完成后才调用，只能截断输出，不能提前结束提取
+        """
+        if timeout is None:
+            timeout = get_default_timeout()
+
+        if '--load-info-json' in args:
+            option_args, url = list(args), None
+        else:
+            *option_args, url = args
+        loop = asyncio.get_running_loop()
+        semaphore = get_semaphore()
+        await semaphore.acquire()
+        count_spawn()
+        future = loop.run_in_executor(self._executor, self._run, platform, option_args, url)
+        # shield：超时或取消时不取消 future，名额在线程结束后才释放，
+        # 否则调用方接着尝试下一个参数组合，线程会叠加超过 max_processes
+        _release_when_done(future, semaphore)
+        try:
+            lines = await asyncio.wait_for(asyncio.shield(future), timeout=timeout)
+        except asyncio.TimeoutError:
+            raise InProcessError("timeout")
+
+        if line_callback:
+            for i, line in enumerate(lines):
+                if line_callback(line) is False:
+                    lines = lines[:i + 1]
+                    break
+        return ''.join(line + '\n' for line in lines)
+
+
+# 单例实例
+_engine = None
+
+
+def get_inprocess_engine() -> InProcessEngine:
+    """获取进程内引擎实例"""
+    global _engine
+    if _engine is None:
+        _engine = InProcessEngine(max_workers=get_max_processes())
+    return _engine
@@ -0,0 +1,89 @@
+"""流式RSS解析
+
+基于 XMLPullParser 边读边解析，逐个产出单集，处理完的元素立即释放；
+遇到已知单集（订阅按发布时间倒序）即停止，不再读取更早的内容。
+"""
+import re
+import xml.etree.ElementTree as ET
+from typing import Callable, Iterable, Iterator, Optional
+
+from .base import MediaItem
+
+
+ITUNES_NS = '{http://www.itunes.com/dtds/podcast-1.0.dtd}'
+
+EPISODE_ID_PATTERN = re.compile(r'episode/([a-zA-Z0-9]+)')
+
+
+def parse_duration(value: Optional[str]) -> Optional[int]:
+    """解析 itunes:duration，支持 "3723"、"62:03"、"1:02:03" 格式"""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        seconds = 0
+        for part in value.split(':'):
+            seconds = seconds * 60 + int(float(part))
+        return seconds
+    except ValueError:
+        return None
+
+
+def iter_rss_items(
+    chunks: Iterable[bytes],
+    stop: Optional[Callable[[str], bool]] = None
+) -> Iterator[MediaItem]:
+    """
+    从RSS数据块流中逐个解析单集
+    chunks: RSS内容的数据块（可以是网络流）
+    stop: 判断单集ID是否已知，返回True时停止解析
+    """
+    parser = ET.XMLPullParser(events=('start', 'end'))
+    channel = None
+    author = ''
+    depth = 0   # 当前所在 <item> 的层数
+
+    for chunk in chunks:
+        parser.feed(chunk)
+        for event, elem in parser.read_events():
+            if event == 'start':
+                if elem.tag == 'channel':
+                    channel = elem
+                elif elem.tag == 'item':
+                    depth += 1
+                continue
+
+            if elem.tag == 'title' and not depth and not author:
+                author = elem.text or ''
+                continue
+            if elem.tag != 'item':
+                continue
+
+            depth -= 1
+            link = elem.findtext('link', '')
+            ep_match = EPISODE_ID_PATTERN.search(link)
+            item = None
+            if ep_match:
+                image = elem.find(f'{ITUNES_NS}image')
+                item = MediaItem(
+                    id=ep_match.group(1),
+                    title=elem.findtext('title', ''),
+                    url=link,
+                    published_at=elem.findtext('pubDate', ''),
+                    author=author,
+                    duration=parse_duration(elem.findtext(f'{ITUNES_NS}duration')),
+                    thumbnail=image.get('href') if image is not None else None
+                )
+
+            # 释放已处理的元素
+            elem.clear()
+            if channel is not None:
+                channel.remove(elem)
+
+            if item is None:
+                continue
+            if stop is not None and stop(item.id):
+                return
+            yield item
+
+    parser.close()
@@ -0,0 +1,200 @@
+"""yt-dlp 异步进程执行器
+
+基于 asyncio.create_subprocess_exec，不阻塞事件循环；
+超时后按进程组强制结束，并通过全局信号量限制同时运行的 yt-dlp 进程数。
+"""
+import asyncio
+import contextvars
+import os
+import signal
+import sys
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Callable, Iterator, List, Optional
+
+
+# 默认配置，可通过 configure() 覆盖
+_max_processes = 4
+_default_timeout = 300
+_backend = 'subprocess'
+
+# 全局信号量（首次使用时创建，绑定当前事件循环）
+_semaphore: Optional[asyncio.Semaphore] = None
+
+# 单行输出上限（--dump-json 的单行JSON可能很大）
+STREAM_LIMIT = 64 * 1024 * 1024
+
+
+@dataclass
+class SpawnCounter:
+    """进程启动计数"""
+    count: int = 0
+
+
+# 当前任务上下文的计数器，用于统计单个内容触发的yt-dlp进程数
+_spawn_counter: contextvars.ContextVar[Optional[SpawnCounter]] = contextvars.ContextVar(
+    'yt_dlp_spawn_counter', default=None
+)
+
+
+@contextmanager
+def track_spawns() -> Iterator[SpawnCounter]:
+    """统计代码块内启动的进程数"""
+    counter = SpawnCounter()
+    token = _spawn_counter.set(counter)
+    try:
+        yield counter
+    finally:
+        _spawn_counter.reset(token)
+
+
+def count_spawn() -> None:
+    """当前上下文的调用计数加一"""
+    counter = _spawn_counter.get()
+    if counter is not None:
+        counter.count += 1
+
+
+# 行回调：返回False表示已获取足够输出，提前结束进程
+LineCallback = Callable[[str], Optional[bool]]
+
+
+@dataclass
+class ProcessResult:
+    """进程执行结果"""
+    returncode: Optional[int]
+    stdout: str
+    stderr: str
+    timed_out: bool = False
+    stopped: bool = False  # 由行回调提前结束
+
+
+def configure(
+    max_processes: Optional[int] = None,
+    timeout: Optional[int] = None,
+    backend: Optional[str] = None
+) -> None:
+    """设置全局并发上限、默认超时和执行后端"""
+    global _max_processes, _default_timeout, _backend, _semaphore
+    if max_processes:
+        _max_processes = max(1, max_processes)
+        _semaphore = None
+    if timeout:
+        _default_timeout = timeout
+    if backend:
+        if backend not in ('subprocess', 'inprocess'):
+            raise ValueError(f"不支持的yt-dlp执行后端: {backend}")
+        _backend = backend
+
+
+def get_max_processes() -> int:
+    """获取并发上限"""
+    return _max_processes
+
+
+def get_backend() -> str:
+    """获取执行后端: subprocess | inprocess"""
+    return _backend
+
+
+def get_default_timeout() -> int:
+    """获取默认超时(秒)"""
+    return _default_timeout
+
+
+def get_semaphore() -> asyncio.Semaphore:
+    """获取全局yt-dlp进程信号量"""
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(_max_processes)
+    return _semaphore
+
+
+def kill_process_tree(proc: asyncio.subprocess.Process) -> None:
+    """结束进程及其子进程（ffmpeg等）"""
+    if proc.returncode is not None:
+        return
+    try:
+        if sys.platform == 'win32':
+            proc.kill()
+        else:
+            os.killpg(proc.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+async def _read_lines(
+    stream: asyncio.StreamReader,
+    sink: List[str],
+    line_callback: Optional[LineCallback] = None
+) -> bool:
+    """逐行读取输出流，回调返回False时提前结束并返回True"""
+    while True:
+        raw = await stream.readline()
+        if not raw:
+            return False
+        line = raw.decode('utf-8', errors='replace')
+        sink.append(line)
+        if line_callback and line_callback(line.rstrip('\r\n')) is False:
+            return True
+
+
+async def run_process(
+    cmd: List[str],
+    timeout: Optional[int] = None,
+    line_callback: Optional[LineCallback] = None
+) -> ProcessResult:
+    """
+    异步运行命令，流式读取stdout
+    line_callback: 每读到一行stdout时回调，返回False时结束进程（视为成功）
+    """
+    if timeout is None:
+        timeout = _default_timeout
+
+    async with get_semaphore():
+        count_spawn()
+
+        proc = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            limit=STREAM_LIMIT,
+            # 独立进程组，超时时可连同子进程一起结束
+            start_new_session=(sys.platform != 'win32')
+        )
+
+        stdout_lines: List[str] = []
+        stderr_lines: List[str] = []
+        stdout_reader = asyncio.ensure_future(_read_lines(proc.stdout, stdout_lines, line_callback))
+        readers = asyncio.gather(stdout_reader, _read_lines(proc.stderr, stderr_lines))
+
+        timed_out = False
+        stopped = False
+        try:
+            # stdout读取结束（EOF或回调要求停止）后等待stderr和进程退出
+            deadline = asyncio.get_running_loop().time() + timeout
+            stopped = await asyncio.wait_for(asyncio.shield(stdout_reader), timeout=timeout)
+            if stopped:
+                kill_process_tree(proc)
+            remaining = max(0.0, deadline - asyncio.get_running_loop().time())
+            await asyncio.wait_for(asyncio.shield(readers), timeout=remaining)
+            await proc.wait()
+        except asyncio.TimeoutError:
+            timed_out = True
+            kill_process_tree(proc)
+            await proc.wait()
+            await asyncio.gather(readers, return_exceptions=True)
+        except BaseException:
+            # 任务被取消等情况，不留下孤儿进程
+            kill_process_tree(proc)
+            readers.cancel()
+            readers.add_done_callback(lambda f: f.cancelled() or f.exception())
+            raise
+
+        return ProcessResult(
+            returncode=proc.returncode,
+            stdout=''.join(stdout_lines),
+            stderr=''.join(stderr_lines),
+            timed_out=timed_out,
+            stopped=stopped
+        )
@@ -0,0 +1,281 @@
+"""字幕解析
+
+单次流式遍历 WebVTT / SRT 字幕，输出纯文本转录：
+- 去掉 WEBVTT 头、NOTE/STYLE 块、SRT序号、时间轴、行内时间戳和样式标签
+- 去除自动字幕的滚动重复（同一行在相邻字幕块中重复出现、逐字增长）；
+  手动字幕不做去重，重复的对白（如“是。”“不是。”“是。”）原样保留
+- 可选按固定间隔插入段落时间戳，如 [00:05:00]
+
+字幕选择：根据信息JSON中的可用字幕列表，按语言优先级只选出一条字幕
+（手动字幕优先于自动字幕，自动字幕只考虑视频原始语言，不用机器翻译的轨道）
+"""
+import html
+import re
+from collections import deque
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+
+# 默认配置，可通过 configure() 覆盖
+_timestamp_interval = 0
+_languages = ['zh-CN', 'zh-Hans', 'zh', 'zh-Hant', 'zh-TW', 'en']
+
+# 不是对白的字幕轨道（B站弹幕、YouTube直播聊天）
+EXCLUDED_TRACKS = {'danmaku', 'live_chat'}
+# 可以直接解析的字幕格式，按优先级排列
+PARSABLE_FORMATS = ('vtt', 'srt')
+
+TIMING_PATTERN = re.compile(r'(?:(\d+):)?(\d{1,2}):(\d{2})[.,](\d{1,3})\s*-->')
+TAG_PATTERN = re.compile(r'<[^>]*>')
+
+# 与最近几行比较去重（自动字幕每行通常重复出现2-3次）
+RECENT_LINES = 4
+
+
+@dataclass
+class SubtitleChoice:
+    """选中的字幕轨道"""
+    lang: str                  # 字幕语言（信息JSON中的键）
+    ext: str                   # 字幕格式
+    automatic: bool            # 是否为自动字幕
+    reason: str                # 选择原因
+    url: Optional[str] = None
+    data: Optional[str] = None  # 部分平台（如B站）直接内嵌字幕内容
+
+    def to_dict(self) -> Dict[str, Any]:
+        """写入 metadata.json 的字幕信息"""
+        return {
+            'source': 'subtitle',
+            'lang': self.lang,
+            'format': self.ext,
+            'automatic': self.automatic,
+            'reason': self.reason,
+        }
+
+
+@dataclass
+class Cue:
+    """字幕块"""
+    start: float                                     # 开始时间(秒)
+    lines: List[str] = field(default_factory=list)  # 清理后的文本行
+
+
+def _parse_timestamp(match: "re.Match") -> float:
+    hours, minutes, seconds, millis = match.groups()
+    return int(hours or 0) * 3600 + int(minutes) * 60 + int(seconds) + int(millis.ljust(3, '0')) / 1000
+
+
+def _clean_line(line: str) -> str:
+    """去掉行内时间戳、样式标签和HTML实体"""
+    if '<' in line:
+        line = TAG_PATTERN.sub('', line)
+    if '&' in line:
+        line = html.unescape(line)
+    if '  ' in line or '\t' in line or '\xa0' in line:
+        line = ' '.join(line.split())
+    return line.strip()
+
+
+def iter_cues(lines: Iterable[str]) -> Iterator[Cue]:
+    """逐个解析字幕块（WebVTT 与 SRT 通用）"""
+    cue: Optional[Cue] = None
+    skip_block = False
+
+    for raw in lines:
+        line = raw.strip()
+        if not line:
+            if raw.strip('\r\n') and cue is not None and not cue.lines:
+                # YouTube自动字幕在时间轴后用只含空格的行占位，不是块结束
+                continue
+            # 空行结束当前块
+            if cue is not None and cue.lines:
+                yield cue
+            cue = None
+            skip_block = False
+            continue
+        if skip_block:
+            continue
+
+        if '-->' in line:
+            match = TIMING_PATTERN.match(line)
+            if match:
+                if cue is not None and cue.lines:
+                    yield cue
+                cue = Cue(start=_parse_timestamp(match))
+            continue
+
+        if cue is None:
+            # 时间轴之前的内容：WEBVTT头、NOTE/STYLE/REGION块、字幕序号或标识
+            if line.startswith(('WEBVTT', 'NOTE', 'STYLE', 'REGION')):
+                skip_block = True
+            continue
+
+        text = _clean_line(line)
+        if text:
+            cue.lines.append(text)
+
+    if cue is not None and cue.lines:
+        yield cue
+
+
+def iter_transcript_lines(
+    cues: Iterable[Cue],
+    timestamp_interval: int = 0,
+    rolling: bool = False
+) -> Iterator[str]:
+    """
+    合并字幕块为文本行
+    timestamp_interval: 段落时间戳间隔(秒)，0表示不插入
+    rolling: 是否为滚动显示的自动字幕，是则去除相邻字幕块间的重复
+    """
+    recent: deque = deque(maxlen=RECENT_LINES)  # 最近输出的行
+    pending: Optional[str] = None               # 可能继续增长、尚未输出的行
+    pending_start = 0.0
+    next_mark = 0.0
+
+    def flush() -> Iterator[str]:
+        nonlocal next_mark
+        if timestamp_interval and pending_start >= next_mark:
+            if next_mark:
+                yield ''
+            yield f"[{format_timestamp(pending_start)}]"
+            next_mark = (pending_start // timestamp_interval + 1) * timestamp_interval
+        recent.append(pending)
+        yield pending
+
+    for cue in cues:
+        for line in cue.lines:
+            if rolling:
+                if pending is not None:
+                    if line == pending or pending.startswith(line):
+                        continue
+                    if line.startswith(pending):
+                        # 逐字增长的滚动字幕，用更完整的一行替换
+                        pending = line
+                        continue
+                if line in recent:
+                    continue
+            if pending is not None:
+                yield from flush()
+            pending = line
+            pending_start = cue.start
+
+    if pending is not None:
+        yield from flush()
+
+
+def format_timestamp(seconds: float) -> str:
+    seconds = int(seconds)
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+def parse_subtitle(path: Path, timestamp_interval: Optional[int] = None, automatic: bool = False) -> str:
+    """
+    读取字幕文件为纯文本转录
+    automatic: 是否为自动字幕（只对自动字幕去除滚动重复）
+    """
+    if timestamp_interval is None:
+        timestamp_interval = _timestamp_interval
+    with open(path, 'r', encoding='utf-8-sig', errors='replace') as f:
+        return '\n'.join(iter_transcript_lines(iter_cues(f), timestamp_interval, rolling=automatic))
+
+
+def _language_rank(lang: str, languages: List[str]) -> Optional[Tuple[int, str]]:
+    """
+    字幕语言在优先级列表中的排名，越小越优先；不在列表中返回None
+    完全匹配优先于同语种匹配（如优先 zh-CN 时，zh-Hans 算同语种）
+    """
+    lang_lower = lang.lower()
+    for i, preferred in enumerate(languages):
+        if lang_lower == preferred.lower():
+            return i, f"语言优先级第{i + 1}位"
+    base = lang_lower.split('-')[0]
+    for i, preferred in enumerate(languages):
+        if base == preferred.lower().split('-')[0]:
+            return len(languages) + i, f"与优先语言 {preferred} 同语种"
+    return None
+
+
+def _pick_format(formats: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """从同一字幕轨道的多个格式中选一个，优先可直接解析的格式"""
+    for ext in PARSABLE_FORMATS:
+        for fmt in formats:
+            if fmt.get('ext') == ext and (fmt.get('url') or fmt.get('data')):
+                return fmt
+    for fmt in formats:
+        if fmt.get('url') or fmt.get('data'):
+            return fmt
+    return None
+
+
+def _original_auto_tracks(info: Dict[str, Any]) -> Dict[str, Tuple[str, List[Dict[str, Any]]]]:
+    """
+    自动字幕中视频原始语言的轨道 {显示语言: (信息JSON中的键, 格式列表)}
+    YouTube 会为所有语言生成机器翻译的自动字幕，原始语言的轨道带 -orig 后缀
+    """
+    captions = info.get('automatic_captions') or {}
+    original = {key[:-len('-orig')]: (key, formats) for key, formats in captions.items() if key.endswith('-orig')}
+    if original:
+        return original
+    language = info.get('language')
+    if language and language in captions:
+        return {language: (language, captions[language])}
+    # 无法判断原始语言（非YouTube平台），全部作为候选
+    return {key: (key, formats) for key, formats in captions.items()}
+
+
+def select_subtitle(info: Dict[str, Any], languages: Optional[List[str]] = None) -> Optional[SubtitleChoice]:
+    """
+    根据信息JSON选出一条字幕：手动字幕 > 自动字幕，同类按语言优先级
+    没有符合条件的字幕时返回None
+    """
+    if languages is None:
+        languages = _languages
+
+    candidates = []
+    for lang, formats in (info.get('subtitles') or {}).items():
+        if lang in EXCLUDED_TRACKS:
+            continue
+        if lang.startswith('ai-'):
+            # B站AI生成的字幕，按自动字幕排序
+            candidates.append((True, lang[len('ai-'):], lang, formats))
+        else:
+            candidates.append((False, lang, lang, formats))
+    for lang, (key, formats) in _original_auto_tracks(info).items():
+        if lang in EXCLUDED_TRACKS:
+            continue
+        candidates.append((True, lang, key, formats))
+
+    best = None
+    for automatic, lang, key, formats in candidates:
+        ranked = _language_rank(lang, languages)
+        fmt = _pick_format(formats or [])
+        if ranked is None or fmt is None:
+            continue
+        order = (automatic, ranked[0])
+        if best is None or order < best[0]:
+            best = (order, automatic, key, lang, fmt, ranked[1])
+
+    if best is None:
+        return None
+
+    _, automatic, key, lang, fmt, match = best
+    kind = '自动字幕（视频原始语言）' if automatic else '手动字幕'
+    return SubtitleChoice(
+        lang=key,
+        ext=fmt.get('ext', 'vtt'),
+        automatic=automatic,
+        reason=f"{kind} {lang}，{match}，共 {len(candidates)} 条候选",
+        url=fmt.get('url'),
+        data=fmt.get('data')
+    )
+
+
+def configure(timestamp_interval: Optional[int] = None, languages: Optional[List[str]] = None) -> None:
+    """设置字幕解析参数"""
+    global _timestamp_interval, _languages
+    if timestamp_interval is not None:
+        _timestamp_interval = timestamp_interval
+    if languages:
+        _languages = list(languages)
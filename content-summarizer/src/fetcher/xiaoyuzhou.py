@@ -1,10 +1,12 @@
 """小宇宙抓取器"""
+import asyncio
 import re
-import json
-import urllib.request
-import xml.etree.ElementTree as ET
-from typing import List
-from .base import BaseFetcher, MediaItem
+from dataclasses import asdict
+from typing import Any, Callable, Dict, List, Optional
+from .base import BaseFetcher, MediaItem, ScanWatermark, Throttle
+from .cache import get_metadata_cache
+from .http import get_http_client
+from .rss import iter_rss_items
 
 
 class XiaoyuzhouFetcher(BaseFetcher):
@@ -31,97 +33,90 @@ class XiaoyuzhouFetcher(BaseFetcher):
 
         raise ValueError(f"无法从小宇宙URL中提取ID: {url}")
 
-    async def fetch_source_list(self, source_url: str) -> List[MediaItem]:
+    @staticmethod
+    def _is_rss_url(url: str) -> bool:
+        """订阅源是否为RSS链接（而非小宇宙网页）"""
+        return 'xiaoyuzhoufm.com/' not in url
+
+    async def fetch_source_list(
+        self,
+        source_url: str,
+        watermark: Optional[ScanWatermark] = None,
+        throttle: Optional[Throttle] = None
+    ) -> List[MediaItem]:
         """
         从小宇宙播客获取单集列表
-        source_url: 播客RSS链接
+        source_url: 播客RSS链接（优先直接解析RSS，失败时使用yt-dlp）或播客主页
         """
-        items = []
-
-        # 小宇宙使用RSS订阅，可以直接获取
-        # 但yt-dlp可能不支持，需要尝试
+        def build_item(info: Dict[str, Any]) -> Optional[MediaItem]:
+            # 提取单集ID
+            url = info.get('url', '')
+            ep_match = re.search(r'episode/([a-zA-Z0-9]+)', url)
+            if not ep_match:
+                return None
+            return MediaItem(
+                id=ep_match.group(1),
+                title=info.get('title', ''),
+                url=url,
+                published_at=info.get('upload_date', ''),
+                author=info.get('channel', ''),
+                duration=info.get('duration'),
+                thumbnail=info.get('thumbnail')
+            )
+
+        if not self._is_rss_url(source_url):
+            return await self._scan_playlist(source_url, build_item, watermark, throttle=throttle)
+
+        # RSS条件请求，订阅未更新时服务端只返回304
+        stop = watermark.is_known if watermark is not None else None
+        if throttle is not None:
+            await throttle()
         try:
-            cmd = [
-                '--dump-json',
-                '--flat-playlist',
-                source_url
-            ]
-            result = self._run_yt_dlp(cmd)
-
-            for line in result['output'].strip().split('\n'):
-                if not line.strip():
-                    continue
-                try:
-                    info = json.loads(line)
-                    # 提取单集ID
-                    url = info.get('url', '')
-                    ep_match = re.search(r'episode/([a-zA-Z0-9]+)', url)
-                    ep_id = ep_match.group(1) if ep_match else ''
-
-                    if ep_id:
-                        items.append(MediaItem(
-                            id=ep_id,
-                            title=info.get('title', ''),
-                            url=url,
-                            published_at=info.get('upload_date', ''),
-                            author=info.get('channel', ''),
-                            duration=info.get('duration'),
-                            thumbnail=info.get('thumbnail')
-                        ))
-                except json.JSONDecodeError:
-                    continue
+            items = await asyncio.to_thread(self._fetch_from_rss, source_url, stop)
         except Exception as e:
-            print(f"使用yt-dlp获取失败，尝试RSS解析: {e}")
-            # 备选：直接解析RSS
-            try:
-                items = self._fetch_from_rss(source_url)
-            except Exception as e2:
-                print(f"RSS解析也失败: {e2}")
-
+            print(f"RSS获取失败，尝试使用yt-dlp: {e}")
+            return await self._scan_playlist(source_url, build_item, watermark, throttle=throttle)
+
+        if watermark is not None:
+            items = [item for item in items if item.id not in watermark.known_ids]
+            if items:
+                watermark.newest_id = items[0].id
+                watermark.newest_date = items[0].published_at
         return items
 
-    def _fetch_from_rss(self, rss_url: str) -> List[MediaItem]:
-        """从RSS获取播客单集"""
-        items = []
-
-        try:
-            with urllib.request.urlopen(rss_url, timeout=30) as response:
-                content = response.read().decode('utf-8')
-
-            root = ET.fromstring(content)
-            channel = root.find('channel')
-
-            if channel is not None:
-                for item in channel.findall('item'):
-                    title = item.findtext('title', '')
-                    link = item.findtext('link', '')
-                    pub_date = item.findtext('pubDate', '')
-
-                    # 提取单集ID
-                    ep_match = re.search(r'episode/([a-zA-Z0-9]+)', link)
-                    ep_id = ep_match.group(1) if ep_match else ''
-
-                    if ep_id:
-                        # 尝试获取更多元数据
-                        enclosure = item.find('enclosure')
-                        duration = None
-                        if enclosure is not None:
-                            duration_str = enclosure.get('length', '')
-                            # length可能是文件大小，不是时长
-
-                        items.append(MediaItem(
-                            id=ep_id,
-                            title=title,
-                            url=link,
-                            published_at=pub_date,
-                            author=channel.findtext('title', ''),
-                            duration=duration,
-                            thumbnail=None
-                        ))
-
-        except Exception as e:
-            print(f"RSS解析错误: {e}")
-
+    def _fetch_from_rss(
+        self,
+        rss_url: str,
+        stop: Optional[Callable[[str], bool]] = None
+    ) -> List[MediaItem]:
+        """
+        从RSS获取播客单集，使用 ETag / Last-Modified 条件请求
+        边下载边解析，遇到已知单集（stop 返回True）即停止读取
+        """
+        cache = get_metadata_cache()
+        cached = cache.get_feed(rss_url)
+
+        headers = {}
+        if cached:
+            if cached['etag']:
+                headers['If-None-Match'] = cached['etag']
+            if cached['last_modified']:
+                headers['If-Modified-Since'] = cached['last_modified']
+
+        with get_http_client().stream(rss_url, headers) as response:
+            if response.status == 304 and cached:
+                return [MediaItem(**item) for item in cached['items']]
+            if response.status != 200:
+                raise RuntimeError(f"HTTP {response.status}")
+            items = list(iter_rss_items(response.iter_chunks(), stop))
+
+        # 缓存的是本次解析到的新单集，订阅未更新时直接复用
+        cache.put_feed(
+            rss_url,
+            response.headers.get('etag'),
+            response.headers.get('last-modified'),
+            [asdict(item) for item in items]
+        )
         return items
 
 
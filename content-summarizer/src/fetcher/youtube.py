@@ -1,8 +1,7 @@
 """YouTube抓取器"""
 import re
-import json
-from typing import List
-from .base import BaseFetcher, MediaItem
+from typing import Any, Dict, List, Optional
+from .base import BaseFetcher, MediaItem, ScanWatermark, Throttle
 
 
 class YouTubeFetcher(BaseFetcher):
@@ -25,39 +24,31 @@ class YouTubeFetcher(BaseFetcher):
 
         raise ValueError(f"无法从URL中提取YouTube视频ID: {url}")
 
-    async def fetch_source_list(self, source_url: str) -> List[MediaItem]:
+    async def fetch_source_list(
+        self,
+        source_url: str,
+        watermark: Optional[ScanWatermark] = None,
+        throttle: Optional[Throttle] = None
+    ) -> List[MediaItem]:
         """
         从YouTube频道获取视频列表
         source_url: 频道URL，如 https://www.youtube.com/@channel_name
         """
-        # 获取频道的所有视频
-        cmd = [
-            '--dump-json',
-            '--flat-playlist',
-            source_url
-        ]
-
-        result = self._run_yt_dlp(cmd)
-        items = []
-
-        for line in result['output'].strip().split('\n'):
-            if not line.strip():
-                continue
-            try:
-                info = json.loads(line)
-                items.append(MediaItem(
-                    id=info.get('id', ''),
-                    title=info.get('title', ''),
-                    url=f"https://www.youtube.com/watch?v={info.get('id', '')}",
-                    published_at=info.get('upload_date', ''),
-                    author=info.get('channel', ''),
-                    duration=info.get('duration'),
-                    thumbnail=info.get('thumbnail')
-                ))
-            except json.JSONDecodeError:
-                continue
-
-        return items
+        def build_item(info: Dict[str, Any]) -> Optional[MediaItem]:
+            video_id = info.get('id', '')
+            if not video_id:
+                return None
+            return MediaItem(
+                id=video_id,
+                title=info.get('title', ''),
+                url=f"https://www.youtube.com/watch?v={video_id}",
+                published_at=info.get('upload_date', ''),
+                author=info.get('channel', ''),
+                duration=info.get('duration'),
+                thumbnail=info.get('thumbnail')
+            )
+
+        return await self._scan_playlist(source_url, build_item, watermark, throttle)
 
 
 # 单例实例
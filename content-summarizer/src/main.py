@@ -1,8 +1,10 @@
 """Content Summarizer - 主入口"""
 import asyncio
 import argparse
+import json
 import sys
 import os
+import time
 from pathlib import Path
 
 # 解决Windows编码问题
@@ -13,135 +15,45 @@ import io
 sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
 
 from typing import List, Optional
-from datetime import datetime
 
-from .config import load_config, load_state, save_state
-from .fetcher.base import detect_url_type, MediaItem
-from .fetcher.youtube import get_youtube_fetcher
-from .fetcher.bilibili import get_bilibili_fetcher
-from .fetcher.xiaoyuzhou import get_xiaoyuzhou_fetcher
-from .summarizer.openai_client import get_summarizer
-from .archiver.writer import get_archiver
+from .archiver.catalog import REINDEX_WORKERS, get_catalog
+from .archiver.compression import COMPACT_WORKERS, TranscriptCodec
+from .config import get_output_dir, load_config
+from .fetcher import asr
+from .fetcher import cache as metadata_cache
+from .fetcher import runner
+from .fetcher import subtitle
+from .summarizer import cache as response_cache
+from .pipeline import BatchPipeline, PipelineItem, run_stages
+from .scanner import print_scan_report, scan_sources
+from .state import StateStore, get_state_store
 
 
-def get_fetcher(source_type: str):
-    """根据类型获取对应的抓取器"""
-    fetchers = {
-        'youtube': get_youtube_fetcher,
-        'bilibili': get_bilibili_fetcher,
-        'xiaoyuzhou': get_xiaoyuzhou_fetcher,
-    }
-
-    fetcher_fn = fetchers.get(source_type)
-    if not fetcher_fn:
-        raise ValueError(f"不支持的来源类型: {source_type}")
-
-    return fetcher_fn()
-
-
-async def process_single_url(url: str, config, state: dict) -> bool:
+async def process_single_url(url: str, config, state: StateStore) -> bool:
     """处理单个URL"""
     print(f"\n{'='*50}")
     print(f"处理: {url}")
     print('='*50)
 
-    # 检测URL类型
-    url_type = detect_url_type(url)
-    print(f"来源类型: {url_type}")
-
-    # 获取抓取器
-    fetcher = get_fetcher(url_type)
-
-    # 提取视频ID
-    video_id = fetcher.extract_id_from_url(url)
-    print(f"视频ID: {video_id}")
-
-    # 检查是否已处理
-    processed_list = state.get('processed', {}).get(url_type, [])
-    if any(item.get('video_id') == video_id or item.get('id') == video_id for item in processed_list):
-        print(f"[!] 已跳过: 该内容之前已处理过")
-        return False
-
-    # 抓取内容
-    print("\n[>] 抓取内容...")
-    try:
-        result = await fetcher.fetch_media(url)
-    except Exception as e:
-        print(f"[X] 抓取失败: {e}")
-        return False
-
-    media = result.media
-    transcript = result.transcript
-    cover_path = result.cover_path
-
-    print(f"标题: {media.title}")
-    print(f"发布时间: {media.published_at}")
-    print(f"作者: {media.author}")
-
-    if not transcript:
-        print("[!] 警告: 未获取到转录文本")
-        transcript = "（无转录）"
-
-    # AI改写
-    print("\n[*] AI改写中...")
-    try:
-        summarizer = get_summarizer(config)
-        summary = await summarizer.summarize(transcript)
-        print(f"[OK] 摘要生成完成: {summary.title}")
-    except Exception as e:
-        print(f"[X] AI改写失败: {e}")
-        return False
-
-    # 归档
-    print("\n[*] 归档中...")
-    try:
-        archiver = get_archiver()
-        output_path = archiver.archive(media, transcript, summary, cover_path)
-        print(f"[OK] 已归档到: {output_path}")
-    except Exception as e:
-        print(f"[X] 归档失败: {e}")
-        return False
-
-    # 更新状态
-    state.setdefault('processed', {}).setdefault(url_type, []).append({
-        'video_id': video_id,
-        'title': media.title,
-        'processed_at': datetime.now().isoformat()
-    })
+    item = PipelineItem(url=url)
+    return await run_stages(item, config, state)
 
-    return True
 
-
-async def batch_mode(config, state: dict):
+async def batch_mode(config, state: StateStore):
     """批量模式：扫描订阅源，让用户选择"""
     print("\n[*] 扫描订阅源...")
     print('='*50)
 
-    all_new_items = []
     enabled_sources = [s for s in config.sources if s.enabled]
 
-    for source in enabled_sources:
-        print(f"\n[*] 检查: {source.name} ({source.type})")
-
-        try:
-            fetcher = get_fetcher(source.type)
-            items = await fetcher.fetch_source_list(source.url)
-
-            # 过滤已处理的内容
-            processed_list = state.get('processed', {}).get(source.type, [])
-            processed_ids = {item.get('video_id', item.get('id', '')) for item in processed_list}
+    # 并发扫描所有订阅源
+    started = time.monotonic()
+    results = await scan_sources(enabled_sources, config, state)
+    print_scan_report(results, time.monotonic() - started)
 
-            new_items = [item for item in items if item.id not in processed_ids]
+    all_new_items = [item for result in results for item in result.items]
 
-            print(f"   发现 {len(items)} 个内容，其中 {len(new_items)} 个新内容")
-
-            for item in new_items:
-                item._source_name = source.name
-                item._source_type = source.type
-                all_new_items.append(item)
-
-        except Exception as e:
-            print(f"   [X] 获取失败: {e}")
+    state.set_last_scan()
 
     if not all_new_items:
         print("\n[OK] 没有新内容需要处理")
@@ -185,22 +97,124 @@ async def batch_mode(config, state: dict):
 
     print(f"\n已选择 {len(selected_items)} 个内容，开始处理...\n")
 
-    # 处理选中的内容
-    for item in selected_items:
-        await process_single_url(item.url, config, state)
-        # 每处理完一个保存状态
-        save_state(state)
+    # 流水线处理选中的内容，每归档一个即提交状态
+    pipeline = BatchPipeline(config, state)
+    await pipeline.run([item.url for item in selected_items])
+    pipeline.print_summary()
 
     print("\n[OK] 批量处理完成")
 
 
-async def url_mode(urls: List[str], config, state: dict):
+async def url_mode(urls: List[str], config, state: StateStore):
     """URL模式：直接处理指定URL"""
     for url in urls:
-        success = await process_single_url(url, config, state)
-        if success:
-            # 保存状态
-            save_state(state)
+        await process_single_url(url, config, state)
+
+
+def list_mode(args):
+    """列出已归档内容（读取目录索引）"""
+    catalog = get_catalog()
+    started = time.monotonic()
+    entries = catalog.query(
+        source=args.source,
+        author=args.author,
+        since=args.since,
+        until=args.until,
+        limit=args.limit
+    )
+    elapsed = (time.monotonic() - started) * 1000
+
+    for entry in entries:
+        title = entry.title_zh or entry.title
+        print(f"{entry.published_date or '----------'}  {entry.source:<10}  {entry.video_id:<14}  "
+              f"{entry.author}  |  {title}")
+    print(f"\n共 {len(entries)} 条（索引共 {catalog.count()} 条，查询 {elapsed:.1f}ms）")
+
+
+def search_mode(query: str, args):
+    """全文检索已归档内容"""
+    catalog = get_catalog()
+    started = time.monotonic()
+    results = catalog.search(
+        query,
+        source=args.source,
+        author=args.author,
+        since=args.since,
+        until=args.until,
+        limit=args.limit
+    )
+    elapsed = (time.monotonic() - started) * 1000
+
+    for i, result in enumerate(results, 1):
+        entry = result.entry
+        print(f"{i}. {entry.title_zh or entry.title}")
+        print(f"   {entry.published_date or '----------'}  {entry.source}  {entry.video_id}  {entry.author}")
+        print(f"   {result.snippet}")
+        print()
+    print(f"共 {len(results)} 条结果（查询 {elapsed:.1f}ms）")
+    if not results:
+        print("提示: 旧的归档内容需要先运行 reindex 建立全文索引")
+
+
+def show_mode(keys: List[str]):
+    """显示已归档内容的详情"""
+    catalog = get_catalog()
+    output_dir = get_output_dir()
+    for key in keys:
+        entry = catalog.get(key)
+        if entry is None:
+            print(f"[X] 未找到: {key}（可运行 reindex 重建索引）")
+            continue
+
+        content_dir = output_dir / entry.folder
+        print(f"\n{'='*50}")
+        print(entry.title_zh or entry.title)
+        print('='*50)
+        print(f"原始标题: {entry.title}")
+        print(f"来源: {entry.source}  ID: {entry.video_id}")
+        print(f"作者: {entry.author}")
+        print(f"发布时间: {entry.published_at}")
+        if entry.duration:
+            print(f"时长: {entry.duration // 60}分{entry.duration % 60}秒")
+        print(f"链接: {entry.source_url}")
+        print(f"目录: {content_dir}")
+        try:
+            with open(content_dir / 'metadata.json', 'r', encoding='utf-8') as f:
+                metadata = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"[!] 无法读取 metadata.json: {e}")
+            continue
+        duplicate = metadata.get('duplicate_of')
+        if duplicate:
+            print(f"重复内容: 与 {duplicate.get('folder')} 的转录相似度 {duplicate.get('similarity', 0):.0%}，摘要复用自该内容")
+        if metadata.get('core_points'):
+            print("核心观点:")
+            for i, point in enumerate(metadata['core_points'], 1):
+                print(f"  {i}. {point}")
+
+
+def reindex_mode(workers: Optional[int] = None, signatures: bool = True):
+    """从已有归档目录重建索引（signatures: 是否计算用于重复检测的转录签名）"""
+    output_dir = get_output_dir()
+    print(f"[*] 重建索引: {output_dir}")
+    started = time.monotonic()
+    indexed, skipped = get_catalog(output_dir).reindex(output_dir, workers or REINDEX_WORKERS, signatures)
+    print(f"[OK] 已索引 {indexed} 个内容，跳过 {skipped} 个目录（无 metadata.json），"
+          f"耗时 {time.monotonic() - started:.1f}s")
+
+
+def compact_mode(method: str, workers: Optional[int] = None):
+    """把已有归档中未压缩的转录转为压缩格式（zstd 还没有字典时先训练字典）"""
+    if method == 'none':
+        print("❌ 错误: 未启用转录压缩")
+        print("请在 config/sources.yaml 中设置 output.transcript_compression 为 gzip 或 zstd")
+        sys.exit(1)
+    output_dir = get_output_dir()
+    codec = TranscriptCodec(output_dir, method)
+    print(f"[*] 压缩转录（{codec.method}）: {output_dir}")
+    started = time.monotonic()
+    stats = codec.compact_archive(workers or COMPACT_WORKERS)
+    print(f"[OK] {stats.summary()}，耗时 {time.monotonic() - started:.1f}s")
 
 
 def main():
@@ -211,14 +225,46 @@ def main():
 
     parser.add_argument(
         'mode',
-        choices=['batch', 'url'],
-        help='运行模式: batch(批量模式) 或 url(URL模式)'
+        choices=['batch', 'url', 'list', 'show', 'search', 'reindex', 'compact'],
+        help='运行模式: batch(批量模式)、url(URL模式)、list(列出已归档内容)、'
+             'show(查看已归档内容)、search(全文检索)、reindex(重建归档索引)、compact(压缩已有转录)'
     )
 
     parser.add_argument(
         'urls',
         nargs='*',
-        help='URL模式下的URL列表'
+        help='URL模式下的URL列表；show 模式下为内容ID或目录名；search 模式下为检索词'
+    )
+
+    parser.add_argument('--source', help='list/search 模式: 按来源过滤（youtube / bilibili / xiaoyuzhou）')
+    parser.add_argument('--author', help='list/search 模式: 按作者过滤（包含即匹配）')
+    parser.add_argument('--since', help='list/search 模式: 发布日期不早于 YYYY-MM-DD')
+    parser.add_argument('--until', help='list/search 模式: 发布日期不晚于 YYYY-MM-DD')
+    parser.add_argument('--limit', type=int, default=50, help='list/search 模式: 最多显示条数，0 表示不限（默认50）')
+    parser.add_argument('--workers', type=int, help='reindex/compact 模式: 并行线程数（默认16/8）')
+
+    parser.add_argument(
+        '--fetch-workers',
+        type=int,
+        help='批量模式下抓取阶段并发数（覆盖 sources.yaml 中 pipeline.fetch_workers）'
+    )
+
+    parser.add_argument(
+        '--llm-workers',
+        type=int,
+        help='批量模式下AI改写阶段并发数（覆盖 sources.yaml 中 pipeline.llm_workers）'
+    )
+
+    parser.add_argument(
+        '--no-cache',
+        action='store_true',
+        help='本次运行不使用AI响应缓存'
+    )
+
+    parser.add_argument(
+        '--stream',
+        action='store_true',
+        help='流式生成摘要，边生成边写出部分 summary.md（覆盖 sources.yaml 中 ai.stream）'
     )
 
     args = parser.parse_args()
@@ -231,26 +277,94 @@ def main():
         print("\n请复制 config/sources.yaml.example 为 config/sources.yaml 并配置")
         sys.exit(1)
 
+    if args.fetch_workers:
+        config.pipeline.fetch_workers = args.fetch_workers
+    if args.llm_workers:
+        config.pipeline.llm_workers = args.llm_workers
+    if args.stream:
+        config.ai.stream = True
+
+    runner.configure(
+        max_processes=config.fetcher.max_processes,
+        timeout=config.fetcher.timeout,
+        backend=config.fetcher.backend
+    )
+    metadata_cache.configure(
+        ttl=config.fetcher.cache_ttl,
+        max_entries=config.fetcher.cache_max_entries,
+        memory_entries=config.fetcher.cache_memory_entries
+    )
+    response_cache.configure(
+        enabled=config.ai.cache_enabled and not args.no_cache,
+        max_bytes=config.ai.cache_max_mb * 1024 * 1024
+    )
+    subtitle.configure(
+        timestamp_interval=config.transcript.timestamp_interval,
+        languages=config.transcript.languages
+    )
+    asr.configure(
+        enabled=config.asr.enabled,
+        engine=config.asr.engine,
+        engine_options={
+            'model': config.asr.model,
+            'device': config.asr.device,
+            'compute_type': config.asr.compute_type,
+            'language': config.asr.language or None,
+        },
+        workers=config.asr.workers,
+        chunk_seconds=config.asr.chunk_seconds,
+        min_silence=config.asr.min_silence,
+        silence_threshold=config.asr.silence_threshold,
+        timeout=config.asr.timeout
+    )
+
+    # 归档查询不需要API Key
+    if args.mode == 'list':
+        list_mode(args)
+        return
+    if args.mode == 'show':
+        if not args.urls:
+            print("❌ 错误: show 模式下需要提供内容ID或目录名")
+            sys.exit(1)
+        show_mode(args.urls)
+        return
+    if args.mode == 'search':
+        if not args.urls:
+            print("❌ 错误: search 模式下需要提供检索词")
+            sys.exit(1)
+        search_mode(' '.join(args.urls), args)
+        return
+    if args.mode == 'reindex':
+        reindex_mode(args.workers, config.dedup.enabled)
+        return
+    if args.mode == 'compact':
+        compact_mode(config.output.transcript_compression, args.workers)
+        return
+
     # 检查API Key
     if not config.ai.api_key:
         print("❌ 错误: 未配置API Key")
         print("请设置环境变量 OPENAI_API_KEY 或在 config/sources.yaml 中配置")
         sys.exit(1)
 
-    # 加载状态
-    state = load_state()
+    # 加载状态（首次运行时自动导入 state.yaml）
+    state = get_state_store()
 
     # 运行
-    if args.mode == 'batch':
-        asyncio.run(batch_mode(config, state))
-    elif args.mode == 'url':
-        if not args.urls:
-            print("❌ 错误: URL模式下需要提供URL")
+    try:
+        if args.mode == 'batch':
+            asyncio.run(batch_mode(config, state))
+        elif args.mode == 'url':
+            if not args.urls:
+                print("❌ 错误: URL模式下需要提供URL")
+                parser.print_help()
+                sys.exit(1)
+            asyncio.run(url_mode(args.urls, config, state))
+        else:
             parser.print_help()
-            sys.exit(1)
-        asyncio.run(url_mode(args.urls, config, state))
-    else:
-        parser.print_help()
+    finally:
+        asr.shutdown()
+        metadata_cache.flush()
 
 
 if __name__ == '__main__':
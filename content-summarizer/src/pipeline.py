@@ -0,0 +1,453 @@
+"""批量处理流水线
+
+抓取 → AI改写 → 归档 三个阶段通过有界队列连接，
+每个阶段有独立的并发数，使抓取耗时与LLM等待时间相互重叠。
+每个阶段完成后保存中间结果，重新运行时从失败的阶段继续。
+AI改写前先按转录相似度查找已归档的重复内容（跨平台重新上传），找到时复用其摘要。
+"""
+import asyncio
+import shutil
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from .fetcher.base import detect_url_type, MediaItem, MediaResult
+from .fetcher.youtube import get_youtube_fetcher
+from .fetcher.bilibili import get_bilibili_fetcher
+from .fetcher.xiaoyuzhou import get_xiaoyuzhou_fetcher
+from .summarizer.cache import get_response_cache
+from .summarizer.client import get_usage_stats
+from .summarizer.openai_client import SummaryResult, get_parse_stats, get_summarizer
+from .summarizer.stream import StreamProgress
+from .archiver import dedup
+from .archiver.writer import get_archiver, read_summary
+from .state import FETCHED, SUMMARIZED, StateStore
+
+
+@dataclass
+class PipelineItem:
+    """流水线中的单个处理项"""
+    url: str
+    url_type: str = ''
+    video_id: str = ''
+    result: Optional[MediaResult] = None
+    transcript: str = ''
+    summary: Optional[SummaryResult] = None
+    signature: Optional[List[int]] = None            # 转录的 MinHash 签名（启用重复检测时计算）
+    duplicate_of: Optional[Dict[str, Any]] = None    # 重复的已归档内容（复用其摘要）
+    output_path: Optional[Path] = None
+    status: str = 'pending'           # pending | success | skipped | failed
+    failed_stage: Optional[str] = None
+    error: Optional[str] = None
+    claimed: bool = False             # 是否已在状态存储中认领
+
+    @property
+    def label(self) -> str:
+        """日志前缀"""
+        return f"[{self.video_id or self.url}]"
+
+
+@dataclass
+class StageStats:
+    """阶段统计"""
+    name: str
+    workers: int
+    busy: float = 0.0   # 所有worker累计忙碌时间(秒)
+    done: int = 0
+    failed: int = 0
+
+
+def get_fetcher(source_type: str):
+    """根据类型获取对应的抓取器"""
+    fetchers = {
+        'youtube': get_youtube_fetcher,
+        'bilibili': get_bilibili_fetcher,
+        'xiaoyuzhou': get_xiaoyuzhou_fetcher,
+    }
+
+    fetcher_fn = fetchers.get(source_type)
+    if not fetcher_fn:
+        raise ValueError(f"不支持的来源类型: {source_type}")
+
+    return fetcher_fn()
+
+
+def _advance(item: PipelineItem, state: StateStore, status: str, title: Optional[str] = None) -> bool:
+    """更新处理阶段；认领已过期并被其他进程接手时放弃该项"""
+    if state.update_status(item.url_type, item.video_id, status, title=title):
+        return True
+    item.claimed = False
+    item.status = 'skipped'
+    print(f"{item.label} [!] 已跳过: 认领已过期，该内容已由其他进程接手")
+    return False
+
+
+def _save_fetched(item: PipelineItem, state: StateStore) -> bool:
+    """保存抓取结果，封面移入中间结果目录；认领已失效时返回False"""
+    result = item.result
+    if result.cover_path and result.cover_path.exists():
+        cover_path = state.item_dir(item.url_type, item.video_id) / 'cover.jpg'
+        if result.cover_path != cover_path:
+            cover_path.parent.mkdir(parents=True, exist_ok=True)
+            shutil.move(str(result.cover_path), str(cover_path))
+            result.cover_path = cover_path
+
+    state.save_artifact(item.url_type, item.video_id, 'fetched', {
+        'media': asdict(result.media),
+        'transcript': result.transcript,
+        'cover_path': str(result.cover_path) if result.cover_path else None,
+        'transcript_info': result.transcript_info,
+    })
+    return _advance(item, state, FETCHED, title=result.media.title)
+
+
+def _restore(item: PipelineItem, state: StateStore) -> None:
+    """从中间结果恢复已完成的阶段"""
+    fetched = state.load_artifact(item.url_type, item.video_id, 'fetched')
+    if fetched is None:
+        return
+
+    cover_path = Path(fetched['cover_path']) if fetched.get('cover_path') else None
+    item.result = MediaResult(
+        media=MediaItem(**fetched['media']),
+        transcript=fetched['transcript'],
+        cover_path=cover_path if cover_path and cover_path.exists() else None,
+        transcript_info=fetched.get('transcript_info')
+    )
+
+    signature = state.load_artifact(item.url_type, item.video_id, 'signature')
+    if signature is not None:
+        item.signature = signature['signature']
+
+    summary = state.load_artifact(item.url_type, item.video_id, 'summary')
+    if summary is not None:
+        item.summary = SummaryResult(**summary)
+        item.duplicate_of = state.load_artifact(item.url_type, item.video_id, 'duplicate')
+
+
+async def fetch_stage(item: PipelineItem, config, state: StateStore) -> bool:
+    """抓取阶段：识别来源、去重并抓取内容"""
+    try:
+        item.url_type = detect_url_type(item.url)
+        fetcher = get_fetcher(item.url_type)
+        item.video_id = fetcher.extract_id_from_url(item.url)
+    except ValueError as e:
+        item.error = str(e)
+        print(f"[X] {e}")
+        return False
+
+    if state.is_processed(item.url_type, item.video_id):
+        item.status = 'skipped'
+        print(f"{item.label} [!] 已跳过: 该内容之前已处理过")
+        return False
+
+    record = state.claim(item.url_type, item.video_id, item.url)
+    if record is None:
+        item.status = 'skipped'
+        print(f"{item.label} [!] 已跳过: 该内容正在被其他进程处理")
+        return False
+    item.claimed = True
+
+    _restore(item, state)
+    if item.result is not None:
+        print(f"{item.label} [>] 从上次中断处继续（状态: {record.status}，已尝试 {record.attempts} 次）")
+    else:
+        print(f"{item.label} [>] 抓取内容 ({item.url_type})...")
+        try:
+            item.result = await fetcher.fetch_media(item.url)
+        except Exception as e:
+            item.error = str(e)
+            print(f"{item.label} [X] 抓取失败: {e}")
+            return False
+        if not _save_fetched(item, state):
+            return False
+
+    media = item.result.media
+    print(f"{item.label} 标题: {media.title}")
+    print(f"{item.label} 发布时间: {media.published_at}")
+    print(f"{item.label} 作者: {media.author}")
+    print(f"{item.label} yt-dlp 调用次数: {item.result.yt_dlp_spawns}")
+
+    item.transcript = item.result.transcript
+    if not item.transcript:
+        # 没有转录就不调用AI，避免对空内容生成摘要
+        item.error = "未获取到转录文本（无字幕且语音识别不可用或失败）"
+        print(f"{item.label} [X] {item.error}")
+        return False
+
+    return True
+
+
+def _find_duplicate(item: PipelineItem, threshold: float) -> Optional[Dict[str, Any]]:
+    """
+    按转录签名查找已归档的重复内容，找到时设置 item.summary
+    返回重复内容信息（写入 metadata.json 的 duplicate_of）
+    """
+    if item.signature is None:
+        return None
+    archiver = get_archiver()
+    match = archiver.catalog.find_similar(item.signature, threshold, exclude=(item.url_type, item.video_id))
+    if match is None:
+        return None
+    entry, score = match
+    summary = read_summary(archiver.output_dir / entry.folder)
+    if summary is None:
+        return None
+    item.summary = summary
+    return {
+        'folder': entry.folder,
+        'source': entry.source,
+        'video_id': entry.video_id,
+        'similarity': round(score, 3),
+    }
+
+
+async def summarize_stage(item: PipelineItem, config, state: StateStore) -> bool:
+    """AI改写阶段（转录与已归档内容重复时复用其摘要，不调用AI）"""
+    if config.dedup.enabled and item.signature is None:
+        # 签名计算是CPU密集的，放到线程中执行；保存到中间结果，恢复时不再计算，归档时写入索引
+        item.signature = await asyncio.to_thread(dedup.signature, item.transcript)
+        state.save_artifact(item.url_type, item.video_id, 'signature', {'signature': item.signature})
+
+    if item.summary is not None:
+        print(f"{item.label} [OK] 复用已生成的摘要: {item.summary.title}")
+        return True
+
+    if config.dedup.enabled:
+        duplicate = _find_duplicate(item, config.dedup.threshold)
+        if duplicate is not None:
+            item.duplicate_of = duplicate
+            print(f"{item.label} [OK] 与已归档内容重复（相似度 {duplicate['similarity']:.0%}）: "
+                  f"{duplicate['folder']}，复用其摘要")
+            state.save_artifact(item.url_type, item.video_id, 'duplicate', duplicate)
+            state.save_artifact(item.url_type, item.video_id, 'summary', asdict(item.summary))
+            return _advance(item, state, SUMMARIZED)
+
+    print(f"{item.label} [*] AI改写中...")
+    progress = None
+    if config.ai.stream:
+        media = item.result.media
+        archiver = get_archiver()
+        progress = StreamProgress(lambda partial: archiver.write_partial(media, partial))
+    try:
+        summarizer = get_summarizer(config)
+        item.summary = await summarizer.summarize(item.transcript, progress=progress)
+        print(f"{item.label} [OK] 摘要生成完成: {item.summary.title}")
+        stats = progress.stats() if progress is not None else None
+        if stats:
+            print(f"{item.label}      {stats}")
+    except Exception as e:
+        item.error = str(e)
+        print(f"{item.label} [X] AI改写失败: {e}")
+        return False
+
+    state.save_artifact(item.url_type, item.video_id, 'summary', asdict(item.summary))
+    return _advance(item, state, SUMMARIZED)
+
+
+async def archive_stage(item: PipelineItem, config, state: StateStore) -> bool:
+    """归档阶段：写入文件并更新状态"""
+    print(f"{item.label} [*] 归档中...")
+    result = item.result
+    try:
+        archiver = get_archiver()
+        # 写文件、fsync 和更新索引都是阻塞操作，放到线程中执行，不阻塞其他阶段
+        item.output_path = await asyncio.to_thread(
+            archiver.archive,
+            result.media, item.transcript, item.summary, result.cover_path,
+            transcript_info=result.transcript_info,
+            signature=item.signature,
+            duplicate_of=item.duplicate_of
+        )
+        print(f"{item.label} [OK] 已归档到: {item.output_path}")
+    except Exception as e:
+        item.error = str(e)
+        print(f"{item.label} [X] 归档失败: {e}")
+        return False
+
+    # 更新状态（同时清理中间结果）
+    state.mark_processed(item.url_type, item.video_id, result.media.title)
+    return True
+
+
+def release_claim(item: PipelineItem, state: StateStore) -> None:
+    """未处理完（被中断）的项释放认领，重新运行时可以立即继续"""
+    if item.claimed and item.status == 'pending':
+        item.claimed = False
+        state.release(item.url_type, item.video_id)
+
+
+def record_failure(item: PipelineItem, stage: str, state: StateStore) -> None:
+    """标记失败并写入状态存储"""
+    item.status = 'failed'
+    item.failed_stage = stage
+    if item.claimed:
+        item.claimed = False
+        if not state.mark_failed(item.url_type, item.video_id, stage, item.error or ''):
+            print(f"{item.label} [!] 认领已过期，该内容已由其他进程接手，不记录本次失败")
+
+
+StageFn = Callable[[PipelineItem, object, StateStore], Awaitable[bool]]
+
+STAGES = [
+    ('fetch', fetch_stage),
+    ('summarize', summarize_stage),
+    ('archive', archive_stage),
+]
+
+
+async def run_stages(item: PipelineItem, config, state: StateStore) -> bool:
+    """顺序执行所有阶段（URL模式使用）"""
+    try:
+        for name, stage_fn in STAGES:
+            if not await stage_fn(item, config, state):
+                if item.status != 'skipped':
+                    record_failure(item, name, state)
+                return False
+        item.status = 'success'
+        return True
+    finally:
+        release_claim(item, state)
+
+
+class BatchPipeline:
+    """批量处理流水线"""
+
+    def __init__(
+        self,
+        config,
+        state: StateStore,
+        on_item_done: Optional[Callable[[PipelineItem], None]] = None
+    ):
+        self.config = config
+        self.state = state
+        self.on_item_done = on_item_done
+
+        pipeline_config = config.pipeline
+        self.stats = [
+            StageStats('fetch', max(1, pipeline_config.fetch_workers)),
+            StageStats('summarize', max(1, pipeline_config.llm_workers)),
+            StageStats('archive', max(1, pipeline_config.archive_workers)),
+        ]
+        self.queue_size = max(1, pipeline_config.queue_size)
+        self.items: List[PipelineItem] = []
+        self.elapsed = 0.0
+
+    async def _worker(
+        self,
+        stats: StageStats,
+        stage_fn: StageFn,
+        in_queue: asyncio.Queue,
+        out_queue: Optional[asyncio.Queue]
+    ) -> None:
+        """阶段worker：从输入队列取项，处理后放入下一阶段队列"""
+        while True:
+            item = await in_queue.get()
+            if item is None:
+                return
+
+            started = time.monotonic()
+            try:
+                ok = await stage_fn(item, self.config, self.state)
+            except Exception as e:
+                item.error = str(e)
+                print(f"{item.label} [X] {stats.name} 阶段异常: {e}")
+                ok = False
+            stats.busy += time.monotonic() - started
+
+            if not ok:
+                if item.status != 'skipped':
+                    record_failure(item, stats.name, self.state)
+                    stats.failed += 1
+                self._finish(item)
+                continue
+
+            stats.done += 1
+            if out_queue is not None:
+                await out_queue.put(item)
+            else:
+                item.status = 'success'
+                self._finish(item)
+
+    def _finish(self, item: PipelineItem) -> None:
+        """单项处理结束回调"""
+        if self.on_item_done:
+            self.on_item_done(item)
+
+    async def run(self, urls: List[str]) -> List[PipelineItem]:
+        """运行流水线，返回所有处理项"""
+        self.items = [PipelineItem(url=url) for url in urls]
+        queues = [asyncio.Queue(maxsize=self.queue_size) for _ in STAGES]
+        started = time.monotonic()
+
+        stage_tasks = []
+        for i, ((_, stage_fn), stats) in enumerate(zip(STAGES, self.stats)):
+            out_queue = queues[i + 1] if i + 1 < len(queues) else None
+            stage_tasks.append([
+                asyncio.create_task(self._worker(stats, stage_fn, queues[i], out_queue))
+                for _ in range(stats.workers)
+            ])
+
+        try:
+            for item in self.items:
+                await queues[0].put(item)
+
+            # 逐级关闭：上一阶段全部结束后，再向下一阶段发送结束信号
+            for i, tasks in enumerate(stage_tasks):
+                for _ in tasks:
+                    await queues[i].put(None)
+                await asyncio.gather(*tasks)
+        finally:
+            # 被中断（Ctrl-C）或异常退出时，停止所有worker并释放处理中的项的认领
+            for tasks in stage_tasks:
+                for task in tasks:
+                    task.cancel()
+            for item in self.items:
+                release_claim(item, self.state)
+
+        self.elapsed = time.monotonic() - started
+        return self.items
+
+    def print_summary(self) -> None:
+        """打印吞吐量统计"""
+        counts: Dict[str, int] = {}
+        for item in self.items:
+            counts[item.status] = counts.get(item.status, 0) + 1
+
+        succeeded = counts.get('success', 0)
+        minutes = self.elapsed / 60 if self.elapsed > 0 else 0
+        rate = succeeded / minutes if minutes else 0.0
+
+        print("\n" + "="*50)
+        print("处理统计:")
+        print("="*50)
+        print(f"成功: {succeeded}  跳过: {counts.get('skipped', 0)}  失败: {counts.get('failed', 0)}")
+        print(f"总耗时: {self.elapsed:.1f}s  吞吐量: {rate:.2f} 个/分钟")
+        fetched = [item.result for item in self.items if item.result is not None]
+        if fetched:
+            spawns = sum(result.yt_dlp_spawns for result in fetched)
+            print(f"yt-dlp 调用: {spawns} 次（平均 {spawns / len(fetched):.1f} 次/个）")
+        cache = get_response_cache()
+        if cache is not None and cache.hits + cache.misses:
+            print(f"AI响应缓存: {cache.stats()}")
+        usage = get_usage_stats()
+        if usage is not None and usage.calls + usage.failures:
+            print(f"AI调用: {usage.summary()}")
+        duplicates = sum(1 for item in self.items if item.duplicate_of)
+        if duplicates:
+            print(f"重复内容: {duplicates} 个（复用已有摘要，未调用AI）")
+        parse_stats = get_parse_stats()
+        if parse_stats is not None and parse_stats.parsed:
+            print(f"摘要解析: {parse_stats.summary()}")
+        for stats in self.stats:
+            capacity = self.elapsed * stats.workers
+            utilization = stats.busy / capacity * 100 if capacity else 0.0
+            print(f"  {stats.name:<10} workers={stats.workers}  忙碌 {stats.busy:.1f}s  "
+                  f"利用率 {utilization:.0f}%  完成 {stats.done}  失败 {stats.failed}")
+
+        failed_items = [item for item in self.items if item.status == 'failed']
+        if failed_items:
+            print("\n失败列表:")
+            for item in failed_items:
+                print(f"  - {item.url} ({item.failed_stage}): {item.error}")
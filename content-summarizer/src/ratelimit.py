@@ -0,0 +1,49 @@
+"""异步令牌桶限流"""
+import asyncio
+import time
+from typing import Optional
+
+
+class TokenBucket:
+    """
+    令牌桶
+    rate: 每秒补充的令牌数
+    capacity: 桶容量（允许的突发量）
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        if rate <= 0:
+            raise ValueError(f"令牌补充速率必须大于0: {rate}")
+        self.rate = rate
+        self.capacity = capacity if capacity and capacity > 0 else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, tokens: float = 1.0) -> float:
+        """获取令牌，不足时等待；返回等待的秒数。超过容量的请求按容量计"""
+        tokens = min(tokens, self.capacity)
+        waited = 0.0
+        # 加锁保证先到先得
+        async with self._lock:
+            while True:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return waited
+                delay = (tokens - self._tokens) / self.rate
+                await asyncio.sleep(delay)
+                waited += delay
+
+    def refund(self, tokens: float) -> None:
+        """
+        按实际用量修正：预估多扣的令牌退回（正数），少扣的补扣（负数）
+        补扣后令牌可以为负，之后的请求会等待令牌补足
+        """
+        self._refill()
+        self._tokens = min(self.capacity, self._tokens + tokens)
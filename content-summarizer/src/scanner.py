@@ -0,0 +1,138 @@
+"""订阅源并发扫描
+
+所有订阅源并发扫描，每个平台使用独立的令牌桶限制请求频率
+（每次yt-dlp调用或RSS请求都取令牌，包括扩大窗口重扫和换参数重试），
+每个订阅源有独立超时，单个频道卡住不会拖慢整体扫描。
+"""
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from .fetcher.base import MediaItem, ScanWatermark
+from .pipeline import get_fetcher
+from .ratelimit import TokenBucket
+from .state import StateStore
+
+
+@dataclass
+class ScanResult:
+    """单个订阅源的扫描结果"""
+    source: object
+    items: List[MediaItem] = field(default_factory=list)  # 待处理内容（新内容 + 之前未处理的）
+    scanned: int = 0
+    new_count: int = 0
+    wait: float = 0.0      # 等待限流的时间(秒)
+    latency: float = 0.0   # 扫描耗时(秒)
+    error: Optional[str] = None
+
+
+def _build_buckets(scan_config) -> Dict[str, TokenBucket]:
+    """按平台创建令牌桶"""
+    buckets = {}
+    for platform, limit in (scan_config.rate_limits or {}).items():
+        buckets[platform] = TokenBucket(limit.get('rate', 1.0), limit.get('burst'))
+    return buckets
+
+
+async def scan_source(source, config, state: StateStore, bucket: Optional[TokenBucket]) -> ScanResult:
+    """扫描单个订阅源"""
+    result = ScanResult(source=source)
+    source_key = f"{source.type}:{source.url}"
+
+    try:
+        fetcher = get_fetcher(source.type)
+
+        # 增量扫描：从上次的水位开始，遇到已处理内容即停止
+        watermark = ScanWatermark(
+            window=config.scan.window,
+            min_window=config.scan.window,
+            max_window=config.scan.max_window,
+            known_ids=state.processed_ids(source.type)
+        )
+        saved = state.get_watermark(source_key)
+        if saved:
+            watermark.newest_id = saved['newest_id']
+            watermark.newest_date = saved['newest_date']
+            watermark.window = saved['window'] or watermark.window
+
+        # 第一次请求的令牌在计时前获取，排队等待不计入扫描超时
+        prepaid = bucket is not None
+        if bucket is not None:
+            result.wait = await bucket.acquire()
+
+        async def throttle() -> None:
+            nonlocal prepaid
+            if prepaid:
+                prepaid = False
+                return
+            if bucket is not None:
+                result.wait += await bucket.acquire()
+
+        started = time.monotonic()
+        try:
+            items = await asyncio.wait_for(
+                fetcher.fetch_source_list(source.url, watermark, throttle),
+                timeout=config.scan.timeout
+            )
+        finally:
+            result.latency = time.monotonic() - started
+        state.save_watermark(source_key, watermark.newest_id, watermark.newest_date, watermark.window)
+    except asyncio.TimeoutError:
+        result.error = f"超时（{config.scan.timeout}s）"
+        return result
+    except Exception as e:
+        result.error = str(e)
+        return result
+
+    # 过滤已处理的内容
+    processed_ids = state.processed_ids(source.type)
+    new_items = [item for item in items if item.id not in processed_ids]
+    state.mark_listed(
+        source.type,
+        source_key,
+        [(item.id, item.title, item.url, item.published_at) for item in new_items]
+    )
+
+    # 补充之前扫描到但尚未处理的内容（位于水位之后，本次不会再被扫描到）
+    scanned_ids = {item.id for item in new_items}
+    pending = [
+        MediaItem(id=video_id, title=title or '', url=url, published_at=published_at or '', author='')
+        for video_id, title, url, published_at in state.pending_items(source_key)
+        if video_id not in scanned_ids
+    ]
+
+    for item in new_items + pending:
+        item._source_name = source.name
+        item._source_type = source.type
+    result.items = new_items + pending
+    result.scanned = len(items)
+    result.new_count = len(new_items)
+    return result
+
+
+async def scan_sources(sources: list, config, state: StateStore) -> List[ScanResult]:
+    """并发扫描所有订阅源，结果按配置顺序返回"""
+    buckets = _build_buckets(config.scan)
+
+    async def run(source) -> ScanResult:
+        print(f"[*] 检查: {source.name} ({source.type})")
+        result = await scan_source(source, config, state, buckets.get(source.type))
+        if result.error:
+            print(f"   [X] {source.name} 获取失败: {result.error}")
+        else:
+            print(f"   [OK] {source.name}: 扫描 {result.scanned} 个内容，其中 {result.new_count} 个新内容，"
+                  f"{len(result.items) - result.new_count} 个待处理（{result.latency:.1f}s）")
+        return result
+
+    return list(await asyncio.gather(*[run(source) for source in sources]))
+
+
+def print_scan_report(results: List[ScanResult], elapsed: float) -> None:
+    """打印各订阅源扫描耗时"""
+    print("\n" + "-"*50)
+    print(f"扫描耗时: {elapsed:.1f}s")
+    for result in sorted(results, key=lambda r: r.latency, reverse=True):
+        status = result.error or f"{len(result.items)} 个待处理"
+        wait = f"，限流等待 {result.wait:.1f}s" if result.wait >= 0.1 else ""
+        print(f"  {result.latency:6.1f}s  [{result.source.type}] {result.source.name}: {status}{wait}")
@@ -0,0 +1,407 @@
+"""处理状态存储
+
+使用SQLite（WAL模式）记录内容处理状态，(platform, video_id) 为主键，
+每次状态变化只提交一行；已处理ID在内存中按平台缓存为集合，查重为O(1)。
+首次打开时自动导入旧的 state.yaml。
+
+每个内容依次经过 listed → fetched → summarized → archived，失败时记为 failed
+并累计尝试次数，失败达到 MAX_ATTEMPTS 次后扫描时不再重新排队。抓取和改写的中间结果以原子写入方式保存在 config/work/ 下，
+重新运行时从失败的阶段继续。多个进程同时运行时，写操作使用 BEGIN IMMEDIATE
+串行化，内容处理前需先认领（带租约），避免重复处理；处理中断时释放认领，
+本机已退出的进程留下的认领直接视为过期。更新状态时只修改本进程认领的记录，
+租约过期被其他进程接手后，原进程的更新不生效（返回False）。
+
+sources 表保存每个订阅源的扫描水位（最新内容ID/日期和扫描窗口）。
+"""
+import json
+import os
+import shutil
+import socket
+import sqlite3
+import sys
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+import yaml
+
+from .config import CONFIG_DIR
+
+
+SCHEMA_VERSION = 3
+
+# 认领租约(秒)，超时未更新视为处理进程已退出
+CLAIM_LEASE = 2 * 3600
+
+# 失败达到该次数后，扫描时不再重新排队（仍可通过URL模式手动处理）
+MAX_ATTEMPTS = 3
+
+# 状态
+LISTED = 'listed'
+FETCHED = 'fetched'
+SUMMARIZED = 'summarized'
+ARCHIVED = 'archived'
+FAILED = 'failed'
+
+
+@dataclass
+class ItemRecord:
+    """单个内容的处理记录"""
+    platform: str
+    video_id: str
+    status: str
+    attempts: int = 0
+    failed_stage: Optional[str] = None
+    last_error: Optional[str] = None
+
+
+def _pid_alive(pid: int) -> bool:
+    """本机进程是否仍在运行"""
+    if sys.platform == 'win32':
+        # Windows 上 os.kill 会结束进程，无法用来检测，按租约判断
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def atomic_write_json(path: Path, data: Any) -> None:
+    """先写临时文件再重命名，保证文件要么是旧内容要么是完整的新内容"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class StateStore:
+    """处理状态存储"""
+
+    def __init__(self, db_path: Path, legacy_path: Optional[Path] = None):
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.db_path = db_path
+        self.work_dir = db_path.parent / "work"
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+
+        # 自动提交模式，写事务通过 _write() 显式开启
+        self._conn = sqlite3.connect(str(db_path), timeout=30, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self._write():
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS items (
+                    platform TEXT NOT NULL,
+                    video_id TEXT NOT NULL,
+                    title TEXT,
+                    processed_at TEXT,
+                    PRIMARY KEY (platform, video_id)
+                ) WITHOUT ROWID
+            """)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS meta (
+                    key TEXT PRIMARY KEY,
+                    value TEXT
+                )
+            """)
+            self._migrate_schema()
+
+        # 平台 -> 已处理ID集合（按需加载）
+        self._processed: Dict[str, Set[str]] = {}
+
+        if legacy_path is not None and legacy_path.exists():
+            self._migrate_yaml(legacy_path)
+
+    @contextmanager
+    def _write(self) -> Iterator[sqlite3.Connection]:
+        """写事务：BEGIN IMMEDIATE 获取写锁，与其他进程串行"""
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield self._conn
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        else:
+            self._conn.execute("COMMIT")
+
+    def _get_meta(self, key: str) -> Optional[str]:
+        row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key: str, value: str) -> None:
+        self._conn.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)", (key, value))
+
+    def _migrate_schema(self) -> None:
+        """升级表结构（在写事务内调用）"""
+        version = int(self._get_meta('schema_version') or 1)
+        if version < 2:
+            # v2: 增加处理阶段、失败次数和认领信息，已有记录均为已归档
+            for column in [
+                "url TEXT",
+                f"status TEXT NOT NULL DEFAULT '{ARCHIVED}'",
+                "attempts INTEGER NOT NULL DEFAULT 0",
+                "failed_stage TEXT",
+                "last_error TEXT",
+                "updated_at TEXT",
+                "claimed_by TEXT",
+                "claimed_at REAL",
+            ]:
+                self._conn.execute(f"ALTER TABLE items ADD COLUMN {column}")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_items_status ON items(platform, status)")
+        if version < 3:
+            # v3: 记录内容所属订阅源，增加订阅源扫描水位表
+            self._conn.execute("ALTER TABLE items ADD COLUMN source TEXT")
+            self._conn.execute("ALTER TABLE items ADD COLUMN published_at TEXT")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_items_source ON items(source, status)")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS sources (
+                    source TEXT PRIMARY KEY,
+                    newest_id TEXT,
+                    newest_date TEXT,
+                    scan_window INTEGER,
+                    scanned_at TEXT
+                )
+            """)
+        self._set_meta('schema_version', str(SCHEMA_VERSION))
+
+    def _migrate_yaml(self, legacy_path: Path) -> None:
+        """一次性导入旧的 state.yaml，导入后重命名为 state.yaml.migrated"""
+        if self._get_meta('yaml_migrated'):
+            return
+
+        with open(legacy_path, 'r', encoding='utf-8') as f:
+            data = yaml.safe_load(f) or {}
+
+        rows = []
+        for platform, entries in (data.get('processed') or {}).items():
+            for entry in entries or []:
+                video_id = entry.get('video_id') or entry.get('episode_id') or entry.get('id')
+                if video_id:
+                    rows.append((platform, str(video_id), entry.get('title', ''), entry.get('processed_at')))
+
+        with self._write():
+            if self._get_meta('yaml_migrated'):
+                return
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO items (platform, video_id, title, processed_at) VALUES (?, ?, ?, ?)",
+                rows
+            )
+            if data.get('last_scan'):
+                self._set_meta('last_scan', str(data['last_scan']))
+            self._set_meta('yaml_migrated', datetime.now().isoformat())
+
+        legacy_path.rename(legacy_path.with_name(legacy_path.name + '.migrated'))
+        print(f"[OK] 已从 {legacy_path.name} 导入 {len(rows)} 条处理记录")
+
+    def processed_ids(self, platform: str) -> Set[str]:
+        """获取某平台所有已处理ID"""
+        if platform not in self._processed:
+            rows = self._conn.execute(
+                "SELECT video_id FROM items WHERE platform = ? AND status = ?",
+                (platform, ARCHIVED)
+            )
+            self._processed[platform] = {row[0] for row in rows}
+        return self._processed[platform]
+
+    def is_processed(self, platform: str, video_id: str) -> bool:
+        """检查内容是否已处理（包括其他进程刚处理完的）"""
+        processed = self.processed_ids(platform)
+        if video_id in processed:
+            return True
+        row = self._conn.execute(
+            "SELECT 1 FROM items WHERE platform = ? AND video_id = ? AND status = ?",
+            (platform, video_id, ARCHIVED)
+        ).fetchone()
+        if row:
+            processed.add(video_id)
+            return True
+        return False
+
+    def get_item(self, platform: str, video_id: str) -> Optional[ItemRecord]:
+        """查询单个内容的处理记录"""
+        row = self._conn.execute(
+            "SELECT status, attempts, failed_stage, last_error FROM items WHERE platform = ? AND video_id = ?",
+            (platform, video_id)
+        ).fetchone()
+        if row is None:
+            return None
+        return ItemRecord(platform, video_id, row[0], row[1], row[2], row[3])
+
+    def mark_listed(self, platform: str, source: str, items: Iterable[Tuple[str, str, str, str]]) -> None:
+        """
+        记录扫描到的新内容，items为 (video_id, title, url, published_at)
+        已有记录只补充来源信息
+        """
+        now = datetime.now().isoformat()
+        rows = [
+            (platform, video_id, title, url, published_at, source, LISTED, now)
+            for video_id, title, url, published_at in items
+        ]
+        if not rows:
+            return
+        with self._write():
+            self._conn.executemany(
+                "INSERT INTO items (platform, video_id, title, url, published_at, source, status, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (platform, video_id) DO UPDATE SET source = COALESCE(items.source, excluded.source)",
+                rows
+            )
+
+    def pending_items(self, source: str, max_attempts: int = MAX_ATTEMPTS) -> List[Tuple[str, str, str, str]]:
+        """
+        订阅源中已扫描但尚未归档的内容，返回 (video_id, title, url, published_at)
+        max_attempts: 失败次数达到该值的内容不再返回，0表示不限制
+        """
+        rows = self._conn.execute(
+            "SELECT video_id, title, url, published_at FROM items "
+            "WHERE source = ? AND status != ? AND url IS NOT NULL "
+            "AND (status != ? OR ? <= 0 OR attempts < ?) "
+            "ORDER BY published_at DESC",
+            (source, ARCHIVED, FAILED, max_attempts, max_attempts)
+        )
+        return [tuple(row) for row in rows]
+
+    def get_watermark(self, source: str) -> Optional[Dict[str, Any]]:
+        """读取订阅源扫描水位"""
+        row = self._conn.execute(
+            "SELECT newest_id, newest_date, scan_window FROM sources WHERE source = ?",
+            (source,)
+        ).fetchone()
+        if row is None:
+            return None
+        return {'newest_id': row[0], 'newest_date': row[1], 'window': row[2]}
+
+    def save_watermark(self, source: str, newest_id: Optional[str], newest_date: Optional[str], window: int) -> None:
+        """保存订阅源扫描水位"""
+        with self._write():
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sources VALUES (?, ?, ?, ?, ?)",
+                (source, newest_id, newest_date, window, datetime.now().isoformat())
+            )
+
+    def _owner_exited(self, owner: Optional[str]) -> bool:
+        """认领者是否为本机上已退出的进程（崩溃或被中断后重启，pid 已变化）"""
+        if not owner or owner == self.owner:
+            return False
+        host, _, pid = owner.rpartition(':')
+        if host != socket.gethostname() or not pid.isdigit():
+            return False
+        return not _pid_alive(int(pid))
+
+    def claim(self, platform: str, video_id: str, url: str = '') -> Optional[ItemRecord]:
+        """
+        认领内容开始处理
+        返回处理记录；已归档或正被其他进程处理时返回None
+        租约过期、或认领者是本机已退出的进程时可以重新认领
+        """
+        now = time.time()
+        with self._write():
+            self._conn.execute(
+                "INSERT OR IGNORE INTO items (platform, video_id, url, status, updated_at) VALUES (?, ?, ?, ?, ?)",
+                (platform, video_id, url, LISTED, datetime.now().isoformat())
+            )
+            row = self._conn.execute(
+                "SELECT claimed_by FROM items WHERE platform = ? AND video_id = ?",
+                (platform, video_id)
+            ).fetchone()
+            stale_owner = row[0] if row and self._owner_exited(row[0]) else None
+            cursor = self._conn.execute(
+                "UPDATE items SET claimed_by = ?, claimed_at = ? "
+                "WHERE platform = ? AND video_id = ? AND status != ? "
+                "AND (claimed_by IS NULL OR claimed_by = ? OR claimed_at < ? OR claimed_by = ?)",
+                (self.owner, now, platform, video_id, ARCHIVED, self.owner, now - CLAIM_LEASE, stale_owner)
+            )
+            if cursor.rowcount != 1:
+                return None
+        return self.get_item(platform, video_id)
+
+    def release(self, platform: str, video_id: str) -> None:
+        """释放认领"""
+        with self._write():
+            self._conn.execute(
+                "UPDATE items SET claimed_by = NULL, claimed_at = NULL "
+                "WHERE platform = ? AND video_id = ? AND claimed_by = ?",
+                (platform, video_id, self.owner)
+            )
+
+    def update_status(self, platform: str, video_id: str, status: str, title: Optional[str] = None) -> bool:
+        """更新处理阶段（同时续约认领）；认领已被其他进程接手时不更新，返回False"""
+        with self._write():
+            cursor = self._conn.execute(
+                "UPDATE items SET status = ?, title = COALESCE(?, title), updated_at = ?, claimed_at = ? "
+                "WHERE platform = ? AND video_id = ? AND claimed_by = ?",
+                (status, title, datetime.now().isoformat(), time.time(), platform, video_id, self.owner)
+            )
+        return cursor.rowcount == 1
+
+    def mark_failed(self, platform: str, video_id: str, stage: str, error: str) -> bool:
+        """记录失败阶段并累计尝试次数，释放认领；认领已被其他进程接手时不更新，返回False"""
+        with self._write():
+            cursor = self._conn.execute(
+                "UPDATE items SET status = ?, failed_stage = ?, last_error = ?, attempts = attempts + 1, "
+                "updated_at = ?, claimed_by = NULL, claimed_at = NULL "
+                "WHERE platform = ? AND video_id = ? AND claimed_by = ?",
+                (FAILED, stage, error, datetime.now().isoformat(), platform, video_id, self.owner)
+            )
+        return cursor.rowcount == 1
+
+    def mark_processed(self, platform: str, video_id: str, title: str) -> None:
+        """记录已归档（单行提交），释放认领并清理中间结果"""
+        now = datetime.now().isoformat()
+        with self._write():
+            self._conn.execute(
+                "INSERT INTO items (platform, video_id, title, processed_at, status, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (platform, video_id) DO UPDATE SET title = excluded.title, "
+                "processed_at = excluded.processed_at, status = excluded.status, "
+                "updated_at = excluded.updated_at, failed_stage = NULL, last_error = NULL, "
+                "claimed_by = NULL, claimed_at = NULL",
+                (platform, video_id, title, now, ARCHIVED, now)
+            )
+        self.processed_ids(platform).add(video_id)
+        shutil.rmtree(self.item_dir(platform, video_id), ignore_errors=True)
+
+    def item_dir(self, platform: str, video_id: str) -> Path:
+        """内容的中间结果目录"""
+        return self.work_dir / platform / video_id
+
+    def save_artifact(self, platform: str, video_id: str, name: str, data: Dict[str, Any]) -> None:
+        """原子保存中间结果"""
+        atomic_write_json(self.item_dir(platform, video_id) / f"{name}.json", data)
+
+    def load_artifact(self, platform: str, video_id: str, name: str) -> Optional[Dict[str, Any]]:
+        """读取中间结果，不存在或损坏时返回None"""
+        path = self.item_dir(platform, video_id) / f"{name}.json"
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+
+    def set_last_scan(self, when: Optional[str] = None) -> None:
+        """记录最近一次扫描时间"""
+        with self._write():
+            self._set_meta('last_scan', when or datetime.now().isoformat())
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+# 单例实例
+_store = None
+
+
+def get_state_store() -> StateStore:
+    """获取状态存储实例"""
+    global _store
+    if _store is None:
+        _store = StateStore(CONFIG_DIR / "state.db", legacy_path=CONFIG_DIR / "state.yaml")
+    return _store
@@ -0,0 +1,154 @@
+"""AI响应缓存
+
+按 (模型, 接口地址, 完整提示词, temperature, max_tokens, 输出格式参数) 的哈希缓存原始回复，
+存放在 config/llm_cache/ 下，每条一个JSON文件；
+总大小超过上限时按最近使用时间淘汰。
+读写是阻塞的磁盘IO，异步代码中通过 asyncio.to_thread 调用（可能在多个线程中同时执行）。
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from ..config import CONFIG_DIR
+from ..state import atomic_write_json
+
+
+# 默认配置，可通过 configure() 覆盖
+_cache_dir = CONFIG_DIR / "llm_cache"
+_enabled = True
+_max_bytes = 200 * 1024 * 1024
+
+
+def make_key(
+    model: str,
+    base_url: str,
+    messages: List[Dict[str, str]],
+    temperature: float,
+    max_tokens: int,
+    options: Optional[Dict[str, Any]] = None
+) -> str:
+    """
+    计算缓存键
+    options: 影响输出的其他接口参数（response_format、tools 等），为空时与不传相同
+    """
+    key_fields: List[Any] = [model, base_url, messages, temperature, max_tokens]
+    if options:
+        key_fields.append(options)
+    payload = json.dumps(
+        key_fields,
+        ensure_ascii=False,
+        sort_keys=True
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    """AI响应磁盘缓存"""
+
+    def __init__(self, cache_dir: Path, max_bytes: int = 200 * 1024 * 1024):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._size: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.json"
+
+    def get(self, key: str, validate: Optional[Callable[[str], bool]] = None) -> Optional[str]:
+        """
+        查询缓存，命中时刷新最近使用时间
+        validate: 校验缓存的回复，不通过时按未命中处理
+        """
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                content = json.load(f)['content']
+        except (OSError, ValueError, KeyError):
+            content = None
+        if content is None or (validate is not None and not validate(content)):
+            with self._lock:
+                self.misses += 1
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        with self._lock:
+            self.hits += 1
+        return content
+
+    def put(self, key: str, content: str, meta: Optional[Dict[str, Any]] = None) -> None:
+        """写入缓存"""
+        path = self._path(key)
+        record = dict(meta or {}, content=content, created_at=time.time())
+        atomic_write_json(path, record)
+        with self._lock:
+            if self._size is None:
+                self._size = self._scan_size()
+            else:
+                self._size += path.stat().st_size
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _files(self) -> List[Path]:
+        return list(self.cache_dir.glob('*/*.json'))
+
+    def _scan_size(self) -> int:
+        return sum(path.stat().st_size for path in self._files())
+
+    def _evict(self) -> None:
+        """按最近使用时间淘汰，直到总大小降到上限的90%（持有锁时调用）"""
+        entries = []
+        for path in self._files():
+            stat = path.stat()
+            entries.append((stat.st_mtime, stat.st_size, path))
+        entries.sort()
+
+        total = sum(size for _, size, _ in entries)
+        target = self.max_bytes * 0.9
+        for _, size, path in entries:
+            if total <= target:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+        self._size = total
+
+    def stats(self) -> str:
+        total = self.hits + self.misses
+        rate = self.hits / total * 100 if total else 0.0
+        return f"命中 {self.hits} 次，未命中 {self.misses} 次（命中率 {rate:.0f}%）"
+
+
+def configure(
+    cache_dir: Optional[Path] = None,
+    enabled: Optional[bool] = None,
+    max_bytes: Optional[int] = None
+) -> None:
+    """设置缓存参数（需在首次使用前调用）"""
+    global _cache_dir, _enabled, _max_bytes
+    if cache_dir is not None:
+        _cache_dir = Path(cache_dir)
+    if enabled is not None:
+        _enabled = enabled
+    if max_bytes is not None:
+        _max_bytes = max_bytes
+
+
+# 单例实例
+_cache = None
+
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """获取AI响应缓存实例，禁用时返回None"""
+    global _cache
+    if not _enabled:
+        return None
+    if _cache is None:
+        _cache = ResponseCache(_cache_dir, _max_bytes)
+    return _cache
@@ -0,0 +1,302 @@
+"""AI调用客户端
+
+在 AsyncOpenAI 之上统一处理：
+- 并发上限（信号量）
+- 每分钟请求数 / 每分钟token数限流（令牌桶；token按请求预留一次，重试不重复预留，按实际用量修正）
+- 429、超时、连接错误和5xx的指数退避重试（带随机抖动，遵守 Retry-After）
+- 记录每次调用的token用量和延迟
+"""
+import asyncio
+import random
+import re
+import time
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from typing import Any, Callable, Dict, List, Optional
+
+try:
+    import openai
+    from openai import AsyncOpenAI
+except ImportError:
+    print("Warning: openai not installed. Run: pip install openai")
+    openai = None
+    AsyncOpenAI = None
+
+from ..ratelimit import TokenBucket
+
+
+# 退避参数(秒)
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 60.0
+
+# 中日韩文字和全角标点，按每字1个token估算
+CJK_PATTERN = re.compile(r'[\u3000-\u303f\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uff00-\uffef]')
+
+
+def estimate_tokens(text: str) -> int:
+    """估算token数：中日韩文字每字1个，其他字符每4个约1个"""
+    other = len(CJK_PATTERN.sub('', text))
+    cjk = len(text) - other
+    return cjk + (other + 3) // 4
+
+
+@dataclass
+class Completion:
+    """单次调用结果"""
+    content: str
+    prompt_tokens: int
+    completion_tokens: int
+    latency: float                 # 成功那次请求的耗时(秒)
+    retries: int = 0
+    ttft: Optional[float] = None   # 流式调用的首token耗时(秒)
+
+    @property
+    def tokens_per_second(self) -> Optional[float]:
+        """流式调用的输出速度（首token之后）"""
+        if self.ttft is None or self.latency <= self.ttft:
+            return None
+        return self.completion_tokens / (self.latency - self.ttft)
+
+
+@dataclass
+class UsageStats:
+    """累计调用统计"""
+    calls: int = 0
+    failures: int = 0
+    retries: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    latency: float = 0.0      # 成功请求的累计耗时(秒)
+    rate_wait: float = 0.0    # 累计限流等待(秒)
+
+    def summary(self) -> str:
+        average = self.latency / self.calls if self.calls else 0.0
+        return (f"{self.calls} 次（失败 {self.failures}，重试 {self.retries}），"
+                f"tokens 输入 {self.prompt_tokens} / 输出 {self.completion_tokens}，"
+                f"平均延迟 {average:.1f}s，限流等待 {self.rate_wait:.1f}s")
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    """从错误响应头读取服务端要求的等待时间(秒)"""
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None)
+    if not headers:
+        return None
+
+    value = headers.get('retry-after-ms')
+    if value:
+        try:
+            return float(value) / 1000
+        except ValueError:
+            pass
+
+    value = headers.get('retry-after')
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _is_retryable(error: Exception) -> bool:
+    """限流、超时、连接错误和服务端错误可以重试，其他错误（参数、鉴权等）直接失败"""
+    if openai is None:
+        return False
+    if isinstance(error, (openai.RateLimitError, openai.APITimeoutError, openai.APIConnectionError)):
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code in (408, 409) or error.status_code >= 500
+    return False
+
+
+class LLMClient:
+    """带限流、重试和并发控制的AI调用客户端"""
+
+    def __init__(self, ai_config):
+        self.provider = ai_config.provider
+        self.model = ai_config.model
+        self.max_retries = ai_config.max_retries
+        self.stats = UsageStats()
+
+        if AsyncOpenAI:
+            # 重试由本类统一处理
+            self.client = AsyncOpenAI(
+                api_key=ai_config.api_key,
+                base_url=ai_config.base_url,
+                timeout=ai_config.timeout,
+                max_retries=0
+            )
+        else:
+            self.client = None
+
+        self._semaphore = asyncio.Semaphore(max(1, ai_config.max_concurrency))
+        self._rpm = TokenBucket(ai_config.rpm / 60, ai_config.rpm) if ai_config.rpm > 0 else None
+        self._tpm = TokenBucket(ai_config.tpm / 60, ai_config.tpm) if ai_config.tpm > 0 else None
+
+    async def _wait_for_budget(self, tokens: int) -> None:
+        """每次请求取一个RPM令牌；tokens大于0时同时预留TPM令牌"""
+        waited = 0.0
+        if self._rpm is not None:
+            waited += await self._rpm.acquire()
+        if self._tpm is not None and tokens > 0:
+            waited += await self._tpm.acquire(tokens)
+        self.stats.rate_wait += waited
+
+    @staticmethod
+    def _backoff(attempt: int, error: Exception) -> float:
+        """指数退避加随机抖动；服务端给出 Retry-After 时不少于该值"""
+        delay = min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt))
+        delay = delay / 2 + random.uniform(0, delay / 2)
+        retry_after = _retry_after(error)
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, BACKOFF_MAX * 5))
+        return delay
+
+    async def _request(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float,
+        max_tokens: int,
+        on_delta: Optional[Callable[[str], None]],
+        started: float,
+        kwargs: Dict[str, Any]
+    ) -> tuple:
+        """发送一次请求，返回 (内容, usage, 首token耗时)"""
+        if on_delta is None:
+            response = await self.client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                **kwargs
+            )
+            message = response.choices[0].message
+            content = message.content or ''
+            if getattr(message, 'tool_calls', None):
+                # 函数调用模式，返回函数参数（JSON字符串）
+                content = message.tool_calls[0].function.arguments or ''
+            return content, getattr(response, 'usage', None), None
+
+        if self.provider == 'openai':
+            # 让最后一个数据块带上用量；部分兼容接口不认识这个参数
+            kwargs = dict(kwargs, stream_options={'include_usage': True})
+        stream = await self.client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            stream=True,
+            **kwargs
+        )
+        parts: List[str] = []
+        usage = None
+        ttft = None
+        async for chunk in stream:
+            if getattr(chunk, 'usage', None):
+                usage = chunk.usage
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if not delta:
+                continue
+            if ttft is None:
+                ttft = time.monotonic() - started
+            parts.append(delta)
+            on_delta(delta)
+        return ''.join(parts), usage, ttft
+
+    async def complete(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float = 0.7,
+        max_tokens: int = 4000,
+        on_delta: Optional[Callable[[str], None]] = None,
+        **kwargs: Any
+    ) -> Completion:
+        """
+        调用对话补全，可重试的错误自动退避重试
+        on_delta: 传入时使用流式调用，每收到一段文本回调一次；
+                  已经输出过内容后出错不再重试，避免调用方收到重复内容
+        """
+        if not self.client:
+            raise RuntimeError("OpenAI client not initialized")
+
+        # 按提示词长度加最大输出预估token，只在第一次请求前预留，拿到实际用量后修正
+        # （429 / 5xx 的失败请求不计用量，重试不再重复预留）
+        estimated = sum(estimate_tokens(m.get('content') or '') for m in messages) + max_tokens
+
+        emitted = False
+
+        def track(delta: str) -> None:
+            nonlocal emitted
+            emitted = True
+            on_delta(delta)
+
+        async with self._semaphore:
+            attempt = 0
+            while True:
+                await self._wait_for_budget(estimated if attempt == 0 else 0)
+                started = time.monotonic()
+                try:
+                    content, usage, ttft = await self._request(
+                        messages, temperature, max_tokens,
+                        track if on_delta is not None else None, started, kwargs
+                    )
+                except Exception as e:
+                    if emitted or not _is_retryable(e) or attempt >= self.max_retries:
+                        self.stats.failures += 1
+                        if self._tpm is not None:
+                            self._tpm.refund(estimated)
+                        raise
+                    delay = self._backoff(attempt, e)
+                    attempt += 1
+                    self.stats.retries += 1
+                    print(f"   [!] AI调用失败（{type(e).__name__}），{delay:.1f}s 后第 {attempt} 次重试")
+                    await asyncio.sleep(delay)
+                    continue
+                break
+
+        latency = time.monotonic() - started
+        prompt_tokens = getattr(usage, 'prompt_tokens', None) or (estimated - max_tokens)
+        completion_tokens = getattr(usage, 'completion_tokens', None) or estimate_tokens(content)
+
+        if self._tpm is not None:
+            self._tpm.refund(estimated - prompt_tokens - completion_tokens)
+
+        self.stats.calls += 1
+        self.stats.latency += latency
+        self.stats.prompt_tokens += prompt_tokens
+        self.stats.completion_tokens += completion_tokens
+        return Completion(
+            content=content,
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            latency=latency,
+            retries=attempt,
+            ttft=ttft
+        )
+
+
+# 单例实例
+_client = None
+
+
+def get_llm_client(ai_config=None) -> LLMClient:
+    """获取AI调用客户端实例"""
+    global _client
+    if _client is None:
+        if ai_config is None:
+            from ..config import load_config
+            ai_config = load_config().ai
+        _client = LLMClient(ai_config)
+    return _client
+
+
+def get_usage_stats() -> Optional[UsageStats]:
+    """获取累计调用统计，尚未创建客户端时返回None"""
+    return _client.stats if _client is not None else None
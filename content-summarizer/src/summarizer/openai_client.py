@@ -1,19 +1,22 @@
-"""AI改写模块"""
+"""AI改写模块
+
+长转录使用分段摘要（map-reduce）：按行切分成若干段，并发整理每段笔记，
+再把笔记合并后按改写提示词生成最终摘要。
+AI调用（限流、重试、用量统计）由 client.LLMClient 统一处理。
+"""
+import asyncio
 import os
 import json
 import re
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Callable
 from dataclasses import dataclass
 from pathlib import Path
 
-try:
-    import openai
-    from openai import AsyncOpenAI
-except ImportError:
-    print("Warning: openai not installed. Run: pip install openai")
-    AsyncOpenAI = None
-
 from ..config import load_config, load_prompt_template
+from .cache import get_response_cache, make_key
+from .client import estimate_tokens, get_llm_client
+from .schema import REPAIR_PROMPT, STRUCTURED_INSTRUCTION, SUMMARY_TOOL, parse_structured
+from .stream import StreamProgress
 
 
 # 摘要长度映射
@@ -23,6 +26,78 @@ LENGTH_MAP = {
     'long': 2500,
 }
 
+# 分段整理时每段笔记的字数
+MAP_NOTE_WORDS = 800
+# 笔记合并后仍超过阈值时再整理一轮，最多整理的轮数
+MAX_MAP_ROUNDS = 3
+
+SENTENCE_END_PATTERN = re.compile(r'(?<=[。！？!?.；;])')
+
+
+def _split_long_line(line: str, max_tokens: int) -> List[str]:
+    """超长的一行先按句子切分，单句仍超长时按长度硬切"""
+    pieces = []
+    for sentence in SENTENCE_END_PATTERN.split(line):
+        if not sentence:
+            continue
+        tokens = estimate_tokens(sentence)
+        if tokens <= max_tokens:
+            pieces.append(sentence)
+            continue
+        step = max(1, len(sentence) * max_tokens // tokens)
+        pieces.extend(sentence[i:i + step] for i in range(0, len(sentence), step))
+
+    # 合并相邻的短句
+    merged, current, current_tokens = [], '', 0
+    for piece in pieces:
+        tokens = estimate_tokens(piece)
+        if current and current_tokens + tokens > max_tokens:
+            merged.append(current)
+            current, current_tokens = '', 0
+        current += piece
+        current_tokens += tokens
+    if current:
+        merged.append(current)
+    return merged
+
+
+def split_transcript(transcript: str, chunk_tokens: int) -> List[str]:
+    """
+    按行（字幕块/段落）切分转录，每段不超过 chunk_tokens
+    接近上限时优先在空行（段落边界）处切开
+    """
+    chunks: List[str] = []
+    current: List[str] = []
+    current_tokens = 0
+
+    def flush() -> None:
+        nonlocal current, current_tokens
+        text = '\n'.join(current).strip()
+        if text:
+            chunks.append(text)
+        current, current_tokens = [], 0
+
+    for line in transcript.split('\n'):
+        if not line.strip():
+            if current_tokens >= chunk_tokens * 0.8:
+                flush()
+            else:
+                current.append(line)
+            continue
+        for piece in _split_long_line(line, chunk_tokens):
+            tokens = estimate_tokens(piece)
+            if current and current_tokens + tokens > chunk_tokens:
+                flush()
+            current.append(piece)
+            current_tokens += tokens
+    flush()
+    return chunks
+
+
+def _is_valid_structured(content: str) -> bool:
+    """结构化输出是否通过校验（只缓存通过校验的回复）"""
+    return parse_structured(content)[0] is not None
+
 
 @dataclass
 class SummaryResult:
@@ -35,6 +110,18 @@ class SummaryResult:
     summary: str            # 摘要正文
 
 
+@dataclass
+class ParseStats:
+    """摘要解析统计"""
+    parsed: int = 0      # 解析次数
+    failures: int = 0    # 首次解析失败（结构化输出校验不通过，或文本输出未识别出结构）
+    repaired: int = 0    # 修复调用后通过校验
+
+    def summary(self) -> str:
+        rate = self.failures / self.parsed * 100 if self.parsed else 0.0
+        return f"{self.parsed} 次，失败 {self.failures} 次（失败率 {rate:.0f}%），修复成功 {self.repaired} 次"
+
+
 class Summarizer:
     """AI摘要生成器"""
 
@@ -46,17 +133,13 @@ class Summarizer:
         self.ai_config = config.ai
         self.summary_config = config.summary
 
-        # 初始化OpenAI客户端
-        if AsyncOpenAI:
-            self.client = AsyncOpenAI(
-                api_key=self.ai_config.api_key,
-                base_url=self.ai_config.base_url
-            )
-        else:
-            self.client = None
+        # AI调用客户端（限流、重试、并发控制）
+        self.client = get_llm_client(self.ai_config)
+        self.parse_stats = ParseStats()
 
         # 加载提示词模板
         self.prompt_template = load_prompt_template()
+        self.map_prompt_template = load_prompt_template("map-prompt.md")
 
     def _get_length_words(self) -> int:
         """获取目标摘要字数"""
@@ -73,29 +156,154 @@ class Summarizer:
         prompt = prompt.replace('{transcript}', transcript)
         return prompt
 
-    async def summarize(self, transcript: str) -> SummaryResult:
-        """生成摘要"""
-        if not self.client:
-            raise RuntimeError("OpenAI client not initialized")
+    def _build_map_prompt(self, chunk: str, index: int, total: int) -> str:
+        """构建分段整理提示词"""
+        prompt = self.map_prompt_template
+        prompt = prompt.replace('{index}', str(index))
+        prompt = prompt.replace('{total}', str(total))
+        prompt = prompt.replace('{length}', str(MAP_NOTE_WORDS))
+        prompt = prompt.replace('{transcript}', chunk)
+        return prompt
 
-        prompt = self._build_prompt(transcript)
+    async def _complete(
+        self,
+        prompt: str,
+        max_tokens: int = 4000,
+        progress: Optional[StreamProgress] = None,
+        validate: Optional[Callable[[str], bool]] = None,
+        **kwargs: Any
+    ) -> str:
+        """
+        调用一次对话补全，返回文本（相同请求优先读取缓存）
+        progress: 传入时使用流式调用，边接收边解析
+        validate: 校验回复，不通过的回复不写入缓存，缓存中不通过的回复也不使用
+        kwargs: 透传给接口的参数（response_format、tools 等）
+        """
+        messages = [
+            {"role": "system", "content": "你是一个专业的内容分析师，擅长将长篇内容改写成结构化的中文摘要。"},
+            {"role": "user", "content": prompt}
+        ]
+        temperature = 0.7
+
+        cache = get_response_cache()
+        key = None
+        if cache is not None:
+            key = make_key(self.ai_config.model, self.ai_config.base_url, messages, temperature, max_tokens, kwargs)
+            cached = await asyncio.to_thread(cache.get, key, validate)
+            if cached is not None:
+                return cached
 
         try:
-            response = await self.client.chat.completions.create(
-                model=self.ai_config.model,
-                messages=[
-                    {"role": "system", "content": "你是一个专业的内容分析师，擅长将长篇内容改写成结构化的中文摘要。"},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.7,
-                max_tokens=4000
+            completion = await self.client.complete(
+                messages,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                on_delta=progress.feed if progress is not None else None,
+                **kwargs
             )
-
-            content = response.choices[0].message.content
-            return self._parse_response(content)
-
         except Exception as e:
             raise RuntimeError(f"AI调用失败: {e}")
+        content = completion.content
+        if progress is not None:
+            progress.finish(completion)
+
+        if cache is not None and content and (validate is None or validate(content)):
+            await asyncio.to_thread(cache.put, key, content, {'model': self.ai_config.model})
+        return content
+
+    async def _map_notes(self, text: str) -> str:
+        """分段并发整理笔记，按原顺序合并"""
+        chunks = split_transcript(text, self.summary_config.chunk_tokens)
+        semaphore = asyncio.Semaphore(max(1, self.summary_config.map_concurrency))
+
+        async def map_chunk(index: int, chunk: str) -> str:
+            async with semaphore:
+                return await self._complete(self._build_map_prompt(chunk, index, len(chunks)), max_tokens=2000)
+
+        notes = await asyncio.gather(*[map_chunk(i, chunk) for i, chunk in enumerate(chunks, 1)])
+        return '\n\n'.join(
+            f"### 第 {i}/{len(chunks)} 部分\n{note.strip()}" for i, note in enumerate(notes, 1)
+        )
+
+    async def summarize(self, transcript: str, progress: Optional[StreamProgress] = None) -> SummaryResult:
+        """
+        生成摘要，长转录自动使用分段摘要
+        progress: 传入时最终摘要使用流式调用并增量解析（分段整理仍为普通调用）；
+                  结构化输出模式下不使用
+        """
+        if not self.client.client:
+            raise RuntimeError("OpenAI client not initialized")
+
+        threshold = self.summary_config.chunked_threshold
+        text = transcript
+        for _ in range(MAX_MAP_ROUNDS):
+            tokens = estimate_tokens(text)
+            if not threshold or tokens <= threshold:
+                break
+            print(f"[*] 内容约 {tokens} tokens，分段整理后合并摘要"
+                  f"（每段约 {self.summary_config.chunk_tokens} tokens）")
+            text = await self._map_notes(text)
+
+        format_kwargs = self._format_kwargs()
+        if format_kwargs is not None:
+            content = await self._complete(
+                self._build_prompt(text) + STRUCTURED_INSTRUCTION, validate=_is_valid_structured, **format_kwargs
+            )
+            return await self._parse_structured(content, format_kwargs)
+
+        content = await self._complete(self._build_prompt(text), progress=progress)
+        if progress is not None and progress.parsed:
+            result = progress.parser.result()
+        else:
+            result = self._parse_response(content)
+        self.parse_stats.parsed += 1
+        if not result.title:
+            # 没有识别出结构，整段原文作为摘要正文
+            self.parse_stats.failures += 1
+        return result
+
+    def _format_kwargs(self) -> Optional[Dict[str, Any]]:
+        """结构化输出的接口参数，text 模式返回None"""
+        mode = self.ai_config.response_format
+        if mode == 'json_object':
+            return {'response_format': {'type': 'json_object'}}
+        if mode == 'tool':
+            return {
+                'tools': [SUMMARY_TOOL],
+                'tool_choice': {'type': 'function', 'function': {'name': SUMMARY_TOOL['function']['name']}}
+            }
+        return None
+
+    async def _parse_structured(self, content: str, format_kwargs: Dict[str, Any]) -> SummaryResult:
+        """校验结构化输出，不通过时调用一次修复（只发送原输出和错误，不重发转录）"""
+        self.parse_stats.parsed += 1
+        data, errors = parse_structured(content)
+        if data is not None:
+            return self._to_result(data)
+
+        self.parse_stats.failures += 1
+        print(f"   [!] 结构化输出校验失败（{errors[0]}），尝试修复")
+        repair_prompt = REPAIR_PROMPT.format(
+            errors='\n'.join(f"- {error}" for error in errors[:10]),
+            content=content
+        )
+        content = await self._complete(repair_prompt, validate=_is_valid_structured, **format_kwargs)
+        data, errors = parse_structured(content)
+        if data is None:
+            raise RuntimeError(f"结构化输出校验失败: {'; '.join(errors[:3])}")
+        self.parse_stats.repaired += 1
+        return self._to_result(data)
+
+    @staticmethod
+    def _to_result(data: Dict[str, Any]) -> SummaryResult:
+        return SummaryResult(
+            title=data['title'].strip(),
+            core_points=data['core_points'],
+            insights=data['insights'],
+            quotes=data['quotes'],
+            guests=data['guests'],
+            summary=data['summary']
+        )
 
     def _parse_response(self, content: str) -> SummaryResult:
         """解析AI响应"""
@@ -165,6 +373,11 @@ class Summarizer:
 _summarizer = None
 
 
+def get_parse_stats() -> Optional[ParseStats]:
+    """获取摘要解析统计，尚未创建摘要生成器时返回None"""
+    return _summarizer.parse_stats if _summarizer is not None else None
+
+
 def get_summarizer(config=None) -> Summarizer:
     """获取摘要生成器实例"""
     global _summarizer
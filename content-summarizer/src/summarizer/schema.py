@@ -0,0 +1,127 @@
+"""摘要结构化输出
+
+定义摘要的JSON结构（JSON Schema 子集），用于 JSON 模式和函数调用，
+并提供一个轻量的校验器（只支持这里用到的关键字）。
+"""
+import json
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+
+STRING_LIST = {'type': 'array', 'items': {'type': 'string', 'minLength': 1}}
+
+SUMMARY_SCHEMA: Dict[str, Any] = {
+    'type': 'object',
+    'required': ['title', 'core_points', 'insights', 'quotes', 'guests', 'summary'],
+    'properties': {
+        'title': {'type': 'string', 'minLength': 1, 'description': '中文标题，20字以内'},
+        'core_points': dict(STRING_LIST, minItems=1, description='核心观点，3-5条'),
+        'insights': dict(STRING_LIST, description='关键洞察，2-4条'),
+        'quotes': dict(STRING_LIST, description='金句，3-5条，不带引号'),
+        'guests': {
+            'type': 'array',
+            'description': '嘉宾信息，没有嘉宾时为空数组',
+            'items': {
+                'type': 'object',
+                'required': ['name'],
+                'properties': {
+                    'name': {'type': 'string', 'minLength': 1, 'description': '姓名'},
+                    'role': {'type': 'string', 'description': '身份/头衔'},
+                    'views': {'type': 'string', 'description': '主要观点/贡献'},
+                },
+            },
+        },
+        'summary': {'type': 'string', 'minLength': 1, 'description': '摘要正文（Markdown）'},
+    },
+}
+
+# 函数调用模式下提交摘要的函数
+SUMMARY_TOOL = {
+    'type': 'function',
+    'function': {
+        'name': 'submit_summary',
+        'description': '提交结构化的中文摘要',
+        'parameters': SUMMARY_SCHEMA,
+    },
+}
+
+STRUCTURED_INSTRUCTION = """
+---
+
+## 输出格式（必须遵守）
+只输出一个JSON对象，不要输出其他文字，字段如下：
+- title: 字符串，中文标题
+- core_points: 字符串数组，核心观点
+- insights: 字符串数组，关键洞察
+- quotes: 字符串数组，金句（不带引号）
+- guests: 对象数组，每项包含 name（姓名）、role（身份/头衔）、views（主要观点/贡献），没有嘉宾时为 []
+- summary: 字符串，摘要正文（可以使用Markdown）
+"""
+
+REPAIR_PROMPT = """下面的JSON不符合要求，问题如下：
+{errors}
+
+请修正后只输出JSON对象，不要输出其他文字。要求的字段：
+title(字符串)、core_points(字符串数组)、insights(字符串数组)、quotes(字符串数组)、
+guests(对象数组，每项含 name、role、views)、summary(字符串)
+
+原始输出：
+{content}
+"""
+
+JSON_FENCE_PATTERN = re.compile(r'```(?:json)?\s*([\s\S]*?)\s*```')
+
+TYPE_CHECKS = {
+    'object': lambda value: isinstance(value, dict),
+    'array': lambda value: isinstance(value, list),
+    'string': lambda value: isinstance(value, str),
+    'integer': lambda value: isinstance(value, int) and not isinstance(value, bool),
+    'number': lambda value: isinstance(value, (int, float)) and not isinstance(value, bool),
+    'boolean': lambda value: isinstance(value, bool),
+}
+
+
+def validate(value: Any, schema: Dict[str, Any], path: str = '$') -> List[str]:
+    """按 schema 校验，返回错误列表（为空表示通过）"""
+    expected = schema.get('type')
+    if expected and not TYPE_CHECKS[expected](value):
+        return [f"{path}: 应为 {expected}，实际为 {type(value).__name__}"]
+
+    errors: List[str] = []
+    if expected == 'object':
+        for key in schema.get('required', ()):
+            if key not in value:
+                errors.append(f"{path}.{key}: 缺少字段")
+        for key, sub_schema in schema.get('properties', {}).items():
+            if key in value:
+                errors.extend(validate(value[key], sub_schema, f"{path}.{key}"))
+    elif expected == 'array':
+        if len(value) < schema.get('minItems', 0):
+            errors.append(f"{path}: 至少需要 {schema['minItems']} 项")
+        item_schema = schema.get('items')
+        if item_schema:
+            for i, item in enumerate(value):
+                errors.extend(validate(item, item_schema, f"{path}[{i}]"))
+    elif expected == 'string':
+        if len(value.strip()) < schema.get('minLength', 0):
+            errors.append(f"{path}: 不能为空")
+    return errors
+
+
+def parse_structured(content: str) -> Tuple[Optional[Dict[str, Any]], List[str]]:
+    """
+    解析并校验结构化输出
+    返回 (数据, 错误列表)，解析失败时数据为None
+    """
+    text = content.strip()
+    if text.startswith('```'):
+        # 部分模型在JSON模式下仍会加代码块
+        match = JSON_FENCE_PATTERN.search(text)
+        if match:
+            text = match.group(1)
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError as e:
+        return None, [f"不是合法的JSON: {e}"]
+    errors = validate(data, SUMMARY_SCHEMA)
+    return (data if not errors else None), errors
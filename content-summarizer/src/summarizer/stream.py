@@ -0,0 +1,176 @@
+"""流式摘要解析
+
+流式调用时按行增量解析AI输出：根据小节标题（核心观点、金句等）把每行
+归入对应字段，随时可以取出当前的部分结果，用于边生成边写 summary.md。
+"""
+import re
+import time
+from typing import Callable, Dict, List, Optional
+
+from .client import Completion
+
+
+# 两次写出部分结果的最小间隔(秒)
+PARTIAL_INTERVAL = 1.0
+
+# 小节标题关键词 -> 字段，按顺序匹配
+SECTION_KEYWORDS = [
+    ('核心观点', 'core_points'),
+    ('洞察', 'insights'),
+    ('金句', 'quotes'),
+    ('嘉宾', 'guests'),
+    ('正文', 'summary'),
+    ('标题', 'title'),
+]
+LIST_FIELDS = ('core_points', 'insights', 'quotes', 'guests')
+
+LIST_MARKER_PATTERN = re.compile(r'^(?:[-*•]|\d+[.、)）])\s*')
+QUOTE_CHARS = '"“”「」『』'
+
+
+def _section_of(heading: str) -> Optional[str]:
+    for keyword, name in SECTION_KEYWORDS:
+        if keyword in heading:
+            return name
+    return None
+
+
+class SectionParser:
+    """按行增量解析AI输出的各个小节"""
+
+    def __init__(self):
+        self.fields: Dict[str, List[str]] = {name: [] for name in LIST_FIELDS}
+        self.title = ''
+        self.fenced = False   # 输出为 ```json 代码块，留给完整解析处理
+        self._section: Optional[str] = None
+        self._buffer = ''
+        self._lines: List[str] = []
+        self._received: List[str] = []
+
+    @property
+    def content(self) -> str:
+        """目前收到的全部内容"""
+        return ''.join(self._received)
+
+    def feed(self, delta: str) -> bool:
+        """输入一段文本，有完整的新行被解析时返回True"""
+        self._received.append(delta)
+        self._buffer += delta
+        if '\n' not in self._buffer:
+            return False
+        *lines, self._buffer = self._buffer.split('\n')
+        for line in lines:
+            self._parse_line(line)
+        return True
+
+    def close(self) -> None:
+        """处理最后一行"""
+        if self._buffer:
+            self._parse_line(self._buffer)
+            self._buffer = ''
+
+    def _parse_line(self, line: str) -> None:
+        self._lines.append(line)
+        stripped = line.strip()
+
+        if stripped.startswith('```json') and not any(self._lines[:-1]):
+            self.fenced = True
+        if self.fenced:
+            return
+
+        # 小节标题：Markdown 标题，或单独一行、含小节关键词的加粗文字
+        heading = None
+        if stripped.startswith('#'):
+            heading = stripped.lstrip('#').strip()
+        elif len(stripped) > 4 and stripped.startswith('**') and stripped.endswith('**'):
+            if _section_of(stripped) is not None:
+                heading = stripped[2:-2].strip()
+        if heading is not None:
+            section = _section_of(heading)
+            if section is None and stripped.startswith('# ') and not self.title:
+                # 一级标题作为摘要标题
+                self.title = heading.strip('*').strip()
+            elif section == 'title' and not self.title:
+                # 标题写在同一行，如 "### 1. 标题：xxx"
+                rest = re.split(r'标题\**\s*[:：]', heading, maxsplit=1)
+                if len(rest) == 2:
+                    self.title = rest[1].strip('*' + QUOTE_CHARS + '《》 ')
+            self._section = section
+            return
+
+        if self._section == 'summary':
+            # 正文不单独提取，与完整解析一致，摘要正文为全部内容
+            return
+        if not stripped or stripped == '---':
+            return
+        if self._section == 'title':
+            if not self.title:
+                self.title = stripped.strip('*#' + QUOTE_CHARS + '《》 ')
+            return
+        if self._section in LIST_FIELDS:
+            if not LIST_MARKER_PATTERN.match(stripped) and stripped[0] not in QUOTE_CHARS:
+                return
+            item = LIST_MARKER_PATTERN.sub('', stripped).replace('**', '').strip()
+            if self._section == 'quotes':
+                item = item.strip(QUOTE_CHARS + ' ')
+            if item:
+                self.fields[self._section].append(item)
+
+    def result(self):
+        """
+        当前的解析结果（SummaryResult）
+        与 Summarizer._parse_response 一致：摘要正文为全部内容，未识别出标题时标题为空
+        """
+        from .openai_client import SummaryResult
+        return SummaryResult(
+            title=self.title,
+            core_points=list(self.fields['core_points']),
+            insights=list(self.fields['insights']),
+            quotes=list(self.fields['quotes']),
+            guests=list(self.fields['guests']),
+            summary=self.content
+        )
+
+
+class StreamProgress:
+    """
+    流式摘要的进度：增量解析输出，按间隔回调部分结果，记录首token耗时和输出速度
+    on_partial: 收到部分结果时的回调，参数为 SummaryResult
+    """
+
+    def __init__(self, on_partial: Optional[Callable] = None, interval: float = PARTIAL_INTERVAL):
+        self.parser = SectionParser()
+        self.on_partial = on_partial
+        self.interval = interval
+        self.completion: Optional[Completion] = None
+        self._last_emit = 0.0
+
+    def feed(self, delta: str) -> None:
+        if not self.parser.feed(delta) or self.on_partial is None:
+            return
+        now = time.monotonic()
+        if now - self._last_emit >= self.interval:
+            self._last_emit = now
+            self.on_partial(self.parser.result())
+
+    def finish(self, completion: Completion) -> None:
+        """流式调用结束，写出最终的部分结果"""
+        self.completion = completion
+        self.parser.close()
+        if self.on_partial is not None:
+            self.on_partial(self.parser.result())
+
+    @property
+    def parsed(self) -> bool:
+        """是否收到了可增量解析的内容（缓存命中或JSON输出时为False）"""
+        return self.completion is not None and not self.parser.fenced
+
+    def stats(self) -> Optional[str]:
+        """首token耗时和输出速度"""
+        if self.completion is None or self.completion.ttft is None:
+            return None
+        speed = self.completion.tokens_per_second
+        text = f"首token {self.completion.ttft:.1f}s"
+        if speed is not None:
+            text += f"，{speed:.1f} tokens/s"
+        return text + f"，共 {self.completion.latency:.1f}s"
@@ -0,0 +1,58 @@
+"""测试公共配置
+
+在 content-summarizer 目录下运行: python -m pytest -q
+带 benchmark 标记的性能测试默认跳过，加 --benchmark 运行（加 -s 查看结果）
+"""
+import http.server
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+def pytest_addoption(parser):
+    parser.addoption('--benchmark', action='store_true', default=False, help='运行性能测试')
+
+
+def pytest_configure(config):
+    config.addinivalue_line('markers', 'benchmark: 性能测试，默认跳过，--benchmark 时运行')
+
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption('--benchmark'):
+        return
+    skip = pytest.mark.skip(reason='性能测试，使用 --benchmark 运行')
+    for item in items:
+        if 'benchmark' in item.keywords:
+            item.add_marker(skip)
+
+
+class LocalServer:
+    """在后台线程运行的本地HTTP服务"""
+
+    def __init__(self, handler_class):
+        self.httpd = http.server.ThreadingHTTPServer(('127.0.0.1', 0), handler_class)
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self) -> 'LocalServer':
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@pytest.fixture
+def local_server():
+    """启动本地HTTP服务: with local_server(Handler) as server: server.url"""
+    return LocalServer
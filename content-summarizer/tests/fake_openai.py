@@ -0,0 +1,119 @@
+"""本地的 OpenAI 兼容接口，用于测试AI调用
+
+responder(请求JSON) 返回 (状态码, 响应, 响应头)：
+响应为 dict 时按JSON返回，为 list 时按SSE逐块发送（每块为 data: 后的JSON）
+"""
+import http.server
+import json
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .conftest import LocalServer
+
+Responder = Callable[[Dict[str, Any]], Tuple[int, Any, Dict[str, str]]]
+
+
+def chat_response(content: str = '', tool_arguments: Optional[str] = None) -> Dict[str, Any]:
+    """非流式的对话补全响应"""
+    message: Dict[str, Any] = {'role': 'assistant', 'content': content}
+    if tool_arguments is not None:
+        message = {
+            'role': 'assistant',
+            'content': None,
+            'tool_calls': [{
+                'id': 'call_1',
+                'type': 'function',
+                'function': {'name': 'write_summary', 'arguments': tool_arguments},
+            }],
+        }
+    return {
+        'id': 'chatcmpl-test',
+        'object': 'chat.completion',
+        'created': int(time.time()),
+        'model': 'test-model',
+        'choices': [{'index': 0, 'message': message, 'finish_reason': 'stop'}],
+        'usage': {'prompt_tokens': 100, 'completion_tokens': 50, 'total_tokens': 150},
+    }
+
+
+def chat_chunks(deltas: List[str]) -> List[Dict[str, Any]]:
+    """流式响应的数据块，最后一块带用量"""
+    base = {'id': 'chatcmpl-test', 'object': 'chat.completion.chunk', 'created': int(time.time()), 'model': 'test-model'}
+    chunks = [
+        dict(base, choices=[{'index': 0, 'delta': {'content': delta}, 'finish_reason': None}])
+        for delta in deltas
+    ]
+    chunks.append(dict(base, choices=[], usage={'prompt_tokens': 100, 'completion_tokens': len(deltas), 'total_tokens': 100 + len(deltas)}))
+    return chunks
+
+
+def prompt_of(request: Dict[str, Any]) -> str:
+    """请求中用户消息的内容"""
+    return request['messages'][-1]['content']
+
+
+class FakeOpenAI(LocalServer):
+    """在后台线程运行的 OpenAI 兼容接口，记录收到的请求"""
+
+    def __init__(self, responder: Responder, chunk_delay: float = 0.0):
+        self.responder = responder
+        self.chunk_delay = chunk_delay
+        self.requests: List[Dict[str, Any]] = []
+        self.active = 0        # 正在处理的请求数
+        self.max_active = 0    # 同时处理的最大请求数
+        self._lock = threading.Lock()
+        super().__init__(self._handler())
+
+    @property
+    def base_url(self) -> str:
+        return f"{self.url}/v1"
+
+    def _handler(self):
+        fake = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                request = json.loads(self.rfile.read(length) or b'{}')
+                with fake._lock:
+                    fake.requests.append(request)
+                    fake.active += 1
+                    fake.max_active = max(fake.max_active, fake.active)
+                try:
+                    status, body, headers = fake.responder(request)
+                    if isinstance(body, list):
+                        self._send_stream(body)
+                    else:
+                        self._send_json(status, body, headers)
+                finally:
+                    with fake._lock:
+                        fake.active -= 1
+
+            def _send_json(self, status, body, headers):
+                data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _send_stream(self, chunks):
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/event-stream')
+                self.send_header('Cache-Control', 'no-cache')
+                self.end_headers()
+                for chunk in chunks:
+                    self.wfile.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode('utf-8'))
+                    self.wfile.flush()
+                    if fake.chunk_delay:
+                        time.sleep(fake.chunk_delay)
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.wfile.flush()
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
@@ -0,0 +1,91 @@
+"""语音识别回退：桩引擎（无需模型）、按序拼接、进程名额只在下载期间占用"""
+import asyncio
+import sys
+import time
+from array import array
+
+import pytest
+
+from src.fetcher import asr, runner
+
+# 测试用的“解码器”：原样转发已经是PCM的音频
+PASSTHROUGH = [sys.executable, '-c', 'import shutil, sys; shutil.copyfileobj(sys.stdin.buffer, sys.stdout.buffer)']
+CAT = 'import shutil, sys; shutil.copyfileobj(open(sys.argv[1], "rb"), sys.stdout.buffer)'
+
+
+class StubEngine(asr.ASREngine):
+    """桩引擎：按片段音量输出第几段音调，可模拟识别耗时"""
+
+    name = 'stub'
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+
+    def transcribe(self, pcm: bytes) -> str:
+        time.sleep(self.delay)
+        peak = max(abs(sample) for sample in array('h', pcm))
+        return f"第{round(peak / 1000)}段" if peak else ''
+
+
+def make_pcm(tones: int) -> bytes:
+    """每段 1.2 秒音调（第 i 段幅度 i*1000）后接 0.6 秒静音"""
+    pcm = array('h')
+    for i in range(1, tones + 1):
+        pcm.extend([i * 1000, -i * 1000] * int(asr.SAMPLE_RATE * 0.6))
+        pcm.extend([0] * int(asr.SAMPLE_RATE * 0.6))
+    return pcm.tobytes()
+
+
+@pytest.fixture
+def stub_asr(monkeypatch):
+    monkeypatch.setitem(asr.ENGINES, 'stub', StubEngine)
+    monkeypatch.setattr(asr, 'DECODER_CMD', PASSTHROUGH)
+    monkeypatch.setattr(asr, '_engine', 'stub')
+    monkeypatch.setattr(asr, '_engine_options', {'delay': 0.0})
+    monkeypatch.setattr(asr, '_workers', 2)
+    monkeypatch.setattr(asr, '_chunk_seconds', 1)
+    monkeypatch.setattr(asr, '_min_silence', 0.3)
+    monkeypatch.setattr(asr, '_stream_semaphore', None)
+    monkeypatch.setattr(asr, '_pool', None)
+    yield
+    asr.shutdown()
+
+
+def test_registered_engine_transcribes_in_order(stub_asr, tmp_path):
+    audio = tmp_path / 'audio.pcm'
+    audio.write_bytes(make_pcm(5))
+    runner.configure(max_processes=2)
+
+    result = asyncio.run(asr.transcribe_stream([sys.executable, '-c', CAT, str(audio)]))
+
+    # 注册的引擎在 spawn 出的工作进程中可用，结果按原顺序拼接
+    assert result.text.splitlines() == ['第1段', '第2段', '第3段', '第4段', '第5段']
+    # 5 段音调 + 末尾剩下的半段静音
+    assert result.chunks == 6
+    assert result.audio_seconds == pytest.approx(9.0, abs=0.05)
+
+
+def test_process_slot_released_after_download(stub_asr, tmp_path, monkeypatch):
+    monkeypatch.setattr(asr, '_engine_options', {'delay': 0.5})
+    audio = tmp_path / 'audio.pcm'
+    audio.write_bytes(make_pcm(5))
+    runner.configure(max_processes=1)
+
+    async def main():
+        task = asyncio.ensure_future(asr.transcribe_stream([sys.executable, '-c', CAT, str(audio)]))
+        await asyncio.sleep(0.1)
+        # 音频下载完后识别仍在进行，名额已经让给其他 yt-dlp 调用
+        async with runner.get_semaphore():
+            assert not task.done()
+        return await task
+
+    assert asyncio.run(main()).chunks == 6
+
+
+def test_engine_must_be_importable():
+    class LocalEngine(asr.ASREngine):
+        def transcribe(self, pcm: bytes) -> str:
+            return ''
+
+    with pytest.raises(ValueError):
+        asr.register_engine('local', LocalEngine)
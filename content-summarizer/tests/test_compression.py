@@ -0,0 +1,99 @@
+"""转录压缩：压缩现有归档、字典训练只读取样本开头、新归档补训字典、压缩器复用、解压后内容不变"""
+import random
+
+import pytest
+
+from src.archiver import compression
+from src.archiver.compression import DICT_SAMPLE_BYTES, TRANSCRIPT_NAME, TranscriptCodec
+
+zstandard = pytest.importorskip('zstandard')
+
+PHRASES = ['我们今天聊一聊', '人工智能的发展', '其实这个问题', '大家可以想一下', '从投资的角度看', '这期节目就到这里']
+
+
+def make_transcript(rng: random.Random, index: int) -> str:
+    body = '\n'.join(''.join(rng.choices(PHRASES, k=8)) + f"（第{index}期第{line}段）" for line in range(4000))
+    return f"# 第{index}期\n\n## 转录内容\n{body}\n"
+
+
+@pytest.fixture
+def compressors(monkeypatch):
+    """记录创建的 zstd 压缩器数量"""
+    created = []
+    compressor_class = zstandard.ZstdCompressor
+
+    def spy(*args, **kwargs):
+        created.append(kwargs.get('dict_data'))
+        return compressor_class(*args, **kwargs)
+
+    monkeypatch.setattr(compression.zstandard, 'ZstdCompressor', spy)
+    return created
+
+
+def dict_id(path) -> int:
+    return zstandard.get_frame_parameters(path.read_bytes()).dict_id
+
+
+def test_compact_archive_trains_on_bounded_samples(tmp_path, monkeypatch, compressors):
+    rng = random.Random(0)
+    originals = {}
+    for i in range(30):
+        folder = tmp_path / f"2024-01-01_v{i}"
+        folder.mkdir()
+        originals[folder.name] = make_transcript(rng, i)
+        (folder / TRANSCRIPT_NAME).write_text(originals[folder.name], encoding='utf-8')
+
+    codec = TranscriptCodec(tmp_path, 'zstd')
+    sample_sizes = []
+    train = codec.train
+
+    def spy(samples):
+        sample_sizes.extend(len(sample) for sample in samples)
+        return train(samples)
+
+    monkeypatch.setattr(codec, 'train', spy)
+    stats = codec.compact_archive(workers=4)
+
+    # 完整转录远大于上限，训练时每个样本只读取开头
+    assert len(sample_sizes) == 30
+    assert max(sample_sizes) == DICT_SAMPLE_BYTES
+    assert len(originals['2024-01-01_v0'].encode('utf-8')) > DICT_SAMPLE_BYTES * 4
+    assert stats.converted == 30 and stats.failed == 0
+    assert stats.after < stats.before / 3
+    # 每个线程只创建一次压缩器
+    assert 1 <= len(compressors) <= 4
+    assert all(dictionary is not None for dictionary in compressors)
+
+    reader = TranscriptCodec(tmp_path, 'zstd')
+    for name, text in originals.items():
+        assert not (tmp_path / name / TRANSCRIPT_NAME).exists()
+        assert reader.read(tmp_path / name) == text
+
+
+def test_new_zstd_archive_gets_a_dictionary(tmp_path, compressors):
+    rng = random.Random(1)
+    originals = {}
+    writer = TranscriptCodec(tmp_path, 'zstd')
+    # 新归档直接以 zstd 写入，还没有字典
+    for i in range(30):
+        folder = tmp_path / f"2024-01-01_v{i}"
+        folder.mkdir()
+        originals[folder.name] = make_transcript(rng, i)[:20000]
+        (folder / writer.filename).write_bytes(writer.compress(originals[folder.name].encode('utf-8')))
+    assert len(compressors) == 1 and compressors[0] is None
+    assert dict_id(tmp_path / '2024-01-01_v0' / writer.filename) == 0
+
+    # compact 从 .zst 文件抽样训练字典，并用字典重新压缩
+    stats = writer.compact_archive(workers=2)
+    assert writer.has_dictionary
+    assert stats.converted == 30 and stats.failed == 0
+    assert stats.after < stats.before
+
+    reader = TranscriptCodec(tmp_path, 'zstd')
+    for name, text in originals.items():
+        assert dict_id(tmp_path / name / writer.filename) != 0
+        assert reader.read(tmp_path / name) == text
+
+    # 训练后缓存的压缩器失效，之后写入的转录使用字典；已有字典时不再重新压缩
+    assert zstandard.get_frame_parameters(writer.compress('新转录'.encode('utf-8'))).dict_id != 0
+    assert writer.compact_archive().converted == 0
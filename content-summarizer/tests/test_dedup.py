@@ -0,0 +1,85 @@
+"""重复内容检测：签名只在流水线线程中计算一次、随中间结果恢复、未启用时完全跳过"""
+import asyncio
+from dataclasses import asdict
+from types import SimpleNamespace
+
+import pytest
+
+from src import pipeline
+from src.archiver import catalog, dedup, writer
+from src.archiver.writer import Archiver
+from src.config import DedupConfig
+from src.fetcher.base import MediaItem
+from src.state import StateStore
+from src.summarizer.openai_client import SummaryResult
+
+TRANSCRIPT = '\n'.join(f"第{i}句，今天我们讨论近似重复检测与 MinHash 签名的计算方法。" for i in range(200))
+SUMMARY = SummaryResult(title='已有摘要', core_points=['观点'], insights=[], quotes=[], guests=[], summary='正文')
+
+
+def media(video_id: str) -> MediaItem:
+    return MediaItem(id=video_id, title=f"标题{video_id}", url=f"https://www.youtube.com/watch?v={video_id}",
+                     published_at='20240101', author='作者')
+
+
+@pytest.fixture
+def archive(tmp_path, monkeypatch):
+    monkeypatch.setattr(catalog, '_catalog', None)
+    archiver = Archiver(tmp_path / 'output', fsync='none', compression='none')
+    monkeypatch.setattr(writer, '_archiver', archiver)
+    yield archiver
+    archiver.catalog.close()
+
+
+def fingerprints(archiver: Archiver) -> int:
+    return archiver.catalog._fetch("SELECT count(*) FROM fingerprints")[0][0]
+
+
+async def run_item(video_id: str, config, state: StateStore) -> pipeline.PipelineItem:
+    item = pipeline.PipelineItem(url=media(video_id).url)
+    for _, stage in pipeline.STAGES:
+        assert await stage(item, config, state), item.error
+    return item
+
+
+def save_fetched(state: StateStore, video_id: str) -> None:
+    """模拟已抓取完成的内容（不访问网络）"""
+    state.save_artifact('youtube', video_id, 'fetched', {
+        'media': asdict(media(video_id)), 'transcript': TRANSCRIPT, 'cover_path': None, 'transcript_info': None,
+    })
+
+
+def test_signature_is_saved_and_restored(archive, tmp_path, monkeypatch):
+    archive.archive(media('original001'), TRANSCRIPT, SUMMARY, signature=dedup.signature(TRANSCRIPT))
+    state = StateStore(tmp_path / 'state.db')
+    config = SimpleNamespace(dedup=DedupConfig(enabled=True), ai=SimpleNamespace(stream=False))
+
+    save_fetched(state, 'reupload001')
+    item = pipeline.PipelineItem(url=media('reupload001').url)
+    assert asyncio.run(pipeline.fetch_stage(item, config, state))
+    assert asyncio.run(pipeline.summarize_stage(item, config, state))
+    # 与已归档内容重复，复用摘要，签名保存到中间结果
+    assert item.summary.title == '已有摘要'
+    assert state.load_artifact('youtube', 'reupload001', 'signature')['signature'] == item.signature
+
+    # 中断后重新运行：签名从中间结果恢复，不再计算
+    monkeypatch.setattr(dedup, 'signature', lambda text: pytest.fail('签名不应重新计算'))
+    state.release('youtube', 'reupload001')
+    restored = asyncio.run(run_item('reupload001', config, state))
+    assert restored.signature == item.signature
+    assert restored.duplicate_of['video_id'] == 'original001'
+    assert fingerprints(archive) == 2
+
+
+def test_disabled_dedup_skips_signature(archive, tmp_path, monkeypatch):
+    monkeypatch.setattr(dedup, 'signature', lambda text: pytest.fail('未启用重复检测时不应计算签名'))
+    state = StateStore(tmp_path / 'state.db')
+    config = SimpleNamespace(dedup=DedupConfig(enabled=False), ai=SimpleNamespace(stream=False))
+
+    save_fetched(state, 'plainvideo1')
+    state.save_artifact('youtube', 'plainvideo1', 'summary', asdict(SUMMARY))
+    item = asyncio.run(run_item('plainvideo1', config, state))
+
+    assert item.signature is None
+    assert item.output_path.exists()
+    assert fingerprints(archive) == 0
@@ -0,0 +1,105 @@
+"""进程内 yt-dlp 引擎：与子进程输出一致、超时占用名额、性能对比"""
+import asyncio
+import http.server
+import json
+import shutil
+import time
+
+import pytest
+
+from src.fetcher import inprocess, runner
+from src.fetcher.inprocess import InProcessEngine, InProcessError
+
+pytestmark = pytest.mark.skipif(not inprocess.is_available(), reason='需要 yt_dlp')
+
+ARGS = ['--no-download', '--no-playlist', '--dump-json']
+AUDIO = b'\xff\xfb\x90\x00' * 4096
+
+
+class AudioHandler(http.server.BaseHTTPRequestHandler):
+    """本地测试用的“视频站”：直链音频，由 yt-dlp 的 generic 提取器解析"""
+
+    def do_HEAD(self):
+        self.send_response(200)
+        self.send_header('Content-Type', 'audio/mpeg')
+        self.send_header('Content-Length', str(len(AUDIO)))
+        self.end_headers()
+
+    def do_GET(self):
+        self.do_HEAD()
+        self.wfile.write(AUDIO)
+
+    def log_message(self, *args):
+        pass
+
+
+def _ids(output: str):
+    return [json.loads(line)['id'] for line in output.splitlines() if line.strip()]
+
+
+def test_output_matches_subprocess(local_server):
+    if shutil.which('yt-dlp') is None:
+        pytest.skip('需要 yt-dlp 命令')
+    runner.configure(max_processes=2)
+    engine = InProcessEngine(max_workers=2)
+
+    async def main(url):
+        in_process = await engine.run('generic', ARGS + [url], timeout=60)
+        sub = await runner.run_process(['yt-dlp'] + ARGS + [url], timeout=60)
+        return in_process, sub
+
+    with local_server(AudioHandler) as server:
+        in_process, sub = asyncio.run(main(f"{server.url}/clip.mp3"))
+    assert sub.returncode == 0
+    assert _ids(in_process) == _ids(sub.stdout) == ['clip']
+
+
+def test_timeout_keeps_slot_until_thread_exits(monkeypatch):
+    runner.configure(max_processes=1)
+    engine = InProcessEngine(max_workers=2)
+    monkeypatch.setattr(engine, '_run', lambda *args: time.sleep(0.5) or [])
+
+    async def main():
+        started = time.monotonic()
+        with pytest.raises(InProcessError):
+            await engine.run('generic', ARGS + ['http://example.invalid/'], timeout=0.1)
+        assert time.monotonic() - started < 0.4
+        # 线程还在运行，名额未释放
+        assert runner.get_semaphore().locked()
+        # 下一次调用要等上一个线程结束
+        await engine.run('generic', ARGS + ['http://example.invalid/'], timeout=5)
+        return time.monotonic() - started
+
+    assert asyncio.run(main()) >= 0.5
+
+
+@pytest.mark.benchmark
+def test_benchmark_inprocess_vs_subprocess(local_server):
+    if shutil.which('yt-dlp') is None:
+        pytest.skip('需要 yt-dlp 命令')
+    probes = 20
+    runner.configure(max_processes=4)
+    engine = InProcessEngine(max_workers=4)
+
+    async def run_all(run_one):
+        started = time.monotonic()
+        await asyncio.gather(*[run_one(i) for i in range(probes)])
+        return time.monotonic() - started
+
+    with local_server(AudioHandler) as server:
+        async def via_subprocess(i):
+            result = await runner.run_process(['yt-dlp'] + ARGS + [f"{server.url}/clip{i}.mp3"], timeout=60)
+            assert result.returncode == 0
+
+        async def via_inprocess(i):
+            assert _ids(await engine.run('generic', ARGS + [f"{server.url}/clip{i}.mp3"], timeout=60))
+
+        async def main():
+            return await run_all(via_subprocess), await run_all(via_inprocess)
+
+        sub_elapsed, in_elapsed = asyncio.run(main())
+
+    print(f"\n{probes} 次探测（并发4）: subprocess {sub_elapsed:.2f}s（{sub_elapsed / probes * 1000:.0f}ms/次），"
+          f"inprocess {in_elapsed:.2f}s（{in_elapsed / probes * 1000:.0f}ms/次），"
+          f"加速 {sub_elapsed / in_elapsed:.1f}x")
+    assert in_elapsed < sub_elapsed
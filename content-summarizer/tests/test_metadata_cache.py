@@ -0,0 +1,44 @@
+"""视频信息缓存：命中时不单独写数据库，访问时间批量写回后仍按最近访问淘汰"""
+from src.fetcher import cache
+from src.fetcher.cache import MetadataCache
+
+
+def traced(store: MetadataCache):
+    """记录执行的写语句"""
+    statements = []
+    store._conn.set_trace_callback(
+        lambda sql: statements.append(sql) if sql.lstrip().split()[0].upper() in ('UPDATE', 'COMMIT') else None
+    )
+    return statements
+
+
+def test_hits_do_not_write(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache, 'ACCESS_FLUSH_INTERVAL', 3)
+    store = MetadataCache(tmp_path / 'cache.db')
+    for video_id in ('a', 'b', 'c'):
+        store.put('youtube', video_id, {'id': video_id})
+    statements = traced(store)
+
+    assert store.get('youtube', 'a') == {'id': 'a'}
+    assert store.get('youtube', 'b') == {'id': 'b'}
+    assert store.get('youtube', 'a') == {'id': 'a'}
+    assert statements == []
+
+    # 不同条目累计到上限后一次写回
+    assert store.get('youtube', 'c') == {'id': 'c'}
+    assert [sql.split()[0] for sql in statements] == ['UPDATE'] * 3 + ['COMMIT']
+
+
+def test_eviction_uses_recorded_access_times(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache, 'EVICT_INTERVAL', 1)
+    store = MetadataCache(tmp_path / 'cache.db', max_entries=2)
+    store.put('youtube', 'a', {'id': 'a'})
+    store.put('youtube', 'b', {'id': 'b'})
+    # 只在内存层命中，访问时间尚未写回
+    assert store.get('youtube', 'a') is not None
+
+    # 写入时先写回访问时间，淘汰最久未访问的 b
+    store.put('youtube', 'c', {'id': 'c'})
+    assert store.get('youtube', 'a') is not None
+    assert store.get('youtube', 'b') is None
+    assert store.get('youtube', 'c') is not None
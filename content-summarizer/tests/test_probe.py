@@ -0,0 +1,69 @@
+"""单次探测：封面转换失败时只要信息已写出就不再换参数重试"""
+import asyncio
+import os
+import shutil
+import sys
+
+import pytest
+
+from src.fetcher import runner
+from src.fetcher.runner import track_spawns
+from src.fetcher.youtube import YouTubeFetcher
+
+URL = 'https://www.youtube.com/watch?v=abcdefghijk'
+
+# 假的 yt-dlp：写出 info.json（write_info 为 False 时不写），然后像封面转换失败一样返回非0
+FAKE_YT_DLP = '''import json, pathlib, sys
+args = sys.argv[1:]
+template = args[args.index('-o') + 1]
+if {write_info}:
+    path = pathlib.Path(template.replace('%(ext)s', 'info.json'))
+    path.write_text(json.dumps({{'id': 'abcdefghijk', 'title': '标题'}}), encoding='utf-8')
+sys.stderr.write('ERROR: Postprocessing: ffprobe and ffmpeg not found\\n')
+sys.exit(1)
+'''
+
+
+@pytest.fixture
+def fake_yt_dlp(tmp_path, monkeypatch):
+    """把假的 yt-dlp 放到 PATH 最前面"""
+    runner.configure(backend='subprocess')
+    bin_dir = tmp_path / 'bin'
+    bin_dir.mkdir()
+
+    def install(write_info: bool) -> None:
+        script = bin_dir / 'yt-dlp'
+        script.write_text(f"#!{sys.executable}\n" + FAKE_YT_DLP.format(write_info=write_info), encoding='utf-8')
+        script.chmod(0o755)
+
+    monkeypatch.setenv('PATH', f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+    return install
+
+
+def test_thumbnail_failure_spawns_once(fake_yt_dlp):
+    fake_yt_dlp(write_info=True)
+
+    async def main():
+        with track_spawns() as spawns:
+            probe = await YouTubeFetcher().probe(URL)
+        return probe, spawns.count
+
+    probe, count = asyncio.run(main())
+    try:
+        assert count == 1
+        assert probe.info['title'] == '标题'
+        assert probe.cover_path is None
+    finally:
+        shutil.rmtree(probe.work_dir, ignore_errors=True)
+
+
+def test_missing_info_tries_every_variant(fake_yt_dlp):
+    fake_yt_dlp(write_info=False)
+
+    async def main():
+        with track_spawns() as spawns:
+            with pytest.raises(RuntimeError):
+                await YouTubeFetcher().probe(URL)
+        return spawns.count
+
+    assert asyncio.run(main()) == 3
@@ -0,0 +1,96 @@
+"""流式RSS解析：时长、遇到已知单集即停止、大订阅源的内存与首条耗时"""
+import time
+import tracemalloc
+import xml.etree.ElementTree as ET
+
+import pytest
+
+from src.fetcher.rss import ITUNES_NS, iter_rss_items, parse_duration
+
+NOTES = '本期节目的详细介绍。' * 200
+
+
+def make_feed(count: int) -> bytes:
+    """按发布时间倒序的合成订阅源，每集带较长的节目介绍"""
+    parts = [
+        '<?xml version="1.0" encoding="UTF-8"?>'
+        '<rss version="2.0" xmlns:itunes="http://www.itunes.com/dtds/podcast-1.0.dtd">'
+        '<channel><title>测试播客</title>'
+    ]
+    parts.extend(
+        f"<item><title>第{i}期</title>"
+        f"<link>https://www.xiaoyuzhoufm.com/episode/ep{i:05d}</link>"
+        f"<pubDate>Mon, 01 Jan 2024 00:00:00 GMT</pubDate>"
+        f"<description>{NOTES}</description>"
+        f"<itunes:duration>{i % 3600}</itunes:duration>"
+        f'<itunes:image href="https://example.com/{i}.jpg"/></item>'
+        for i in range(count)
+    )
+    parts.append('</channel></rss>')
+    return ''.join(parts).encode('utf-8')
+
+
+def chunked(data: bytes, size: int = 64 * 1024):
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+
+def test_parse_duration():
+    assert parse_duration('3723') == 3723
+    assert parse_duration('62:03') == 3723
+    assert parse_duration('1:02:03') == 3723
+    assert parse_duration('') is None
+    assert parse_duration('abc') is None
+
+
+def test_stops_at_known_episode():
+    feed = make_feed(50)
+    seen = []
+
+    def chunks():
+        for chunk in chunked(feed, 1024):
+            seen.append(len(chunk))
+            yield chunk
+
+    items = list(iter_rss_items(chunks(), stop=lambda episode_id: episode_id == 'ep00003'))
+    assert [item.id for item in items] == ['ep00000', 'ep00001', 'ep00002']
+    assert items[0].author == '测试播客'
+    assert items[1].duration == 1
+    assert items[2].thumbnail == 'https://example.com/2.jpg'
+    # 停止后不再读取剩余内容
+    assert sum(seen) < len(feed) / 4
+
+
+def _full_tree(data: bytes):
+    """旧实现：整体读入后建完整的树"""
+    root = ET.fromstring(data.decode('utf-8'))
+    for item in root.iter('item'):
+        yield item.findtext('link'), item.findtext(f'{ITUNES_NS}duration')
+
+
+def _measure(parse):
+    tracemalloc.start()
+    started = time.perf_counter()
+    iterator = iter(parse())
+    next(iterator)
+    first = time.perf_counter() - started
+    count = 1 + sum(1 for _ in iterator)
+    total = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return count, first, total, peak
+
+
+@pytest.mark.benchmark
+def test_benchmark_large_feed():
+    feed = make_feed(5000)
+    old = _measure(lambda: _full_tree(feed))
+    new = _measure(lambda: iter_rss_items(chunked(feed)))
+
+    print(f"\n5000 集订阅源（{len(feed) / 1e6:.1f}MB）")
+    for name, (count, first, total, peak) in (('整树解析', old), ('流式解析', new)):
+        print(f"  {name}: {count} 集，首条 {first * 1000:.1f}ms，"
+              f"总计 {total * 1000:.0f}ms，峰值内存 {peak / 1e6:.1f}MB")
+    assert new[0] == old[0] == 5000
+    assert new[1] < old[1]
+    assert new[3] < old[3]
@@ -0,0 +1,107 @@
+"""播客RSS抓取：条件请求（304）、gzip传输和连接复用"""
+import asyncio
+import gzip
+import http.server
+
+import pytest
+
+from src.fetcher import cache as metadata_cache
+from src.fetcher import xiaoyuzhou
+from src.fetcher.http import HttpClient
+from src.fetcher.xiaoyuzhou import XiaoyuzhouFetcher
+
+ETAG = '"feed-v1"'
+
+
+def make_feed(count: int) -> bytes:
+    items = ''.join(
+        f"<item><title>第{i}期</title>"
+        f"<link>https://www.xiaoyuzhoufm.com/episode/ep{i:05d}</link>"
+        f"<pubDate>Mon, 01 Jan 2024 00:00:00 GMT</pubDate>"
+        f"<itunes:duration>1:02:03</itunes:duration></item>"
+        for i in range(count)
+    )
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>'
+        '<rss version="2.0" xmlns:itunes="http://www.itunes.com/dtds/podcast-1.0.dtd">'
+        f"<channel><title>测试播客</title>{items}</channel></rss>"
+    ).encode('utf-8')
+
+
+class FeedHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    feed = make_feed(3)
+    requests = []      # (If-None-Match, Accept-Encoding, 状态码)
+    connections = 0
+
+    def setup(self):
+        super().setup()
+        FeedHandler.connections += 1
+
+    def do_GET(self):
+        if self.headers.get('If-None-Match') == ETAG:
+            self.requests.append((ETAG, self.headers.get('Accept-Encoding'), 304))
+            self.send_response(304)
+            self.send_header('ETag', ETAG)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        body = self.feed
+        gzipped = 'gzip' in (self.headers.get('Accept-Encoding') or '')
+        if gzipped:
+            body = gzip.compress(body)
+        self.requests.append((None, self.headers.get('Accept-Encoding'), 200))
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/rss+xml')
+        self.send_header('ETag', ETAG)
+        self.send_header('Last-Modified', 'Mon, 01 Jan 2024 00:00:00 GMT')
+        if gzipped:
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def isolated(tmp_path, monkeypatch):
+    """独立的信息缓存和HTTP客户端"""
+    monkeypatch.setattr(metadata_cache, '_cache', metadata_cache.MetadataCache(tmp_path / 'cache.db'))
+    client = HttpClient(timeout=5)
+    monkeypatch.setattr(xiaoyuzhou, 'get_http_client', lambda: client)
+    FeedHandler.requests = []
+    FeedHandler.connections = 0
+    yield
+    client.close()
+
+
+def test_conditional_get_gzip_and_keep_alive(local_server, isolated):
+    fetcher = XiaoyuzhouFetcher()
+    with local_server(FeedHandler) as server:
+        url = f"{server.url}/feed.xml"
+        first = fetcher._fetch_from_rss(url)
+        second = fetcher._fetch_from_rss(url)
+
+    assert [item.id for item in first] == ['ep00000', 'ep00001', 'ep00002']
+    assert first[0].duration == 3723
+    # 第二次请求带 If-None-Match，服务端返回304，结果来自缓存
+    assert [status for _, _, status in FeedHandler.requests] == [200, 304]
+    assert FeedHandler.requests[1][0] == ETAG
+    assert all('gzip' in encoding for _, encoding, _ in FeedHandler.requests)
+    assert [item.id for item in second] == [item.id for item in first]
+    # 两次请求复用同一个 keep-alive 连接
+    assert FeedHandler.connections == 1
+
+
+def test_rss_is_tried_before_yt_dlp(local_server, isolated, monkeypatch):
+    async def no_yt_dlp(*args, **kwargs):
+        raise AssertionError('RSS可用时不应调用yt-dlp')
+
+    fetcher = XiaoyuzhouFetcher()
+    monkeypatch.setattr(fetcher, '_scan_playlist', no_yt_dlp)
+    with local_server(FeedHandler) as server:
+        items = asyncio.run(fetcher.fetch_source_list(f"{server.url}/feed.xml"))
+    assert len(items) == 3
@@ -0,0 +1,96 @@
+"""订阅源扫描限流：扩大窗口重扫、RSS失败回退和播客主页，每次yt-dlp调用都取令牌"""
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from src import scanner
+from src.fetcher import base, runner
+from src.fetcher.runner import ProcessResult
+from src.fetcher.xiaoyuzhou import XiaoyuzhouFetcher
+from src.fetcher.youtube import YouTubeFetcher
+from src.ratelimit import TokenBucket
+from src.state import StateStore
+
+
+class CountingBucket(TokenBucket):
+    """记录取令牌次数"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.acquired = 0
+
+    async def acquire(self, tokens: float = 1.0) -> float:
+        self.acquired += 1
+        return await super().acquire(tokens)
+
+
+@pytest.fixture
+def yt_dlp(monkeypatch):
+    """假的yt-dlp：窗口内全是新内容，迫使窗口翻倍重扫；返回调用记录"""
+    runner.configure(backend='subprocess')
+    calls = []
+
+    async def fake_run_process(cmd, timeout=None, line_callback=None):
+        calls.append(cmd)
+        window = int(cmd[cmd.index('--playlist-end') + 1])
+        for i in range(window):
+            line_callback(json.dumps({
+                'id': f"new{i}", 'title': '', 'url': f"https://www.xiaoyuzhoufm.com/episode/new{i}",
+            }))
+        return ProcessResult(returncode=0, stdout='', stderr='')
+
+    monkeypatch.setattr(base, 'run_process', fake_run_process)
+    monkeypatch.setattr(base.BaseFetcher, '_cache_flat_entries', lambda self, entries: None)
+    return calls
+
+
+def scan(tmp_path, source_type: str, url: str, bucket: TokenBucket):
+    state = StateStore(tmp_path / 'state.db')
+    state.mark_processed(source_type, 'old', '')
+    source = SimpleNamespace(name='x', type=source_type, url=url)
+    state.save_watermark(f"{source_type}:{source.url}", 'old', None, 2)
+    config = SimpleNamespace(scan=SimpleNamespace(window=2, max_window=8, timeout=30))
+    return asyncio.run(scanner.scan_source(source, config, state, bucket))
+
+
+def test_every_rescan_takes_a_token(tmp_path, monkeypatch, yt_dlp):
+    monkeypatch.setattr(scanner, 'get_fetcher', lambda source_type: YouTubeFetcher())
+
+    # 速率极低：第一次用掉突发令牌后，之后每次都要等待
+    bucket = TokenBucket(rate=50, capacity=1)
+    result = scan(tmp_path, 'youtube', 'https://www.youtube.com/@x', bucket)
+
+    assert result.error is None
+    # 窗口 2 -> 4 -> 8，三次调用，后两次等待令牌
+    assert len(yt_dlp) == 3
+    assert result.wait >= 2 / 50 * 0.9
+    assert result.scanned == 8
+
+
+def test_podcast_page_takes_a_token_per_call(tmp_path, monkeypatch, yt_dlp):
+    monkeypatch.setattr(scanner, 'get_fetcher', lambda source_type: XiaoyuzhouFetcher())
+
+    bucket = CountingBucket(rate=50, capacity=1)
+    result = scan(tmp_path, 'xiaoyuzhou', 'https://www.xiaoyuzhoufm.com/podcast/abc', bucket)
+
+    assert result.error is None
+    assert len(yt_dlp) == 3
+    assert bucket.acquired == 3
+
+
+def test_rss_fallback_takes_a_token(tmp_path, monkeypatch, yt_dlp):
+    def broken_rss(self, rss_url, stop=None):
+        raise RuntimeError('HTTP 500')
+
+    monkeypatch.setattr(XiaoyuzhouFetcher, '_fetch_from_rss', broken_rss)
+    monkeypatch.setattr(scanner, 'get_fetcher', lambda source_type: XiaoyuzhouFetcher())
+
+    bucket = CountingBucket(rate=50, capacity=1)
+    result = scan(tmp_path, 'xiaoyuzhou', 'https://feeds.example.com/podcast.xml', bucket)
+
+    assert result.error is None
+    # RSS请求一次，回退到yt-dlp后窗口 2 -> 4 -> 8 再三次
+    assert len(yt_dlp) == 3
+    assert bucket.acquired == 4
@@ -0,0 +1,127 @@
+"""归档全文检索：中文子串检索、排序与摘录，5万篇文档的查询耗时"""
+import json
+import random
+import statistics
+import time
+
+import pytest
+
+from src.archiver import catalog as catalog_module
+from src.archiver.catalog import Catalog, CatalogEntry
+from src.archiver.search import SearchDocument, build_match
+
+# 合成文档：正文按 Zipf 分布从虚词和普通词中抽取（少数高频虚词几乎每篇都有），
+# 每篇另有两个话题，话题词在该篇中出现多次
+STOP_WORDS = ['我们', '这个', '其实', '就是', '然后', '觉得', '可能', '时候']
+TOPIC_WORDS = [
+    '人工智能', '大模型', '创业', '投资', '播客', '访谈', '经济', '教育', '科技', '产品',
+    '用户', '增长', '市场', '公司', '团队', '数据', '算法', '芯片', '能源', '医疗',
+]
+
+
+def make_vocabulary(size: int = 5000):
+    """高频虚词 + 合成的二字词，返回 (词表, 累计权重)"""
+    words = list(STOP_WORDS)
+    words += [chr(0x4e00 + i * 37 % 20000) + chr(0x4e00 + (i * 7919 + 11) % 20000) for i in range(size - len(words))]
+    total, cum_weights = 0.0, []
+    for rank in range(1, len(words) + 1):
+        total += 1 / rank
+        cum_weights.append(total)
+    return words, cum_weights
+
+
+def make_entry(i: int, title: str) -> CatalogEntry:
+    return CatalogEntry(
+        source='youtube', video_id=f"v{i:06d}", folder=f"2024-01-01_v{i:06d}",
+        title=title, title_zh=title, author=f"作者{i % 50}",
+        published_at='20240101', published_date='2024-01-01', duration=3600,
+        source_url=f"https://www.youtube.com/watch?v=v{i:06d}", created_at='2024-01-01T00:00:00',
+    )
+
+
+def test_search_ranks_title_matches_and_makes_snippets(tmp_path):
+    catalog = Catalog(tmp_path / 'catalog.db')
+    catalog.upsert(make_entry(1, '聊聊人工智能'), SearchDocument('聊聊人工智能', '摘要', '今天我们聊聊'))
+    catalog.upsert(make_entry(2, '创业故事'), SearchDocument('创业故事', '摘要', '后来他开始研究人工智能和芯片'))
+    catalog.upsert(make_entry(3, '投资方法'), SearchDocument('投资方法', '摘要', '这期节目和技术无关'))
+
+    results = catalog.search('人工智能')
+    assert [result.entry.video_id for result in results] == ['v000001', 'v000002']
+    assert '【人工智能】' in results[1].snippet
+    # 多个词需同时匹配；子串检索
+    assert [r.entry.video_id for r in catalog.search('智能 芯片')] == ['v000002']
+    assert catalog.search('不存在的词') == []
+    assert build_match('') == ''
+    catalog.close()
+
+
+def test_reindex_writes_in_batches(tmp_path, monkeypatch):
+    monkeypatch.setattr(catalog_module, 'REINDEX_BATCH', 4)
+    for i in range(10):
+        folder = tmp_path / f"2024-01-01_v{i:06d}"
+        folder.mkdir()
+        metadata = {'video_id': f"v{i:06d}", 'title': f"第{i}期", 'source_url': f"https://www.youtube.com/watch?v=v{i:06d}"}
+        (folder / 'metadata.json').write_text(json.dumps(metadata, ensure_ascii=False), encoding='utf-8')
+        (folder / 'summary.md').write_text(f"摘要{i}", encoding='utf-8')
+    # 没有 metadata.json 的文件夹跳过
+    (tmp_path / 'broken').mkdir()
+
+    catalog = Catalog(tmp_path / '.catalog.db')
+    catalog.upsert(make_entry(99, '旧条目'))
+    transactions = []
+    write = catalog._write
+
+    def counting_write():
+        transactions.append(True)
+        return write()
+
+    monkeypatch.setattr(catalog, '_write', counting_write)
+    assert catalog.reindex(tmp_path, workers=2, signatures=False) == (10, 1)
+
+    # 清空 + 每批一个事务（11 个文件夹分 3 批）+ 合并索引段
+    assert len(transactions) == 5
+    assert catalog.count() == 10
+    assert catalog.get('v000099') is None
+    assert [r.entry.video_id for r in catalog.search('摘要7')] == ['v000007']
+    catalog.close()
+
+
+@pytest.mark.benchmark
+def test_benchmark_search_50k(tmp_path):
+    documents = 50000
+    rng = random.Random(0)
+    words, cum_weights = make_vocabulary()
+    catalog = Catalog(tmp_path / 'catalog.db')
+
+    started = time.perf_counter()
+    # 批量写入：一个事务写一千篇
+    for batch in range(0, documents, 1000):
+        with catalog._write() as conn:
+            for i in range(batch, batch + 1000):
+                body = rng.choices(words, cum_weights=cum_weights, k=300)
+                for word in rng.sample(TOPIC_WORDS, 2) * 5 + [f"专题{i}号"]:
+                    body.insert(rng.randrange(len(body)), word)
+                title = f"第{i}期 " + ''.join(rng.choices(TOPIC_WORDS, k=2))
+                document = SearchDocument(title, ''.join(body[:40]), '，'.join(body))
+                catalog._upsert(conn, make_entry(i, title), document)
+    build = time.perf_counter() - started
+
+    queries = ['人工智能', '芯片', '医疗 能源', '专题12345号', '大模型 数据 算法', 'gpt']
+    # 几乎每篇都匹配的查询（高频虚词、单字前缀）：需要为全部匹配计算bm25，是最坏情况，只报告不作要求
+    worst_case = ['我们', '能']
+    timings = {}
+    for query in queries + worst_case:
+        samples = []
+        for _ in range(5):
+            started = time.perf_counter()
+            results = catalog.search(query, limit=20)
+            samples.append(time.perf_counter() - started)
+        matches = catalog._fetch("SELECT count(*) FROM search WHERE search MATCH ?", (build_match(query),))[0][0]
+        timings[query] = (statistics.median(samples), max(samples), len(results), matches)
+    catalog.close()
+
+    print(f"\n{documents} 篇文档，建索引 {build:.1f}s")
+    for query, (median, worst, count, matches) in timings.items():
+        print(f"  {query!r}: 匹配 {matches} 篇，中位数 {median * 1000:.1f}ms，最慢 {worst * 1000:.1f}ms，返回 {count} 条")
+    assert timings['专题12345号'][2] == 1
+    assert all(timings[query][0] < 0.1 for query in queries)
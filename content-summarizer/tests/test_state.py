@@ -0,0 +1,117 @@
+"""处理状态存储：认领、释放与过期认领、失去认领后的更新、失败次数上限"""
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+
+from src import pipeline
+from src.state import CLAIM_LEASE, FETCHED, LISTED, MAX_ATTEMPTS, SUMMARIZED, StateStore
+
+
+def _dead_pid() -> int:
+    proc = subprocess.Popen([sys.executable, '-c', 'pass'])
+    proc.wait()
+    return proc.pid
+
+
+def test_claim_from_exited_local_process_is_stale(tmp_path):
+    crashed = StateStore(tmp_path / 'state.db')
+    crashed.owner = f"{socket.gethostname()}:{_dead_pid()}"
+    assert crashed.claim('youtube', 'v1') is not None
+
+    restarted = StateStore(tmp_path / 'state.db')
+    assert restarted.claim('youtube', 'v1') is not None
+
+
+def test_claim_from_live_process_is_kept(tmp_path):
+    other = StateStore(tmp_path / 'state.db')
+    other.owner = f"{socket.gethostname()}:{os.getppid()}"
+    assert other.claim('youtube', 'v1') is not None
+    remote = StateStore(tmp_path / 'state.db')
+    remote.owner = 'another-host:1'
+    assert remote.claim('youtube', 'v2') is not None
+
+    store = StateStore(tmp_path / 'state.db')
+    assert store.claim('youtube', 'v1') is None
+    assert store.claim('youtube', 'v2') is None
+
+
+def test_interrupted_pipeline_releases_claims(tmp_path, monkeypatch):
+    store = StateStore(tmp_path / 'state.db')
+
+    async def fetch_stage(item, config, state):
+        item.url_type, item.video_id = 'youtube', item.url
+        state.claim(item.url_type, item.video_id, item.url)
+        item.claimed = True
+        await asyncio.sleep(10)
+        return True
+
+    monkeypatch.setattr(pipeline, 'STAGES', [('fetch', fetch_stage)] + pipeline.STAGES[1:])
+
+    class Config:
+        class pipeline:
+            fetch_workers, llm_workers, archive_workers, queue_size = 2, 1, 1, 2
+
+    async def main():
+        batch = pipeline.BatchPipeline(Config, store)
+        task = asyncio.create_task(batch.run(['a', 'b']))
+        await asyncio.sleep(0.2)
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    asyncio.run(main())
+    other = StateStore(tmp_path / 'state.db')
+    other.owner = 'another-host:1'
+    assert other.claim('youtube', 'a') is not None
+    assert other.claim('youtube', 'b') is not None
+
+
+def _expire_claim(store: StateStore, video_id: str) -> None:
+    """把认领时间改到租约之前"""
+    with store._write():
+        store._conn.execute(
+            "UPDATE items SET claimed_at = ? WHERE video_id = ?", (time.time() - CLAIM_LEASE - 1, video_id)
+        )
+
+
+def test_expired_owner_cannot_overwrite_new_claim(tmp_path):
+    slow = StateStore(tmp_path / 'state.db')
+    slow.owner = 'slow-host:1'
+    assert slow.claim('youtube', 'v1') is not None
+    _expire_claim(slow, 'v1')
+
+    # 租约过期后被其他进程接手，原进程的更新和失败记录都不生效
+    new = StateStore(tmp_path / 'state.db')
+    assert new.claim('youtube', 'v1') is not None
+    assert not slow.update_status('youtube', 'v1', SUMMARIZED)
+    assert not slow.mark_failed('youtube', 'v1', 'summarize', 'timeout')
+    record = new.get_item('youtube', 'v1')
+    assert record.status == LISTED and record.attempts == 0
+    assert new._conn.execute("SELECT claimed_by FROM items WHERE video_id = 'v1'").fetchone()[0] == new.owner
+    assert new.update_status('youtube', 'v1', FETCHED)
+
+
+def test_lost_claim_skips_item(tmp_path):
+    store = StateStore(tmp_path / 'state.db')
+    item = pipeline.PipelineItem(url='v1', url_type='youtube', video_id='v1', claimed=True)
+    # 没有认领（已被其他进程接手）时更新失败，该项跳过而不是记为失败
+    assert not pipeline._advance(item, store, FETCHED)
+    assert item.status == 'skipped' and not item.claimed
+
+
+def test_pending_items_stop_after_max_attempts(tmp_path):
+    store = StateStore(tmp_path / 'state.db')
+    store.mark_listed('youtube', 'src', [('v1', '', 'https://example.com/v1', ''), ('v2', '', 'https://example.com/v2', '')])
+    for _ in range(MAX_ATTEMPTS):
+        store.claim('youtube', 'v1')
+        store.mark_failed('youtube', 'v1', 'fetch', 'error')
+    store.claim('youtube', 'v2')
+    store.mark_failed('youtube', 'v2', 'fetch', 'error')
+
+    assert [row[0] for row in store.pending_items('src')] == ['v2']
+    assert sorted(row[0] for row in store.pending_items('src', max_attempts=0)) == ['v1', 'v2']
@@ -0,0 +1,81 @@
+"""流式摘要：本地SSE接口上的增量解析、部分结果、首token耗时和输出速度"""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from src.config import AIConfig, SummaryConfig
+from src.summarizer import cache, client
+from src.summarizer.openai_client import Summarizer
+from src.summarizer.stream import SectionParser, StreamProgress
+
+from .fake_openai import FakeOpenAI, chat_chunks
+
+SUMMARY = """# 流式摘要测试
+
+### 核心观点
+1. 第一个观点
+2. 第二个观点
+
+### 关键洞察
+- 一条洞察
+
+### 金句提取
+- "第一句原话"
+
+### 摘要正文
+这是摘要正文的第一段。
+
+这是第二段。"""
+
+
+@pytest.fixture(autouse=True)
+def isolated(monkeypatch):
+    monkeypatch.setattr(client, '_client', None)
+    monkeypatch.setattr(cache, '_enabled', False)
+
+
+def make_summarizer(base_url: str) -> Summarizer:
+    ai = AIConfig(provider='openai', base_url=base_url, model='test-model', api_key='test', stream=True, timeout=10)
+    return Summarizer(SimpleNamespace(ai=ai, summary=SummaryConfig(length='short', custom_words=500)))
+
+
+def test_stream_parses_incrementally():
+    deltas = [SUMMARY[i:i + 8] for i in range(0, len(SUMMARY), 8)]
+    partials = []
+
+    with FakeOpenAI(lambda request: (200, chat_chunks(deltas), {}), chunk_delay=0.01) as fake:
+        summarizer = make_summarizer(fake.base_url)
+        progress = StreamProgress(partials.append, interval=0)
+        result = asyncio.run(summarizer.summarize('转录', progress=progress))
+
+    request = fake.requests[0]
+    assert request['stream'] is True
+    assert request['stream_options'] == {'include_usage': True}
+
+    # 边接收边产出部分结果，观点逐条增加
+    assert len(partials) > 5
+    counts = [len(partial.core_points) for partial in partials]
+    assert counts == sorted(counts) and counts[0] == 0 and counts[-1] == 2
+
+    # 流式结果与完整解析的结构一致，摘要正文为全部内容
+    assert result.title == '流式摘要测试'
+    assert result.core_points == ['第一个观点', '第二个观点']
+    assert result.quotes == ['第一句原话']
+    assert result.summary == summarizer._parse_response(SUMMARY).summary == SUMMARY
+
+    completion = progress.completion
+    assert completion.content == SUMMARY
+    assert 0 < completion.ttft < completion.latency
+    assert completion.completion_tokens == len(deltas)
+    assert completion.tokens_per_second > 0
+    assert '首token' in progress.stats()
+
+
+def test_unstructured_output_keeps_full_content():
+    parser = SectionParser()
+    parser.feed('只有一段没有结构的文字\n第二行')
+    parser.close()
+    result = parser.result()
+    assert result.title == ''
+    assert result.summary == '只有一段没有结构的文字\n第二行'
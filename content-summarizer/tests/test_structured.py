@@ -0,0 +1,90 @@
+"""结构化输出：校验、修复调用和响应缓存（只缓存通过校验的回复）"""
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from src.config import AIConfig, SummaryConfig
+from src.summarizer import cache, client
+from src.summarizer.cache import ResponseCache, make_key
+from src.summarizer.openai_client import Summarizer
+
+from .fake_openai import FakeOpenAI, chat_response, prompt_of
+
+VALID = json.dumps({
+    'title': '结构化摘要',
+    'core_points': ['观点'],
+    'insights': [],
+    'quotes': [],
+    'guests': [],
+    'summary': '正文',
+}, ensure_ascii=False)
+INVALID = '{"title": "缺少字段"}'
+
+
+@pytest.fixture
+def response_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(client, '_client', None)
+    monkeypatch.setattr(cache, '_enabled', True)
+    monkeypatch.setattr(cache, '_cache', ResponseCache(tmp_path / 'llm_cache'))
+    return tmp_path / 'llm_cache'
+
+
+def make_summarizer(base_url: str, response_format: str) -> Summarizer:
+    ai = AIConfig(provider='openai', base_url=base_url, model='test-model', api_key='test',
+                  response_format=response_format, timeout=10)
+    return Summarizer(SimpleNamespace(ai=ai, summary=SummaryConfig(length='short', custom_words=500)))
+
+
+def test_invalid_output_is_not_cached(response_cache):
+    def responder(request):
+        if '原始输出：' in prompt_of(request):
+            return 200, chat_response(VALID), {}
+        return 200, chat_response(INVALID), {}
+
+    with FakeOpenAI(responder) as fake:
+        summarizer = make_summarizer(fake.base_url, 'json_object')
+        first = asyncio.run(summarizer.summarize('转录'))
+        assert len(fake.requests) == 2
+        second = asyncio.run(summarizer.summarize('转录'))
+
+    assert first.title == second.title == '结构化摘要'
+    # 不合格的首次回复没有缓存，再次运行重新请求；修复结果来自缓存
+    assert len(fake.requests) == 3
+    assert len(list(response_cache.glob('*/*.json'))) == 1
+    assert summarizer.parse_stats.failures == 2
+    assert summarizer.parse_stats.repaired == 2
+    assert (cache._cache.hits, cache._cache.misses) == (1, 3)
+
+
+def test_output_format_is_part_of_cache_key(response_cache):
+    def responder(request):
+        if request.get('tools'):
+            return 200, chat_response(tool_arguments=VALID), {}
+        return 200, chat_response(VALID), {}
+
+    with FakeOpenAI(responder) as fake:
+        asyncio.run(make_summarizer(fake.base_url, 'json_object').summarize('转录'))
+        asyncio.run(make_summarizer(fake.base_url, 'json_object').summarize('转录'))
+        assert len(fake.requests) == 1
+        # 提示词相同但接口参数不同，不能复用 JSON 模式的缓存
+        asyncio.run(make_summarizer(fake.base_url, 'tool').summarize('转录'))
+        assert len(fake.requests) == 2
+
+    messages = [{'role': 'user', 'content': 'x'}]
+    assert make_key('m', 'u', messages, 0.7, 100, {}) == make_key('m', 'u', messages, 0.7, 100)
+    assert make_key('m', 'u', messages, 0.7, 100, {'response_format': {'type': 'json_object'}}) \
+        != make_key('m', 'u', messages, 0.7, 100)
+
+
+def test_rejected_cache_entry_counts_as_miss(tmp_path):
+    response_cache = ResponseCache(tmp_path / 'llm_cache')
+    response_cache.put('k' * 64, INVALID)
+
+    # 未通过校验的缓存按未命中统计
+    assert response_cache.get('k' * 64, validate=lambda content: False) is None
+    assert (response_cache.hits, response_cache.misses) == (0, 1)
+    assert response_cache.get('k' * 64, validate=lambda content: True) == INVALID
+    assert response_cache.get('x' * 64) is None
+    assert (response_cache.hits, response_cache.misses) == (1, 2)
@@ -0,0 +1,75 @@
+"""字幕解析：测试语料、滚动字幕去重（只对自动字幕）、吞吐量与token缩减"""
+import time
+from pathlib import Path
+
+import pytest
+
+from src.fetcher.subtitle import iter_cues, iter_transcript_lines, parse_subtitle
+
+CORPUS = Path(__file__).parent / 'data' / 'subtitles'
+
+
+def test_manual_srt_keeps_repeated_lines():
+    text = parse_subtitle(CORPUS / 'manual.srt', timestamp_interval=0)
+    # 去掉序号、时间轴和标签；重复的对白和作为前缀的对白都保留
+    assert text.splitlines() == ['Yes.', 'No.', 'Yes.', 'I said it & meant it', 'I said', '第二段']
+
+
+def test_manual_vtt_skips_header_blocks():
+    text = parse_subtitle(CORPUS / 'manual.vtt', timestamp_interval=0)
+    assert text.splitlines() == ['大家好，欢迎收听', '今天聊聊字幕', '和它的格式', '下一段']
+
+
+def test_auto_captions_drop_rolling_repeats():
+    text = parse_subtitle(CORPUS / 'auto.vtt', timestamp_interval=0, automatic=True)
+    assert text.splitlines() == ["so today we're talking", 'about subtitles and', 'why they repeat']
+
+
+def test_paragraph_timestamps():
+    text = parse_subtitle(CORPUS / 'manual.srt', timestamp_interval=300)
+    assert text.splitlines() == [
+        '[00:00:01]', 'Yes.', 'No.', 'Yes.', 'I said it & meant it', 'I said',
+        '', '[00:05:01]', '第二段',
+    ]
+
+
+def make_auto_vtt(count: int) -> str:
+    """YouTube风格的自动字幕：每行先逐词出现，再在下一块中重复"""
+    parts = ['WEBVTT\nKind: captions\nLanguage: en\n\n']
+    previous = ''
+    for i in range(count):
+        start = i * 3
+        words = [f"word{i}", 'about', 'the', f"topic{i % 97}", 'today']
+        timed = words[0] + ''.join(
+            f"<00:{(start + k) // 60 % 60:02d}:{(start + k) % 60:02d}.500><c> {w}</c>"
+            for k, w in enumerate(words[1:])
+        )
+        stamp = f"{start // 3600:02d}:{start // 60 % 60:02d}:{start % 60:02d}"
+        end = f"{(start + 3) // 3600:02d}:{(start + 3) // 60 % 60:02d}:{(start + 3) % 60:02d}"
+        parts.append(f"{stamp}.000 --> {end}.000 align:start position:0%\n{previous or ' '}\n{timed}\n\n")
+        previous = ' '.join(words)
+        parts.append(f"{end}.000 --> {end}.010 align:start position:0%\n{previous}\n \n\n")
+    return ''.join(parts)
+
+
+@pytest.mark.benchmark
+def test_benchmark_throughput_and_token_reduction(tmp_path):
+    path = tmp_path / 'auto.vtt'
+    path.write_text(make_auto_vtt(50000), encoding='utf-8')
+    size = path.stat().st_size
+
+    started = time.perf_counter()
+    text = parse_subtitle(path, timestamp_interval=0, automatic=True)
+    elapsed = time.perf_counter() - started
+
+    # 不去重时送给LLM的文本：所有字幕块的全部行
+    with open(path, encoding='utf-8') as f:
+        raw = '\n'.join(line for cue in iter_cues(f) for line in cue.lines)
+    with open(path, encoding='utf-8') as f:
+        assert text == '\n'.join(iter_transcript_lines(iter_cues(f), rolling=True))
+
+    raw_tokens, tokens = len(raw.split()), len(text.split())
+    print(f"\n自动字幕 {size / 1e6:.1f}MB：{elapsed * 1000:.0f}ms（{size / 1e6 / elapsed:.1f}MB/s），"
+          f"词数 {raw_tokens} -> {tokens}（缩减 {raw_tokens / tokens:.2f}x）")
+    assert len(text.splitlines()) == 50000
+    assert raw_tokens / tokens >= 2.5
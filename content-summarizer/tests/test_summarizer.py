@@ -0,0 +1,150 @@
+"""AI调用与分段摘要：本地 OpenAI 兼容接口上的重试、429 和 map-reduce"""
+import asyncio
+import re
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from src.config import AIConfig, SummaryConfig
+from src.summarizer import cache, client
+from src.summarizer.client import LLMClient
+from src.summarizer.openai_client import Summarizer
+
+from .fake_openai import FakeOpenAI, chat_response, prompt_of
+
+SUMMARY = """# 分段摘要测试
+
+## 核心观点
+- 第一个观点
+
+## 金句
+「原话」
+
+## 摘要正文
+合并后的摘要。
+"""
+
+
+def make_config(base_url: str, **summary_options) -> SimpleNamespace:
+    ai = AIConfig(provider='openai', base_url=base_url, model='test-model', api_key='test', max_retries=3, timeout=10)
+    summary = SummaryConfig(length='short', custom_words=500, **summary_options)
+    return SimpleNamespace(ai=ai, summary=summary)
+
+
+@pytest.fixture(autouse=True)
+def isolated(monkeypatch):
+    """不使用全局客户端和磁盘缓存，退避时间缩短"""
+    monkeypatch.setattr(client, '_client', None)
+    monkeypatch.setattr(client, 'BACKOFF_BASE', 0.01)
+    monkeypatch.setattr(cache, '_enabled', False)
+
+
+def test_retries_429_and_5xx_then_succeeds():
+    statuses = [429, 503]
+
+    def responder(request):
+        if statuses:
+            status = statuses.pop(0)
+            return status, {'error': {'message': 'busy', 'type': 'rate_limit'}}, {'Retry-After': '0'}
+        return 200, chat_response('好的'), {}
+
+    with FakeOpenAI(responder) as fake:
+        llm = LLMClient(make_config(fake.base_url).ai)
+        completion = asyncio.run(llm.complete([{'role': 'user', 'content': '你好'}]))
+
+    assert completion.content == '好的'
+    assert completion.retries == 2
+    assert len(fake.requests) == 3
+    assert llm.stats.calls == 1 and llm.stats.retries == 2 and llm.stats.failures == 0
+    assert completion.prompt_tokens == 100 and completion.completion_tokens == 50
+
+
+def test_retry_after_is_respected():
+    statuses = [429]
+
+    def responder(request):
+        if statuses:
+            return statuses.pop(0), {'error': {'message': 'slow down'}}, {'Retry-After': '0.3'}
+        return 200, chat_response('好的'), {}
+
+    with FakeOpenAI(responder) as fake:
+        llm = LLMClient(make_config(fake.base_url).ai)
+        started = time.monotonic()
+        asyncio.run(llm.complete([{'role': 'user', 'content': '你好'}]))
+    assert time.monotonic() - started >= 0.3
+
+
+def test_client_errors_are_not_retried():
+    def responder(request):
+        return 400, {'error': {'message': 'bad request'}}, {}
+
+    with FakeOpenAI(responder) as fake:
+        llm = LLMClient(make_config(fake.base_url).ai)
+        with pytest.raises(Exception):
+            asyncio.run(llm.complete([{'role': 'user', 'content': '你好'}]))
+    assert len(fake.requests) == 1
+    assert llm.stats.failures == 1
+
+
+def test_retries_reserve_tpm_once():
+    statuses = [429, 503]
+
+    def responder(request):
+        if statuses:
+            return statuses.pop(0), {'error': {'message': 'busy'}}, {'Retry-After': '0'}
+        return 200, chat_response('好的'), {}
+
+    with FakeOpenAI(responder) as fake:
+        ai = AIConfig(provider='openai', base_url=fake.base_url, model='test-model', api_key='test',
+                      max_retries=3, timeout=10, tpm=600)
+        llm = LLMClient(ai)
+        asyncio.run(llm.complete([{'role': 'user', 'content': '你好'}], max_tokens=100))
+        # 两次失败的请求不占用token额度，最终只扣除实际用量（输入100 + 输出50）
+        assert 600 - 150 <= llm._tpm._tokens < 600 - 150 + 20
+
+        statuses.extend([400])
+        with pytest.raises(Exception):
+            asyncio.run(llm.complete([{'role': 'user', 'content': '你好'}], max_tokens=100))
+        # 最终失败时预留的额度全部退回
+        assert llm._tpm._tokens >= 600 - 150
+
+
+def test_long_transcript_uses_map_reduce():
+    def responder(request):
+        prompt = prompt_of(request)
+        part = re.search(r'转录内容（第 (\d+)/\d+ 部分）', prompt)
+        if part:
+            time.sleep(0.05)
+            return 200, chat_response(f"第{part.group(1)}部分的笔记"), {}
+        return 200, chat_response(SUMMARY), {}
+
+    # 约 12 段，每段约 100 tokens
+    transcript = '\n\n'.join(f"第{i}段。" + '内容' * 48 for i in range(12))
+    with FakeOpenAI(responder) as fake:
+        summarizer = Summarizer(make_config(fake.base_url, chunk_tokens=100, map_concurrency=3, chunked_threshold=500))
+        result = asyncio.run(summarizer.summarize(transcript))
+
+    maps = [request for request in fake.requests if '转录内容（第' in prompt_of(request)]
+    reduce_prompt = prompt_of(fake.requests[-1])
+    assert len(maps) == 12
+    assert len(fake.requests) == 13
+    # 分段并发不超过 map_concurrency
+    assert fake.max_active <= 3
+    # 合并时笔记按原顺序排列，不再包含原始转录
+    positions = [reduce_prompt.index(f"第{i}部分的笔记") for i in range(1, 13)]
+    assert positions == sorted(positions)
+    assert '内容内容' not in reduce_prompt
+    assert result.title == '分段摘要测试'
+    assert result.core_points == ['第一个观点']
+
+
+def test_short_transcript_uses_single_call():
+    def responder(request):
+        return 200, chat_response(SUMMARY), {}
+
+    with FakeOpenAI(responder) as fake:
+        summarizer = Summarizer(make_config(fake.base_url, chunked_threshold=500))
+        asyncio.run(summarizer.summarize('很短的转录'))
+    assert len(fake.requests) == 1
+    assert '很短的转录' in prompt_of(fake.requests[0])